@@ -1,9 +1,10 @@
 import os 
+import json
 import datetime
 import networkx as nx
 import time
 
-from flask import Flask, flash, request, redirect, url_for, render_template, session, send_file, jsonify
+from flask import Flask, flash, request, redirect, url_for, render_template, session, send_file, send_from_directory, jsonify, g, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from pathlib import Path
 
@@ -12,14 +13,41 @@ from pathlib import Path
 #from authormaps.sharedwork import APInterface 
 
 from authormaps.network import Network, Visualizer
-from authormaps.sharedwork import ApiInterface 
+from authormaps import sharedwork
+from authormaps.sharedwork import MODES
+from authormaps.snapshot import load_network, REFRESH_AFTER
+from authormaps.netcache import NetworkCache, network_key
+from authormaps.jobs import JobQueue, DONE, FAILED
+from authormaps.warm import Warmer
+from authormaps.render import RenderCache, IMAGE_FORMATS
+from authormaps.startup import configure_logging
+from authormaps.metrics import get_metrics
+from authormaps.names import get_name_index, load_name_index, display_name
 
 
 # Define constants
+configure_logging()
 app = Flask(__name__)
 app.secret_key = "group2secretkey"
 app.config['MAX_CONTENT_PATH'] = 10 * 1024 * 1024  # Max 10MB
 
+# computed networks shared by all routes, keyed by normalized author name and mode
+network_cache = NetworkCache()
+# network builds run here instead of the request threads, see /jobstatus
+job_queue = JobQueue()
+# co-authors of viewed networks and the AUTHORMAPS_HOT_AUTHORS are prefetched at low priority
+warmer = Warmer()
+warmer.submit_hot_authors()
+# rendered images named by author, snapshot version, dpi and edge labels, so they never change once written
+render_cache = RenderCache()
+# suggestions for authors not found come from all names in the cache, indexed at start and extended as records come
+load_name_index()
+IMAGE_MAX_AGE = 365 * 24 * 3600
+# most PMIDs returned per page by /getsharedpublications
+MAX_PAGE_SIZE = 500
+# seconds between comments keeping an idle event stream open, see /jobevents
+SSE_KEEPALIVE = 15
+
 @app.template_filter()
 def datetimefilter(value, format='%Y/%m/%d %H:%M'):
     """convert a datetime to a different format."""
@@ -29,6 +57,50 @@ def datetimefilter(value, format='%Y/%m/%d %H:%M'):
 app.jinja_env.filters['datetimefilter'] = datetimefilter
 
 
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    """Time every request as stage http_<endpoint>, see /metrics."""
+    if 'request_start' in g and request.endpoint:
+        get_metrics().observe(f'http_{request.endpoint}', time.perf_counter() - g.request_start)
+        get_metrics().count('http_requests', endpoint=request.endpoint, status=response.status_code)
+    return response
+
+
+def get_network_frames(first_name, last_name, mode, progress=None, partial=None):
+    """Return the status code, status data, node and edge dataframes and NetworkState of the saved network of an author.
+    Saved networks older than AUTHORMAPS_REFRESH_AFTER seconds are refreshed incrementally first."""
+    state = load_network(first_name, last_name, mode, progress=progress, partial=partial)
+    frames = state.to_dataframes()
+    print(state.messagefrontend)
+    status_code, status_data = state.messagefrontend
+    node_df, edge_df = frames if frames else (None, None)
+    return status_code, status_data, node_df, edge_df, state
+
+
+def get_author_network(first_name, last_name, mode, progress=None, partial=None):
+    """Return the status code, status data and Visualizer (None if no network was found) of an author network.
+    Networks are taken from the in-process cache when they were computed less than AUTHORMAPS_REFRESH_AFTER seconds ago.
+    progress is called with the stage messages while the network is computed, partial with the partial results."""
+    key = network_key(first_name, last_name, mode)
+    entry = network_cache.get(key, max_age=REFRESH_AFTER)
+    if entry is None:
+        status_code, status_data, node_df, edge_df, state = get_network_frames(first_name, last_name, mode, progress, partial)
+        visualizer = None
+        if node_df is not None:
+            visualizer = Visualizer(first_name=first_name, last_name=last_name, mode=mode, node_list=node_df, authormap_file=edge_df, version=state.snapshot_id, postings=state.postings)
+            # positions saved with the snapshot, so every render and download shows the same picture
+            visualizer.graph_pos = state.layout(visualizer.graph)
+        entry = (status_code, status_data, visualizer)
+        if visualizer is not None:
+            network_cache.put(key, entry)
+    return entry
+
+
 @app.route("/")
 def home():
     return render_template('home.html', current_time=datetime.datetime.now())
@@ -36,8 +108,11 @@ def home():
 @app.route('/getauthornetwork', methods=['GET', 'POST'])
 def getauthornetwork():
     if request.method == 'POST':
-        # get author's name
+        # get author's name and edge computation mode
         author = request.form['search']
+        mode = request.form.get('mode', 'global')
+        if mode not in MODES:
+            mode = 'global'
         if any(invalid_char in author for invalid_char in list('@€µ*+~!"§$%&/()=?`,´#;:_<>|^°ßüÜäÄöÖ')):
             error_msg = 'invalid_char'
             return render_template('somethingwentwrong.html', error_msg=error_msg)
@@ -59,62 +134,136 @@ def getauthornetwork():
         if last_name == first_name:
             error_msg = 'reduplicated_name'
             return render_template('somethingwentwrong.html', error_msg=error_msg)
-        session['first_name'] = first_name
-        session['last_name'] = last_name
 
-        # Initialize number of shared publications as None 
-        num_shared_pub = 'None'
-        
-        # Initialize / refresh status code and status data
-        status_code = None
-        status_data = None
+        # build the network in the background, searches for an author already in progress join that job
+        job = job_queue.submit(network_key(first_name, last_name, mode),
+                               lambda job: build_author_network(job, first_name, last_name, mode),
+                               meta={'first_name': first_name, 'last_name': last_name, 'mode': mode})
+        return redirect(url_for('getauthornetwork', job=job.id))
 
+    # GET: results page of a job, the waiting page while it is still running
+    job = job_queue.get(request.args.get('job', ''))
+    if job is None:
+        return redirect(url_for('home'))
+    if job.status == FAILED:
+        return render_template('somethingwentwrong.html', error_msg='job_failed')
+    if job.status != DONE:
+        return render_template('waiting.html', job=job.to_dict())
 
-        # get list of coauthors via backend methods        
-        api_interface = ApiInterface(firstname=first_name, lastname=last_name)
-        
-        # Call backend and catch status code 
-        api_interface.make_dataframe()
-        print(api_interface.messagefrontend)
-        
-        status_code, status_data = api_interface.messagefrontend
-        # Check for bad status code:
-        if status_code != 700:
-            if status_code == 400: 
-                pass
-            elif status_code == 701: 
-                # No publications found for this author
-                return render_template('nopublicationsfound.html', first_name=first_name, last_name=last_name)
-            elif status_code == 702: 
-                # Author not found by API
-                return render_template('authornotfound.html', first_name=first_name, last_name=last_name)
-            elif status_code == 704: 
-                # Author not found but similiar authors were found
-                return render_template('authornotfoundbutsimiliar.html', first_name=first_name, last_name=last_name, similiar_authors=status_data)
-            elif status_code == 705: 
-                # Over a thousand publications were found
-                return render_template('overthousandpublications.html', first_name=first_name, last_name=last_name)
-           
-        # Get list of co-authors
-        coauthors = []
-        for coauthor in api_interface.nodelistunique:
-            split_coauthor = coauthor.split(' ')
-            co_last_name = split_coauthor[0]
-            co_first_and_middle = ' '.join(split_coauthor[1:])
-            full_coauthor_name = ' '.join([co_first_and_middle, co_last_name])
-            coauthors.append(full_coauthor_name)
-        print(sorted(coauthors))
-        coauthors = sorted(coauthors)
-        # create network and create graph_image
-        visualizer = Visualizer(first_name=first_name, last_name=last_name)
-        visualizer.generate_graph_image(graph_output_path = str(Path(__file__).parent.resolve() / 'static/images/authormap_plot.png'), with_edge_labels = False, dpi=300)
-
-        if status_code == 703: # Author was found and also similar authors
-            print(status_data)
-            return render_template('authormap.html', first_name=first_name, last_name=last_name, coauthors=coauthors, similiar_authors=status_data, num_shared_pub=num_shared_pub, current_time=datetime.datetime.now())
-
-        # render results page
-        return render_template('authormap.html', first_name=first_name, last_name=last_name, coauthors=coauthors, similiar_authors=None, num_shared_pub=num_shared_pub, current_time=datetime.datetime.now())
+    first_name, last_name, mode = job.meta['first_name'], job.meta['last_name'], job.meta['mode']
+    session['first_name'] = first_name
+    session['last_name'] = last_name
+    session['mode'] = mode
+    status_code, status_data, visualizer = job.result
+    if visualizer is not None:
+        # the co-authors in the side panel are the most likely next searches
+        warmer.warm_coauthors(first_name, last_name, mode)
+    view = request.args.get('view', 'interactive')
+    return render_network_page(first_name, last_name, status_code, status_data, visualizer, view=view, job_id=job.id)
+
+
+def build_author_network(job, first_name, last_name, mode):
+    """Job building a network, publishing stages and partial results to the waiting page, see /jobevents.
+    The last event before 'done' is 'layout' with the node-link data of the final network."""
+    entry = get_author_network(first_name, last_name, mode, progress=job.set_stage, partial=job.publish)
+    visualizer = entry[2]
+    if visualizer is not None:
+        job.set_stage('computing the layout')
+        job.publish('layout', render_cache.get_or_write_node_link(visualizer).name)
+    return entry
+
+
+@app.route('/jobevents/<job_id>', methods=['GET'])
+def jobevents(job_id):
+    # stages and partial results of a network build as server-sent events, replayed from the start or Last-Event-ID
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error='unknown job'), 404
+    start = request.headers.get('Last-Event-ID', -1, type=int) + 1
+
+    def stream():
+        index = start
+        while True:
+            index, events = job.events_since(index, timeout=SSE_KEEPALIVE)
+            if not events:
+                yield ': keep-alive\n\n'
+                continue
+            for event, data in events:
+                yield f'id: {index}\nevent: {event}\ndata: {json.dumps(data)}\n\n'
+                index += 1
+                if event in (DONE, FAILED):
+                    return
+
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'     # no buffering in a proxy in front
+    return response
+
+
+@app.route('/jobstatus/<job_id>', methods=['GET'])
+def jobstatus(job_id):
+    # status and current stage of a network build, polled by the waiting page
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error='unknown job'), 404
+    return jsonify(job.to_dict())
+
+
+def render_network_page(first_name, last_name, status_code, status_data, visualizer, view='interactive', job_id=None):
+    # Initialize number of shared publications as None 
+    num_shared_pub = 'None'
+
+    # Check for bad status code:
+    if status_code != 700:
+        if status_code == 400: 
+            pass
+        elif status_code == 701: 
+            # No publications found for this author
+            return render_template('nopublicationsfound.html', first_name=first_name, last_name=last_name)
+        elif status_code == 702: 
+            # Author not found by API, maybe under a similar name among all authors in the cache, none while indexing
+            name_index = get_name_index(wait=False)
+            similar = [display_name(name) for name, _ in name_index.similar(f'{last_name} {first_name}')] if name_index else []
+            if similar:
+                return render_template('authornotfoundbutsimiliar.html', first_name=first_name, last_name=last_name, similiar_authors=similar)
+            return render_template('authornotfound.html', first_name=first_name, last_name=last_name)
+        elif status_code == 704: 
+            # Author not found but similiar authors were found
+            return render_template('authornotfoundbutsimiliar.html', first_name=first_name, last_name=last_name, similiar_authors=status_data)
+        elif status_code == 705: 
+            # More than AUTHORMAPS_MAX_PUBLICATIONS publications were found
+            return render_template('overthousandpublications.html', first_name=first_name, last_name=last_name, max_publications=sharedwork.MAX_PUBLICATIONS)
+       
+    # Get list of co-authors (first and middle names followed by last name)
+    coauthors = sorted(visualizer.node_mapping.values())
+    print(coauthors)
+    if view == 'image':
+        # create graph_image, or reuse the one rendered for this version of the network
+        image = render_cache.get_or_render(visualizer, 'png', dpi=300, with_edge_labels=False)
+        urls = dict(image_url=url_for('rendered_image', filename=image.name), network_data_url=None)
+    else:
+        # only ship the node-link data, the browser draws the network
+        data = render_cache.get_or_write_node_link(visualizer)
+        urls = dict(image_url=None, network_data_url=url_for('rendered_image', filename=data.name))
+
+    if status_code == 703: # Author was found and also similar authors
+        print(status_data)
+        return render_template('authormap.html', first_name=first_name, last_name=last_name, coauthors=coauthors, similiar_authors=status_data, num_shared_pub=num_shared_pub, job_id=job_id, current_time=datetime.datetime.now(), **urls)
+
+    # render results page
+    return render_template('authormap.html', first_name=first_name, last_name=last_name, coauthors=coauthors, similiar_authors=None, num_shared_pub=num_shared_pub, job_id=job_id, current_time=datetime.datetime.now(), **urls)
+
+
+@app.route('/renders/<filename>', methods=['GET'])
+def rendered_image(filename):
+    # rendered images are content-addressed, browsers and proxies may keep them for good
+    response = send_from_directory(render_cache.directory, filename, max_age=IMAGE_MAX_AGE)
+    response.cache_control.immutable = True
+    if filename.endswith('.json.gz'):
+        # node-link data is stored gzipped, browsers decompress it themselves
+        response.mimetype = 'application/json'
+        response.content_encoding = 'gzip'
+    return response
 
 
 @app.route('/getsharedpublications', methods=['GET'])
@@ -125,11 +274,18 @@ def get_num_shared_publications():
     
     
     # get number of shared publications between checked authors 
-    network = Network(first_name=session['first_name'], last_name=session['last_name'])
+    _, _, network = get_author_network(session['first_name'], session['last_name'], session.get('mode', 'global'))
     num_shared_pub = network.get_shared_publication(author1, author2)
     
+    # with ?pmids=1 also one page (page, page_size) of the shared PMIDs, newest first
+    if request.args.get('pmids'):
+        page = max(1, request.args.get('page', 1, type=int))
+        page_size = min(max(1, request.args.get('page_size', 20, type=int)), MAX_PAGE_SIZE)
+        pmids = network.get_shared_pmids(author1, author2, page=page, page_size=page_size)
+        total = network.count_shared_pmids(author1, author2)
+        return jsonify(num_shared_pub=num_shared_pub, pmids=pmids, total=total, page=page, page_size=page_size)
+
     # write to json (retrieved by AJAX GET call)
-    json = jsonify(num_shared_pub=num_shared_pub)
     return jsonify(num_shared_pub=num_shared_pub)
 
 
@@ -139,14 +295,27 @@ def download():
         # Get filetype, first name and last name
         filetype, first_name, last_name  = request.form['downloadformat'].split(',')
         
-        # Initialize Visualizer() and generate graph image with filetype 
-        visualizer = Visualizer(first_name = first_name, last_name=last_name)
-        visualizer.generate_graph_image(graph_output_path = str(Path(__file__).parent.resolve() / f'static/images/authormap_plot.{filetype}'), with_edge_labels = False, dpi=300)
-        return send_file(f'static/images/authormap_plot.{filetype}', attachment_filename=f'authormap_plot.{filetype}', as_attachment=True)
+        if filetype not in IMAGE_FORMATS:
+            return render_template('somethingwentwrong.html', error_msg='invalid_format')
+
+        # Get Visualizer() and the cached graph image, the first download renders all formats from one figure
+        _, _, visualizer = get_author_network(first_name, last_name, session.get('mode', 'global'))
+        image = render_cache.get_or_render(visualizer, filetype, dpi=300, with_edge_labels=False, formats=IMAGE_FORMATS)
+        response = send_file(image, download_name=f'authormap_plot.{filetype}', as_attachment=True, max_age=IMAGE_MAX_AGE)
+        response.cache_control.immutable = True
+        return response
 
 @app.route("/about")
 def about():
     return render_template('about.html')
 
+
+@app.route("/metrics")
+def metrics():
+    """Stage timers and counters of this process in the Prometheus text format."""
+    gauges = {'network_cache_entries': len(network_cache), 'warm_pending': len(warmer)}
+    gauges.update({f'jobs_{status}': n for status, n in job_queue.status_counts().items()})
+    return Response(get_metrics().prometheus(gauges=gauges), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=os.getenv('FLASK_PORT', 8080))
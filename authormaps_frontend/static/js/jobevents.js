@@ -0,0 +1,118 @@
+// show the partial results of a network build as they arrive from /jobevents: the co-authors first, then the edges
+// between them and at last the final layout. Browsers without server-sent events poll /jobstatus instead.
+var previewCanvas = document.getElementById("previewcanvas");
+var previewContext = previewCanvas.getContext("2d");
+var preview = {nodes: [], index: {}, links: {}, layout: null};
+
+function resizePreview() {
+	var ratio = window.devicePixelRatio || 1;
+	previewCanvas.width = previewCanvas.clientWidth * ratio;
+	previewCanvas.height = previewCanvas.clientHeight * ratio;
+	previewContext.setTransform(ratio, 0, 0, ratio, 0, 0);
+	drawPreview();
+}
+
+// until the layout arrives the co-authors sit on a circle in the order they were found
+function previewPosition(i) {
+	if (preview.layout) {
+		var node = preview.layout[preview.nodes[i]];
+		if (node) {
+			return [node.x, node.y];
+		}
+	}
+	var angle = 2 * Math.PI * i / Math.max(preview.nodes.length, 1);
+	return [Math.cos(angle), Math.sin(angle)];
+}
+
+function drawPreview() {
+	var width = previewCanvas.clientWidth;
+	var height = previewCanvas.clientHeight;
+	var size = Math.min(width, height) * 0.45;
+	var positions = preview.nodes.map(function(name, i) {
+		var xy = previewPosition(i);
+		return [width / 2 + xy[0] * size, height / 2 - xy[1] * size];
+	});
+	previewContext.clearRect(0, 0, width, height);
+	previewContext.strokeStyle = "#999999";
+	Object.keys(preview.links).forEach(function(key) {
+		var link = preview.links[key];
+		var source = positions[preview.index[link[0]]];
+		var target = positions[preview.index[link[1]]];
+		if (!source || !target) {
+			return;
+		}
+		previewContext.lineWidth = Math.min(0.5 + Math.log(1 + link[2]), 4);
+		previewContext.beginPath();
+		previewContext.moveTo(source[0], source[1]);
+		previewContext.lineTo(target[0], target[1]);
+		previewContext.stroke();
+	});
+	previewContext.fillStyle = "#1f77b4";
+	positions.forEach(function(xy) {
+		previewContext.beginPath();
+		previewContext.arc(xy[0], xy[1], 3, 0, 2 * Math.PI);
+		previewContext.fill();
+	});
+}
+
+function addCoauthors(names) {
+	var list = document.getElementById("coauthorlist");
+	names.forEach(function(name) {
+		if (name in preview.index) {
+			return;
+		}
+		preview.index[name] = preview.nodes.length;
+		preview.nodes.push(name);
+		var item = document.createElement("li");
+		item.textContent = name;
+		list.appendChild(item);
+	});
+	document.getElementById("coauthorcount").textContent = preview.nodes.length + " co-authors found";
+	drawPreview();
+}
+
+function addEdges(edges) {
+	edges.forEach(function(edge) {
+		addCoauthors([edge[0], edge[1]].filter(function(name) { return !(name in preview.index); }));
+		preview.links[edge[0] < edge[1] ? edge[0] + "\n" + edge[1] : edge[1] + "\n" + edge[0]] = edge;
+	});
+	drawPreview();
+}
+
+function showLayout(filename) {
+	fetch("/renders/" + filename)
+	.then(function(response) { return response.json(); })
+	.then(function(network) {
+		preview.layout = {};
+		network.nodes.forEach(function(node) { preview.layout[node.name] = node; });
+		drawPreview();
+	});
+}
+
+function showResults() {
+	window.location.href = "/getauthornetwork?job=" + jobId;
+}
+
+function listenJob() {
+	var source = new EventSource("/jobevents/" + jobId);
+	source.addEventListener("stage", function(event) {
+		document.getElementById("jobstage").textContent = JSON.parse(event.data);
+	});
+	source.addEventListener("coauthors", function(event) { addCoauthors(JSON.parse(event.data)); });
+	source.addEventListener("edges", function(event) { addEdges(JSON.parse(event.data)); });
+	source.addEventListener("layout", function(event) { showLayout(JSON.parse(event.data)); });
+	source.addEventListener("done", function() { source.close(); setTimeout(showResults, 500); });
+	source.addEventListener("failed", function() { source.close(); showResults(); });
+	source.onerror = function() {
+		// the browser reconnects by itself unless the stream is gone for good, e.g. the job is unknown
+		if (source.readyState == EventSource.CLOSED) {
+			setTimeout(pollJob, 1000);
+		}
+	};
+}
+
+window.addEventListener("resize", resizePreview);
+resizePreview();
+if (window.EventSource) {
+	listenJob();
+}
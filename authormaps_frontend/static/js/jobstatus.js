@@ -0,0 +1,21 @@
+// poll the status of a network build and show the results page when it is done, in browsers without server-sent
+// events (see jobevents.js)
+function pollJob() {
+	fetch("/jobstatus/" + jobId)
+	.then(function(response) { return response.json(); })
+	.then(function(job) {
+		if (job.status == "done" || job.status == "failed" || job.error == "unknown job") {
+			window.location.href = "/getauthornetwork?job=" + jobId;
+			return;
+		}
+		if (job.stage) {
+			document.getElementById("jobstage").textContent = job.stage;
+		}
+		setTimeout(pollJob, 1000);
+	})
+	.catch(function() { setTimeout(pollJob, 3000); });
+}
+
+if (!window.EventSource) {
+	setTimeout(pollJob, 1000);
+}
@@ -0,0 +1,122 @@
+// draw the co-author network from its node-link data, positions and colors are computed by the server
+var canvas = document.getElementById("networkcanvas");
+var context = canvas.getContext("2d");
+var network = null;
+var view = {scale: 1, x: 0, y: 0};
+var hovered = null;
+var dragging = null;
+
+function resizeCanvas() {
+	var ratio = window.devicePixelRatio || 1;
+	canvas.width = canvas.clientWidth * ratio;
+	canvas.height = canvas.clientHeight * ratio;
+	context.setTransform(ratio, 0, 0, ratio, 0, 0);
+	draw();
+}
+
+// map layout coordinates in [-1, 1] to canvas pixels
+function toScreen(node) {
+	var size = Math.min(canvas.clientWidth, canvas.clientHeight) * 0.45;
+	return [canvas.clientWidth / 2 + (node.x * size + view.x) * view.scale,
+		canvas.clientHeight / 2 - (node.y * size - view.y) * view.scale];
+}
+
+function nodeAt(px, py) {
+	var closest = null;
+	var closestDistance = 8 * 8;
+	network.nodes.forEach(function(node) {
+		var xy = toScreen(node);
+		var distance = (xy[0] - px) * (xy[0] - px) + (xy[1] - py) * (xy[1] - py);
+		if (distance < closestDistance) {
+			closest = node;
+			closestDistance = distance;
+		}
+	});
+	return closest;
+}
+
+function draw() {
+	if (!network) {
+		return;
+	}
+	context.clearRect(0, 0, canvas.clientWidth, canvas.clientHeight);
+	network.links.forEach(function(link) {
+		var source = toScreen(network.index[link.source]);
+		var target = toScreen(network.index[link.target]);
+		var highlighted = hovered && (link.source == hovered.id || link.target == hovered.id);
+		context.globalAlpha = hovered && !highlighted ? 0.15 : 1;
+		context.strokeStyle = link.color;
+		context.lineWidth = link.width * 0.3 * Math.sqrt(view.scale);
+		context.beginPath();
+		context.moveTo(source[0], source[1]);
+		context.lineTo(target[0], target[1]);
+		context.stroke();
+	});
+	context.globalAlpha = 1;
+	context.font = "11px 'Open Sans', sans-serif";
+	context.textAlign = "center";
+	network.nodes.forEach(function(node) {
+		var xy = toScreen(node);
+		context.fillStyle = node.color;
+		context.beginPath();
+		context.arc(xy[0], xy[1], node == hovered ? 7 : 5, 0, 2 * Math.PI);
+		context.fill();
+		// labels once zoomed in, or of the author under the mouse
+		if (view.scale >= 1.5 || node == hovered || network.nodes.length <= 50) {
+			context.fillStyle = "#242424";
+			context.fillText(node.name, xy[0], xy[1] - 9);
+		}
+	});
+	if (hovered) {
+		var degree = network.links.filter(function(link) { return link.source == hovered.id || link.target == hovered.id; }).length;
+		context.textAlign = "left";
+		context.fillStyle = "#242424";
+		context.fillText(hovered.name + ": " + degree + " co-authors in this network", 10, 20);
+	}
+}
+
+canvas.addEventListener("wheel", function(e) {
+	e.preventDefault();
+	view.scale = Math.min(Math.max(view.scale * (e.deltaY < 0 ? 1.2 : 1 / 1.2), 0.5), 40);
+	draw();
+});
+
+canvas.addEventListener("mousedown", function(e) {
+	dragging = {x: e.clientX, y: e.clientY, moved: false};
+	canvas.style.cursor = "grabbing";
+});
+
+window.addEventListener("mouseup", function(e) {
+	if (dragging && !dragging.moved && hovered) {
+		// clicking an author ticks its checkbox, which shows the shared publications of two selected authors
+		$("input[name=authorcheckboxes]").filter(function() { return this.value == hovered.name; })
+			.each(function() { $(this).prop("checked", !$(this).prop("checked")).trigger("change"); });
+	}
+	dragging = null;
+	canvas.style.cursor = "grab";
+});
+
+canvas.addEventListener("mousemove", function(e) {
+	if (dragging) {
+		view.x += (e.clientX - dragging.x) / view.scale;
+		view.y += (e.clientY - dragging.y) / view.scale;
+		dragging.moved = dragging.moved || Math.abs(e.clientX - dragging.x) + Math.abs(e.clientY - dragging.y) > 0;
+		dragging.x = e.clientX;
+		dragging.y = e.clientY;
+	} else {
+		var rect = canvas.getBoundingClientRect();
+		hovered = network ? nodeAt(e.clientX - rect.left, e.clientY - rect.top) : null;
+	}
+	draw();
+});
+
+window.addEventListener("resize", resizeCanvas);
+
+fetch(canvas.dataset.src)
+.then(function(response) { return response.json(); })
+.then(function(data) {
+	data.index = {};
+	data.nodes.forEach(function(node) { data.index[node.id] = node; });
+	network = data;
+	resizeCanvas();
+});
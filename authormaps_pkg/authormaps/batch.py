@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import logging
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, Type
+
+from authormaps.cache import CacheBackend, get_cache, set_cache
+from authormaps.scheduler import FetchScheduler, get_scheduler, set_scheduler
+from authormaps.sharedwork import ApiInterface, GLOBAL_MODE, coauthor_publications
+
+logger = logging.getLogger(__name__)
+
+BATCH_STATE_FILE = 'batch.jsonl'
+DONE = 'done'
+FAILED = 'failed'
+
+Author = Tuple[str, str]    # first name, last name
+
+
+def read_authors(path: str) -> List[Author]:
+    """Return (first name, last name) of the authors listed in a text file, one per line as 'First Last' or
+    'Last, First'. Empty lines and lines starting with # are skipped, repeated authors are read once."""
+    authors = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if ',' in line:
+                last_name, first_name = (part.strip() for part in line.split(',', 1))
+            else:
+                first_name, _, last_name = line.rpartition(' ')
+            if not first_name or not last_name:
+                raise ValueError(f'Cannot read author {line!r} in {path}, expected "First Last" or "Last, First"')
+            author = (' '.join(first_name.split()), last_name)
+            if author not in authors:
+                authors.append(author)
+    return authors
+
+
+def prefetch(authors: Sequence[Author], mode: str = GLOBAL_MODE) -> Dict[Author, float]:
+    """Download the publications of every seed author and, in global mode, search all their co-authors.
+
+    Co-authors shared by several seed authors are searched once, and the searches of all seeds run together on the
+    scheduler instead of one seed after the other. Afterwards the networks are built from the cache alone.
+
+    Returns
+    -------
+        seconds spent per seed author on its own publications
+    """
+    timings = {}
+    coauthors = set()
+    for first_name, last_name in authors:
+        start = time.perf_counter()
+        author = ApiInterface(lastname=last_name, firstname=first_name)
+        coauthors.update(author.publicalistfiltered())
+        timings[(first_name, last_name)] = time.perf_counter() - start
+    if mode == GLOBAL_MODE and coauthors:
+        logger.info(f'Searching {len(coauthors)} co-authors of {len(authors)} authors')
+        list(get_scheduler().map(coauthor_publications, sorted(coauthors)))
+    return timings
+
+
+def _init_worker(cache_type: Type[CacheBackend], cache_path: str, base_url: str, api_key: str, rate: float) -> None:
+    """Let a worker process use the cache of the batch and its share of the request rate."""
+    set_cache(cache_type(cache_path))
+    set_scheduler(FetchScheduler(api_key=api_key, base_url=base_url, rate=rate, max_workers=2))
+
+
+def build_author(first_name: str, last_name: str, mode: str, directory: str, image_formats: Sequence[str] = (),
+                 dpi: int = 72) -> dict:
+    """Build, save and optionally draw the network of one author, return its line of the batch state."""
+    from authormaps.network import Visualizer
+    result = {'first_name': first_name, 'last_name': last_name, 'mode': mode}
+    start = time.perf_counter()
+    try:
+        author = ApiInterface(lastname=last_name, firstname=first_name)
+        frames = author.make_dataframe(mode=mode)
+        if frames is None:
+            message = author.messagefrontend
+            raise ValueError(message[1] if isinstance(message, tuple) else message)
+        network = Visualizer(first_name=first_name, last_name=last_name, mode=mode,
+                             node_list=frames[0], authormap_file=frames[1], postings=author.postings)
+        path = network.save(directory)
+        images = [str(path / f'network.{image_format}') for image_format in image_formats]
+        if images:
+            network.save_graph_images(images, dpi=dpi)
+        result.update(status=DONE, path=str(path), images=images, nodes=network.graph.number_of_nodes(),
+                      edges=network.graph.number_of_edges())
+    except Exception as e:
+        logger.exception(f'Network of {first_name} {last_name} failed')
+        result.update(status=FAILED, error=str(e))
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def read_state(path: str, mode: str) -> Dict[Author, dict]:
+    """Return the finished authors of an earlier run whose artifacts still exist."""
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue    # last line of an interrupted run
+                if entry['mode'] == mode and entry['status'] == DONE and Path(entry['path']).exists():
+                    done[(entry['first_name'], entry['last_name'])] = entry
+    return done
+
+
+def run_batch(authors: Iterable[Author], directory: str, mode: str = GLOBAL_MODE, processes: int = None,
+              image_formats: Sequence[str] = (), dpi: int = 72, restart: bool = False,
+              progress: Callable[[dict], None] = None) -> List[dict]:
+    """Build the networks of many authors and save them below directory.
+
+    Every finished author is appended to batch.jsonl in directory, so an interrupted batch continues with the authors
+    not done yet when it is run again. The publications are downloaded first by this process, see prefetch, then the
+    networks are built and drawn by a pool of processes sharing the cache.
+
+    Parameters
+    ----------
+    authors: Iterable[Author]
+        (first name, last name) of the authors, e.g. from read_authors
+    directory: str
+        Where the node and edge tables (and images) are saved, one directory per author.
+    mode: str
+        'global' or 'seed', see ApiInterface.make_dataframe
+    processes: int
+        Number of worker processes. Default: number of CPUs
+    image_formats: Sequence[str]
+        Formats of images drawn per author, e.g. ('png', 'svg'). Default: none
+    dpi: int
+    restart: bool
+        Build every author again, ignoring the state of an earlier run.
+    progress: Callable
+        Called with the result of every author as it finishes.
+
+    Returns
+    -------
+        results of all authors in input order, those of an earlier run have 'resumed': True
+    """
+    authors = list(authors)
+    os.makedirs(directory, exist_ok=True)
+    state_path = os.path.join(directory, BATCH_STATE_FILE)
+    if restart and os.path.exists(state_path):
+        os.remove(state_path)
+    results = {author: dict(entry, resumed=True) for author, entry in read_state(state_path, mode).items()}
+    todo = [author for author in authors if author not in results]
+    logger.info(f'Batch of {len(authors)} authors, {len(authors) - len(todo)} done before')
+
+    if todo:
+        fetch_seconds = prefetch(todo, mode)
+        processes = min(processes or os.cpu_count() or 1, len(todo))
+        scheduler, cache = get_scheduler(), get_cache()
+        # spawned workers do not inherit the open cache connection and threads of this process
+        executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_worker,
+                                       initargs=(type(cache), cache.path, scheduler.base_url, scheduler.api_key,
+                                                 scheduler.bucket.nominal_rate / processes))
+        with executor, open(state_path, 'a') as state:
+            futures = {executor.submit(build_author, first_name, last_name, mode, directory, tuple(image_formats), dpi):
+                       (first_name, last_name) for first_name, last_name in todo}
+            for future in as_completed(futures):
+                author = futures[future]
+                result = dict(future.result(), fetch_seconds=fetch_seconds.get(author, 0.0))
+                state.write(json.dumps(result) + '\n')
+                state.flush()
+                results[author] = result
+                if progress:
+                    progress(result)
+    return [results[author] for author in authors]
@@ -0,0 +1,671 @@
+import os
+import json
+import zlib
+import atexit
+import sqlite3
+import logging
+import time
+import threading
+import weakref
+import xml.etree.ElementTree as ET
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from authormaps.startup import DATA_DIR, ensure_dir
+
+logger = logging.getLogger(__name__)
+
+# MEDLINE fields kept per publication: full author names, short author names, date and journal
+RECORD_FIELDS = ('FAU', 'AU', 'DP', 'TA', 'JT')
+
+# SQLite limits the number of host parameters per statement
+SQLITE_CHUNK_SIZE = 500
+
+# bounds of the SQLite cache, 0 means no bound. Beyond them the least recently ('lru') or least frequently ('lfu') read
+# records and searches are evicted, down to PRUNE_TARGET of the bound
+CACHE_MAX_BYTES = int(float(os.getenv('AUTHORMAPS_CACHE_MAX_MB', 0)) * 2 ** 20)
+CACHE_MAX_ENTRIES = int(os.getenv('AUTHORMAPS_CACHE_MAX_ENTRIES', 0))
+CACHE_EVICTION = os.getenv('AUTHORMAPS_CACHE_EVICTION', 'lru')
+EVICTION_POLICIES = ('lru', 'lfu')
+PRUNE_TARGET = 0.9
+# seconds between the automatic prunes of a bounded cache, done by the next write
+MAINTENANCE_INTERVAL = 600
+# reads are counted in memory and written to the store every so many seconds or reads
+TOUCH_FLUSH_INTERVAL = 30
+TOUCH_FLUSH_SIZE = 10000
+# upper bounds of the age buckets reported by SQLiteCache.stats
+AGE_BUCKETS = (('1 day', 24 * 3600), ('1 week', 7 * 24 * 3600), ('30 days', 30 * 24 * 3600),
+               ('1 year', 365 * 24 * 3600))
+
+
+def compact_record(record: dict) -> dict:
+    """Return only the fields of a MEDLINE record that AuthorMaps uses."""
+    return {field: record[field] for field in RECORD_FIELDS if field in record}
+
+
+def encode(value: Any) -> bytes:
+    """Return a record or PMID list as zlib compressed JSON, as SQLiteCache stores them."""
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode())
+
+
+def decode(data) -> Any:
+    """Inverse of encode, also reading the uncompressed JSON text of stores written by older versions."""
+    if isinstance(data, bytes):
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+class CacheBackend:
+    """Interface of the stores holding esearch results and publication records.
+
+    Searches are keyed by the author query (first name followed by last name, e.g. 'SanjanaSrinivasan'),
+    records by PMID.
+    """
+
+    def get_search_entry(self, query: str) -> Optional[Tuple[List[str], float]]:
+        """Return the cached PMIDs of an author query and the time they were synced with PubMed, or None."""
+        raise NotImplementedError
+
+    def put_search(self, query: str, pubmedids: List[str], synced_at: float = None) -> None:
+        """Store the PMIDs of an author query, synced_at defaults to now."""
+        raise NotImplementedError
+
+    def get_negatives(self, keys: Iterable[str]) -> Dict[str, Tuple[int, str, float]]:
+        """Return (code, message, creation time) of the given negative entries, unknown keys are left out."""
+        raise NotImplementedError
+
+    def put_negative(self, key: str, code: int, message: str) -> None:
+        """Remember that a lookup failed, e.g. 'search:JohnDoe' with code 702."""
+        raise NotImplementedError
+
+    def put_searches(self, entries: Iterable[Tuple[str, List[str], float]]) -> None:
+        """Store many (query, PMIDs, synced_at) at once."""
+        for query, pubmedids, synced_at in entries:
+            self.put_search(query, pubmedids, synced_at)
+
+    def iter_records(self, batch_size: int = SQLITE_CHUNK_SIZE) -> Iterator[List[Tuple[str, dict]]]:
+        """Yield all records in batches of (PMID, record), without loading them at once."""
+        raise NotImplementedError
+
+    def get_search(self, query: str) -> Optional[List[str]]:
+        """Return the cached PMIDs of an author query or None."""
+        entry = self.get_search_entry(query)
+        return entry[0] if entry else None
+
+    def get_records(self, pubmedids: Iterable[str]) -> Dict[str, dict]:
+        """Return the cached records of the given PMIDs, uncached ones are left out."""
+        raise NotImplementedError
+
+    def put_records(self, records: Dict[str, dict]) -> None:
+        """Store records keyed by PMID."""
+        raise NotImplementedError
+
+    def get_record(self, pubmedid: str) -> Optional[dict]:
+        """Return the cached record of one PMID or None."""
+        return self.get_records([pubmedid]).get(pubmedid)
+
+    def missing(self, pubmedids: Iterable[str]) -> List[str]:
+        """Return the PMIDs without cached record, in order and without duplicates."""
+        pubmedids = list(dict.fromkeys(pubmedids))
+        cached = self.get_records(pubmedids)
+        return [pubmedid for pubmedid in pubmedids if pubmedid not in cached]
+
+
+class SQLiteCache(CacheBackend):
+    """Cache in a single indexed SQLite file, the default backend.
+
+    Records and PMID lists are stored zlib compressed (see encode). Reads are counted per entry, with the time of the
+    last one, and as hits and misses of the store; they are written in batches, see flush. With max_bytes or
+    max_entries the least recently or least frequently read records and searches are evicted every
+    MAINTENANCE_INTERVAL seconds, see prune. Records of ingested dumps (in the author index) are never evicted.
+
+    Parameters
+    ----------
+    path: str
+        SQLite file. Default: ~/.AuthorMaps/data/authormaps.sqlite
+    max_bytes: int
+        Size of the database the cache is pruned to. Default: $AUTHORMAPS_CACHE_MAX_MB, no bound
+    max_entries: int
+        Number of records and searches the cache is pruned to. Default: $AUTHORMAPS_CACHE_MAX_ENTRIES, no bound
+    eviction: str
+        'lru' or 'lfu'. Default: $AUTHORMAPS_CACHE_EVICTION or 'lru'
+    """
+
+    def __init__(self, path: str = None, max_bytes: int = CACHE_MAX_BYTES, max_entries: int = CACHE_MAX_ENTRIES,
+                 eviction: str = CACHE_EVICTION):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f'eviction must be one of {EVICTION_POLICIES}, not {eviction!r}')
+        self.path = path or os.path.join(DATA_DIR, 'authormaps.sqlite')
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.eviction = eviction
+        ensure_dir(os.path.dirname(os.path.abspath(self.path)))
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+        with self.lock, self.connection:
+            # only takes effect in a new store, before the first table; older stores switch with compact(full=True)
+            self.connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS records (pmid TEXT PRIMARY KEY, record TEXT NOT NULL, '
+                                    'stored_at REAL NOT NULL DEFAULT 0, accessed_at REAL NOT NULL DEFAULT 0, '
+                                    'hits INTEGER NOT NULL DEFAULT 0)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS searches (query TEXT PRIMARY KEY, pmids TEXT NOT NULL, '
+                                    'synced_at REAL NOT NULL DEFAULT 0, accessed_at REAL NOT NULL DEFAULT 0, '
+                                    'hits INTEGER NOT NULL DEFAULT 0)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS negatives (key TEXT PRIMARY KEY, code INTEGER NOT NULL, '
+                                    'message TEXT NOT NULL, created_at REAL NOT NULL)')
+            # stores created before searches were timestamped are treated as never synced, before reads were
+            # counted as never read
+            for table, column, definition in (('searches', 'synced_at', 'REAL NOT NULL DEFAULT 0'),
+                                              ('records', 'stored_at', 'REAL NOT NULL DEFAULT 0'),
+                                              ('records', 'accessed_at', 'REAL NOT NULL DEFAULT 0'),
+                                              ('records', 'hits', 'INTEGER NOT NULL DEFAULT 0'),
+                                              ('searches', 'accessed_at', 'REAL NOT NULL DEFAULT 0'),
+                                              ('searches', 'hits', 'INTEGER NOT NULL DEFAULT 0')):
+                columns = [row[1] for row in self.connection.execute(f'PRAGMA table_info({table})')]
+                if column not in columns:
+                    self.connection.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            # hits and misses of records and searches since the store was created
+            self.connection.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            # author -> PMID index filled by authormaps.ingest
+            self.connection.execute('CREATE TABLE IF NOT EXISTS authors (query TEXT NOT NULL, pmid TEXT NOT NULL, '
+                                    'PRIMARY KEY (query, pmid)) WITHOUT ROWID')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS authors_pmid ON authors (pmid)')
+        self.record_reads = Counter()   # reads not written yet, by PMID and by query
+        self.search_reads = Counter()
+        self.counters = Counter()
+        self.flushed_at = time.monotonic()
+        self.maintained_at = None
+        atexit.register(_flush_at_exit, weakref.ref(self))
+
+    def get_search_entry(self, query: str) -> Optional[Tuple[List[str], float]]:
+        with self.lock:
+            row = self.connection.execute('SELECT pmids, synced_at FROM searches WHERE query = ?', (query,)).fetchone()
+            if row:
+                self.search_reads[query] += 1
+            self.counters['search_hits' if row else 'search_misses'] += 1
+            self.__flush_if_due()
+        return (decode(row[0]), row[1]) if row else None
+
+    def put_search(self, query: str, pubmedids: List[str], synced_at: float = None) -> None:
+        self.put_searches([(query, pubmedids, synced_at)])
+
+    def put_searches(self, entries: Iterable[Tuple[str, List[str], float]]) -> None:
+        now = time.time()
+        rows = [(query, encode(list(pubmedids)), synced_at or now, now) for query, pubmedids, synced_at in entries]
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO searches (query, pmids, synced_at, accessed_at) '
+                                        'VALUES (?, ?, ?, ?)', rows)
+        self.__maintain_if_due()
+
+    def get_negatives(self, keys: Iterable[str]) -> Dict[str, Tuple[int, str, float]]:
+        keys = list(dict.fromkeys(keys))
+        negatives = {}
+        with self.lock:
+            for start in range(0, len(keys), SQLITE_CHUNK_SIZE):
+                chunk = keys[start:start + SQLITE_CHUNK_SIZE]
+                rows = self.connection.execute(
+                    f'SELECT key, code, message, created_at FROM negatives WHERE key IN ({",".join("?" * len(chunk))})',
+                    chunk)
+                negatives.update((key, (code, message, created_at)) for key, code, message, created_at in rows)
+        return negatives
+
+    def put_negative(self, key: str, code: int, message: str) -> None:
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO negatives (key, code, message, created_at) VALUES (?, ?, ?, ?)',
+                                    (key, code, message, time.time()))
+
+    def get_records(self, pubmedids: Iterable[str]) -> Dict[str, dict]:
+        pubmedids = list(dict.fromkeys(pubmedids))
+        records = {}
+        with self.lock:
+            for start in range(0, len(pubmedids), SQLITE_CHUNK_SIZE):
+                chunk = pubmedids[start:start + SQLITE_CHUNK_SIZE]
+                rows = self.connection.execute(
+                    f'SELECT pmid, record FROM records WHERE pmid IN ({",".join("?" * len(chunk))})', chunk).fetchall()
+                self.record_reads.update(pmid for pmid, _ in rows)
+                records.update((pmid, decode(record)) for pmid, record in rows)
+            self.counters['record_hits'] += len(records)
+            self.counters['record_misses'] += len(pubmedids) - len(records)
+            self.__flush_if_due()
+        return records
+
+    def put_records(self, records: Dict[str, dict]) -> None:
+        now = time.time()
+        rows = [(pmid, encode(compact_record(record)), now, now) for pmid, record in records.items()]
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO records (pmid, record, stored_at, accessed_at) '
+                                        'VALUES (?, ?, ?, ?)', rows)
+        self.__maintain_if_due()
+
+    def put_author_index(self, rows: Iterable[Tuple[str, str]]) -> None:
+        """Add (author query, PMID) pairs to the author index."""
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO authors (query, pmid) VALUES (?, ?)', rows)
+
+    def iter_author_index(self, batch_size: int = SQLITE_CHUNK_SIZE) -> Iterator[List[Tuple[str, List[str]]]]:
+        """Yield the author index in batches of (author query, PMIDs), without loading it at once."""
+        last = ''
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    'SELECT query, pmid FROM authors WHERE query IN '
+                    '(SELECT DISTINCT query FROM authors WHERE query > ? ORDER BY query LIMIT ?) ORDER BY query',
+                    (last, batch_size)).fetchall()
+            if not rows:
+                return
+            batch = {}
+            for query, pmid in rows:
+                batch.setdefault(query, []).append(pmid)
+            last = rows[-1][0]
+            yield list(batch.items())
+
+    def iter_records(self, batch_size: int = SQLITE_CHUNK_SIZE) -> Iterator[List[Tuple[str, dict]]]:
+        last = ''
+        while True:
+            with self.lock:
+                rows = self.connection.execute('SELECT pmid, record FROM records WHERE pmid > ? ORDER BY pmid LIMIT ?',
+                                               (last, batch_size)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [(pmid, decode(record)) for pmid, record in rows]
+
+    def delete_records(self, pubmedids: Iterable[str]) -> None:
+        """Remove publications deleted from PubMed from the records and the author index."""
+        pubmedids = list(dict.fromkeys(pubmedids))
+        with self.lock, self.connection:
+            for start in range(0, len(pubmedids), SQLITE_CHUNK_SIZE):
+                chunk = pubmedids[start:start + SQLITE_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                self.connection.execute(f'DELETE FROM records WHERE pmid IN ({placeholders})', chunk)
+                self.connection.execute(f'DELETE FROM authors WHERE pmid IN ({placeholders})', chunk)
+
+    def flush(self) -> None:
+        """Write the reads counted since the last flush to the store."""
+        with self.lock:
+            self.__flush()
+
+    def maintain(self) -> Dict[str, int]:
+        """Prune the cache to its bounds and give the freed pages back, see prune and compact."""
+        evicted = self.prune()
+        if evicted['records'] or evicted['searches']:
+            evicted.update(self.compact())
+            logger.info(f'Pruned cache {self.path}: {evicted}')
+        return evicted
+
+    def prune(self, max_bytes: int = None, max_entries: int = None, eviction: str = None,
+              negative_ttl: float = None) -> Dict[str, int]:
+        """Evict records and searches until the store is below PRUNE_TARGET of its bounds.
+
+        Parameters
+        ----------
+        max_bytes: int
+            Bytes of the database pages in use (without the pages freed by earlier deletes). Default: the bound of
+            the cache, 0 for none
+        max_entries: int
+            Number of records and searches. Default: the bound of the cache, 0 for none
+        eviction: str
+            'lru' evicts the entries read least recently first, 'lfu' those read least often. Default: the policy of
+            the cache
+        negative_ttl: float
+            Also delete negative entries older than this many seconds. Default: keep them
+
+        Returns
+        -------
+            number of evicted records, searches and negative entries
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_entries = self.max_entries if max_entries is None else max_entries
+        eviction = eviction or self.eviction
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f'eviction must be one of {EVICTION_POLICIES}, not {eviction!r}')
+        evicted = {'records': 0, 'searches': 0, 'negatives': 0}
+        with self.lock:
+            self.__flush()
+            if negative_ttl is not None:
+                with self.connection:
+                    evicted['negatives'] = self.connection.execute('DELETE FROM negatives WHERE created_at < ?',
+                                                                   (time.time() - negative_ttl,)).rowcount
+            entries = self.connection.execute('SELECT (SELECT COUNT(*) FROM records) + '
+                                              '(SELECT COUNT(*) FROM searches)').fetchone()[0]
+            entries_over = entries - int(max_entries * PRUNE_TARGET) if max_entries and entries > max_entries else 0
+            bytes_over = 0
+            used = self.__used_bytes()
+            if max_bytes and used > max_bytes:
+                payload = self.connection.execute(
+                    'SELECT (SELECT COALESCE(SUM(length(record)), 0) FROM records) + '
+                    '(SELECT COALESCE(SUM(length(pmids)), 0) FROM searches)').fetchone()[0]
+                # pages also hold keys, columns and indices: free the share of the payload in the bytes over
+                bytes_over = (used - max_bytes * PRUNE_TARGET) * payload / used
+            if entries_over <= 0 and bytes_over <= 0:
+                return evicted
+
+            order = 'accessed_at' if eviction == 'lru' else 'hits, accessed_at'
+            cursor = self.connection.execute(
+                'SELECT kind, key, size FROM ('
+                'SELECT 0 AS kind, pmid AS key, length(record) AS size, accessed_at, hits FROM records '
+                'WHERE pmid NOT IN (SELECT pmid FROM authors) UNION ALL '
+                f'SELECT 1, query, length(pmids), accessed_at, hits FROM searches) ORDER BY {order}')
+            victims, freed = ([], []), 0
+            for kind, key, size in cursor:
+                if len(victims[0]) + len(victims[1]) >= entries_over and freed >= bytes_over:
+                    break
+                victims[kind].append(key)
+                freed += size
+            cursor.close()
+            with self.connection:
+                for (table, column), keys in zip((('records', 'pmid'), ('searches', 'query')), victims):
+                    for start in range(0, len(keys), SQLITE_CHUNK_SIZE):
+                        chunk = keys[start:start + SQLITE_CHUNK_SIZE]
+                        self.connection.execute(f'DELETE FROM {table} WHERE {column} IN ({",".join("?" * len(chunk))})',
+                                                chunk)
+            evicted['records'], evicted['searches'] = len(victims[0]), len(victims[1])
+        return evicted
+
+    def compact(self, full: bool = False) -> Dict[str, int]:
+        """Compress the records and searches stored uncompressed by older versions and give the pages freed by
+        deletes back to the file system. full rewrites the whole file (VACUUM), which needs as much free disk space as
+        the store, and lets stores of older versions give pages back without it from then on.
+
+        Returns
+        -------
+            number of recompressed entries and bytes the files shrank by
+        """
+        recompressed = 0
+        for table, key, column in (('records', 'pmid', 'record'), ('searches', 'query', 'pmids')):
+            last = ''
+            while True:
+                with self.lock:
+                    rows = self.connection.execute(
+                        f"SELECT {key}, {column} FROM {table} WHERE {key} > ? AND typeof({column}) = 'text' "
+                        f"ORDER BY {key} LIMIT ?", (last, SQLITE_CHUNK_SIZE)).fetchall()
+                    if not rows:
+                        break
+                    last = rows[-1][0]
+                    updates = []
+                    for k, value in rows:
+                        try:
+                            updates.append((encode(decode(value)), k))
+                        except ValueError:
+                            logger.warning(f'Cannot read {table} entry {k}, see authormaps cache verify')
+                    with self.connection:
+                        self.connection.executemany(f'UPDATE {table} SET {column} = ? WHERE {key} = ?', updates)
+                recompressed += len(updates)
+        with self.lock:
+            before = self.__file_bytes()
+            if full:
+                self.connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                self.connection.execute('VACUUM')
+            else:
+                self.connection.execute('PRAGMA incremental_vacuum').fetchall()
+            self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+            return {'recompressed': recompressed, 'freed_bytes': before - self.__file_bytes()}
+
+    def stats(self) -> dict:
+        """Return the number and bytes of the entries, the hits and misses since the store was created, how many
+        entries were never read and the age distribution of records (since stored) and searches (since synced)."""
+        with self.lock:
+            self.__flush()
+            execute = self.connection.execute
+            stats = {'path': self.path, 'file_bytes': self.__file_bytes(), 'used_bytes': self.__used_bytes(),
+                     'max_bytes': self.max_bytes, 'max_entries': self.max_entries, 'eviction': self.eviction}
+            for table, column in (('records', 'record'), ('searches', 'pmids')):
+                entries, payload, compressed, never_read = execute(
+                    f"SELECT COUNT(*), COALESCE(SUM(length({column})), 0), "
+                    f"COALESCE(SUM(typeof({column}) = 'blob'), 0), COALESCE(SUM(hits = 0), 0) FROM {table}").fetchone()
+                stats[table] = {'entries': entries, 'bytes': payload, 'compressed': compressed,
+                                'never_read': never_read}
+            stats['negatives'] = execute('SELECT COUNT(*) FROM negatives').fetchone()[0]
+            stats['author_index'] = execute('SELECT COUNT(*) FROM authors').fetchone()[0]
+            counters = dict(execute('SELECT name, value FROM counters').fetchall())
+            for table, kind in (('records', 'record'), ('searches', 'search')):
+                stats[table]['hits'] = counters.get(f'{kind}_hits', 0)
+                stats[table]['misses'] = counters.get(f'{kind}_misses', 0)
+            stats['records']['ages'] = self.__ages('records', 'stored_at')
+            stats['searches']['ages'] = self.__ages('searches', 'synced_at')
+        return stats
+
+    def verify(self, repair: bool = False) -> dict:
+        """Check the database file and read every record and search.
+
+        Returns
+        -------
+            result of SQLite's quick_check ('ok' if the file is sound), the number of checked entries and the keys of
+            those that cannot be read, which are deleted with repair so they are downloaded again
+        """
+        with self.lock:
+            integrity = [row[0] for row in self.connection.execute('PRAGMA quick_check').fetchall()]
+        checks = (('records', 'pmid', 'record', lambda value: isinstance(value, dict)
+                   and isinstance(value.get('FAU', []), list)),
+                  ('searches', 'query', 'pmids', lambda value: isinstance(value, list)
+                   and all(isinstance(pmid, str) for pmid in value)))
+        checked, corrupt = {}, {}
+        for table, key, column, check in checks:
+            checked[table], corrupt[table], last = 0, [], ''
+            while True:
+                with self.lock:
+                    rows = self.connection.execute(f'SELECT {key}, {column} FROM {table} WHERE {key} > ? ORDER BY {key} '
+                                                   f'LIMIT ?', (last, SQLITE_CHUNK_SIZE)).fetchall()
+                if not rows:
+                    break
+                last = rows[-1][0]
+                checked[table] += len(rows)
+                for k, value in rows:
+                    try:
+                        readable = check(decode(value))
+                    except (ValueError, TypeError, zlib.error):
+                        readable = False
+                    if not readable:
+                        corrupt[table].append(k)
+            if repair and corrupt[table]:
+                with self.lock, self.connection:
+                    self.connection.executemany(f'DELETE FROM {table} WHERE {key} = ?', [(k,) for k in corrupt[table]])
+        return {'integrity': ', '.join(integrity), 'checked': checked, 'corrupt': corrupt}
+
+    def __flush(self) -> None:
+        """Write the counted reads, the lock must be held."""
+        now = time.time()
+        with self.connection:
+            self.connection.executemany('UPDATE records SET accessed_at = ?, hits = hits + ? WHERE pmid = ?',
+                                        [(now, n, pmid) for pmid, n in self.record_reads.items()])
+            self.connection.executemany('UPDATE searches SET accessed_at = ?, hits = hits + ? WHERE query = ?',
+                                        [(now, n, query) for query, n in self.search_reads.items()])
+            self.connection.executemany('INSERT INTO counters (name, value) VALUES (?, ?) '
+                                        'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+                                        list(self.counters.items()))
+        self.record_reads.clear()
+        self.search_reads.clear()
+        self.counters.clear()
+        self.flushed_at = time.monotonic()
+
+    def __flush_if_due(self) -> None:
+        """Write the counted reads every TOUCH_FLUSH_INTERVAL seconds or TOUCH_FLUSH_SIZE entries read, the lock must
+        be held."""
+        if (len(self.record_reads) + len(self.search_reads) >= TOUCH_FLUSH_SIZE
+                or time.monotonic() - self.flushed_at >= TOUCH_FLUSH_INTERVAL):
+            self.__flush()
+
+    def __maintain_if_due(self) -> None:
+        if not (self.max_bytes or self.max_entries):
+            return
+        with self.lock:
+            now = time.monotonic()
+            if self.maintained_at is not None and now - self.maintained_at < MAINTENANCE_INTERVAL:
+                return
+            self.maintained_at = now
+        self.maintain()
+
+    def __used_bytes(self) -> int:
+        """Bytes of the database pages holding data, the lock must be held."""
+        pages, free, page_size = (self.connection.execute(f'PRAGMA {pragma}').fetchone()[0]
+                                  for pragma in ('page_count', 'freelist_count', 'page_size'))
+        return (pages - free) * page_size
+
+    def __file_bytes(self) -> int:
+        return sum(os.path.getsize(path) for path in (self.path, self.path + '-wal') if os.path.exists(path))
+
+    def __ages(self, table: str, column: str) -> Dict[str, int]:
+        """Return the number of entries per age bucket, 'unknown' for entries of older versions without time."""
+        now = time.time()
+        cases = ' '.join(f'WHEN {column} >= ? THEN {i}' for i in range(len(AGE_BUCKETS)))
+        rows = self.connection.execute(
+            f'SELECT CASE WHEN {column} = 0 THEN -1 {cases} ELSE {len(AGE_BUCKETS)} END AS bucket, COUNT(*) '
+            f'FROM {table} GROUP BY bucket', [now - seconds for _, seconds in AGE_BUCKETS]).fetchall()
+        counts = dict(rows)
+        labels = [f'< {label}' for label, _ in AGE_BUCKETS] + [f'> {AGE_BUCKETS[-1][0]}']
+        ages = {label: counts.get(i, 0) for i, label in enumerate(labels)}
+        if counts.get(-1):
+            ages['unknown'] = counts[-1]
+        return ages
+
+
+class JSONDirCache(CacheBackend):
+    """Legacy cache with one file per search ({query}.xml ids as json) and per publication ({pmid}.json)."""
+
+    def __init__(self, path: str = None):
+        self.path = ensure_dir(path or DATA_DIR)
+
+    def get_search_entry(self, query: str) -> Optional[Tuple[List[str], float]]:
+        path = os.path.join(self.path, f'{query}.ids.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f), os.path.getmtime(path)
+        xml_path = os.path.join(self.path, f'{query}.xml')
+        if os.path.exists(xml_path):
+            return _ids_from_esearch_xml(xml_path), os.path.getmtime(xml_path)
+        return None
+
+    def put_search(self, query: str, pubmedids: List[str], synced_at: float = None) -> None:
+        path = os.path.join(self.path, f'{query}.ids.json')
+        with open(path, 'w') as f:
+            json.dump(list(pubmedids), f)
+        if synced_at:
+            os.utime(path, (synced_at, synced_at))
+
+    def get_negatives(self, keys: Iterable[str]) -> Dict[str, Tuple[int, str, float]]:
+        negatives = {}
+        for key in dict.fromkeys(keys):
+            path = os.path.join(self.path, f'{key.replace(":", "_")}.negative.json')
+            if os.path.exists(path):
+                with open(path) as f:
+                    code, message = json.load(f)
+                negatives[key] = (code, message, os.path.getmtime(path))
+        return negatives
+
+    def put_negative(self, key: str, code: int, message: str) -> None:
+        with open(os.path.join(self.path, f'{key.replace(":", "_")}.negative.json'), 'w') as f:
+            json.dump([code, message], f)
+
+    def get_records(self, pubmedids: Iterable[str]) -> Dict[str, dict]:
+        records = {}
+        for pubmedid in dict.fromkeys(pubmedids):
+            path = os.path.join(self.path, f'{pubmedid}.json')
+            if os.path.exists(path):
+                with open(path) as f:
+                    records[pubmedid] = json.load(f)
+        return records
+
+    def put_records(self, records: Dict[str, dict]) -> None:
+        for pubmedid, record in records.items():
+            with open(os.path.join(self.path, f'{pubmedid}.json'), 'w') as f:
+                json.dump(compact_record(record), f)
+
+    def iter_records(self, batch_size: int = SQLITE_CHUNK_SIZE) -> Iterator[List[Tuple[str, dict]]]:
+        batch = []
+        for entry in os.scandir(self.path):
+            stem, extension = os.path.splitext(entry.name)
+            if extension == '.json' and stem.isdigit():
+                with open(entry.path) as f:
+                    batch.append((stem, json.load(f)))
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+
+BACKENDS = {'sqlite': SQLiteCache, 'json': JSONDirCache}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> CacheBackend:
+    """Return the cache of this process, the backend is chosen by $AUTHORMAPS_CACHE ('sqlite' or 'json')."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BACKENDS[os.getenv('AUTHORMAPS_CACHE', 'sqlite')]()
+        return _cache
+
+
+def set_cache(cache: Optional[CacheBackend]) -> None:
+    """Replace the cache of this process, None falls back to the default on next access."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def _flush_at_exit(reference: weakref.ref) -> None:
+    """Write the reads counted by a cache still open when the process exits."""
+    cache = reference()
+    if cache is not None:
+        try:
+            cache.flush()
+        except sqlite3.Error:
+            pass
+
+
+def _ids_from_esearch_xml(path: str) -> List[str]:
+    """Return the PMIDs of a saved esearch response."""
+    return [element.text for element in ET.parse(path).getroot().iterfind('IdList/Id')]
+
+
+def migrate_data_dir(data_dir: str = DATA_DIR, cache: CacheBackend = None, remove: bool = False) -> Dict[str, int]:
+    """Copy the per-file cache of data_dir ({pmid}.json and {First}{Last}.xml) into cache.
+
+    Parameters
+    ----------
+    data_dir: str
+        Directory holding the legacy cache files.
+    cache: CacheBackend
+        Target cache. Default: the cache of this process.
+    remove: bool
+        Delete every migrated file. Default: False
+
+    Returns
+    -------
+        number of migrated records and searches
+    """
+    cache = cache or get_cache()
+    counts = {'records': 0, 'searches': 0}
+    migrated = []
+    batch = {}
+    for entry in os.scandir(data_dir):
+        stem, extension = os.path.splitext(entry.name)
+        try:
+            if extension == '.json' and stem.isdigit():
+                with open(entry.path) as f:
+                    batch[stem] = json.load(f)
+            elif extension == '.xml':
+                cache.put_search(stem, _ids_from_esearch_xml(entry.path), synced_at=entry.stat().st_mtime)
+                counts['searches'] += 1
+            else:
+                continue
+        except (ValueError, OSError, ET.ParseError) as e:
+            logger.warning(f'Could not migrate {entry.path}: {e}')
+            continue
+        migrated.append(entry.path)
+        if len(batch) >= SQLITE_CHUNK_SIZE:
+            cache.put_records(batch)
+            counts['records'] += len(batch)
+            batch = {}
+    if batch:
+        cache.put_records(batch)
+        counts['records'] += len(batch)
+
+    if remove:
+        for path in migrated:
+            os.remove(path)
+    return counts
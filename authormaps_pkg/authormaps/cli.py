@@ -1,12 +1,18 @@
 import os
 import sys
+import time
 import click
-from authormaps.sharedwork import ApiInterface
-from authormaps.network import Network, Visualizer
+from authormaps.sharedwork import ApiInterface, MODES
+from authormaps.startup import configure_logging
+from authormaps.metrics import get_metrics
 
 @click.group()
-def cli():
-    pass
+@click.option('--profile', default=False, is_flag=True, help="Print the time spent per stage (requests, cache, pair counting, layout, render) after the command.")
+@click.pass_context
+def cli(ctx, profile: bool):
+    if profile:
+        start = time.perf_counter()
+        ctx.call_on_close(lambda: click.echo(get_metrics().report(wall=time.perf_counter() - start), err=True))
 
 @cli.command(name="getpubmedidlist")
 @click.argument("lastname", type=str)
@@ -65,9 +71,15 @@ def get_every_author_connection(lastname,firstname):
 @click.argument("output")
 @click.option('-i', '--dpi', default=72, help="Specifies the resolution of network graph.")
 @click.option('-b', '--label', default=False, is_flag=True, help="Show the number of shared publications as edge label.")
-def create(first_name: str, last_name: str, output: str, label: bool, dpi: int):
+@click.option('-m', '--mode', default='global', type=click.Choice(MODES), help="'global' counts all publications of the co-authors, 'seed' only those of the queried author (fast, no extra requests).")
+@click.option('-r', '--rebuild', default=False, is_flag=True, help="Compute the network again instead of loading the saved one.")
+def create(first_name: str, last_name: str, output: str, label: bool, dpi: int, mode: str, rebuild: bool):
     """Create a author mapping network."""
-    network = Visualizer(first_name=first_name, last_name=last_name)
+    from authormaps.network import Visualizer
+    network = None if rebuild else Visualizer.load(first_name=first_name, last_name=last_name, mode=mode)
+    if network is None:
+        network = Visualizer(first_name=first_name, last_name=last_name, mode=mode)
+        network.save()
     graph = network.generate_graph_image(graph_output_path=output, dpi=dpi, with_edge_labels=label)
     click.echo(f"Save graph at {os.path.abspath(output)}")
 
@@ -78,20 +90,258 @@ def create(first_name: str, last_name: str, output: str, label: bool, dpi: int):
 @click.option('-a1', '--author1', default=None, help="One author to be query shared publications. e.g., 'Bruce Schultz'")
 @click.option('-a2', '--author2', default=None, help="The other author to be query shared publications. e.g., 'Joshua Lederberg'")
 @click.option('-o', '--output', default=None, help="Path to save data in node-link format.")
-def compile(first_name: str, last_name: str, output: str, author1: str, author2: str):
+@click.option('-m', '--mode', default='global', type=click.Choice(MODES), help="'global' counts all publications of the co-authors, 'seed' only those of the queried author (fast, no extra requests).")
+@click.option('-r', '--rebuild', default=False, is_flag=True, help="Compute the network again instead of loading the saved one.")
+@click.option('-p', '--pmids', default=False, is_flag=True, help="Also list the shared publications (PMIDs) of author1 and author2, newest first.")
+@click.option('--page', default=1, type=click.IntRange(min=1), help="Page of the PMIDs listed by --pmids.")
+@click.option('--page-size', default=20, type=click.IntRange(min=1), help="Number of PMIDs per page.")
+def compile(first_name: str, last_name: str, output: str, author1: str, author2: str, mode: str, rebuild: bool,
+            pmids: bool, page: int, page_size: int):
     """Calculate how many shared publications."""
-    network = Network(first_name=first_name, last_name=last_name)
+    from authormaps.network import Network
+    network = None if rebuild else Network.load(first_name=first_name, last_name=last_name, mode=mode)
+    if network is None:
+        network = Network(first_name=first_name, last_name=last_name, mode=mode)
+        network.save()
     if author1 and author2:
         click.echo(f"Author 1: {author1}")
         click.echo(f"Author 2: {author2}")
         click.echo(f"No. shared publication: {network.get_shared_publication(author1, author2)}")
+        if pmids:
+            shared = network.get_shared_pmids(author1, author2, page=page, page_size=page_size)
+            if shared is None:
+                click.echo("The saved network has no PMIDs, build it again with --rebuild")
+            else:
+                total = network.count_shared_pmids(author1, author2)
+                pages = max(1, -(-total // page_size))
+                click.echo(f"PMIDs (page {page} of {pages}): {' '.join(shared)}")
     if output:
         network.generate_node_link_data(filepath=output)
         click.echo(f"Save file at {os.path.abspath(output)}")
 
 
+@cli.command()
+@click.argument("first_name")
+@click.argument("last_name")
+@click.option('-m', '--mode', default='global', type=click.Choice(MODES), help="'global' counts all publications of the co-authors, 'seed' only those of the queried author (fast, no extra requests).")
+def refresh(first_name: str, last_name: str, mode: str):
+    """Update the saved network of an author with what changed since the last snapshot."""
+    from authormaps.snapshot import NetworkState
+    state = NetworkState.load(first_name, last_name, mode)
+    if state is None:
+        state = NetworkState.build(first_name, last_name, mode)
+        if not state.publication_authors:
+            click.echo(f"No network found for {first_name} {last_name}")
+            return
+        click.echo(f"Built network with {len(state.coauthors)} co-authors and {len(state.pairs)} edges")
+    else:
+        summary = state.refresh()
+        click.echo(f"{summary['publications']} new publications, {summary['coauthors']} new co-authors, "
+                   f"{summary['edges']} changed edges")
+    path = state.save()
+    click.echo(f"Saved snapshot {state.version} at {path}")
+
+
+@cli.command()
+@click.option('-d', '--data-dir', default=None, help="Directory of the per-file cache. Default: ~/.AuthorMaps/data")
+@click.option('--remove', default=False, is_flag=True, help="Delete the files after migrating them.")
+def migrate(data_dir: str, remove: bool):
+    """Move the per-file cache (PMID json and author xml files) into the cache store."""
+    from authormaps.cache import migrate_data_dir
+    from authormaps.startup import DATA_DIR
+    counts = migrate_data_dir(data_dir=data_dir or DATA_DIR, remove=remove)
+    click.echo(f"Migrated {counts['records']} publications and {counts['searches']} author searches")
+
+
+@cli.command()
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('-p', '--processes', default=None, type=int, help="Number of parsing processes. Default: number of CPUs")
+def ingest(paths: tuple, processes: int):
+    """Load local PubMed baseline/update XML dumps (files or directories of *.xml.gz) into the cache.
+    Set AUTHORMAPS_OFFLINE=1 afterwards to answer every search from the cache."""
+    from authormaps.ingest import ingest as ingest_dumps
+    stats = ingest_dumps(paths, processes=processes,
+                         progress=lambda path, n: click.echo(f"{os.path.basename(path)}: {n} publications"))
+    click.echo(f"Ingested {stats['records']} publications ({stats['deleted']} deleted) from {stats['files']} files "
+               f"and indexed {stats['authors']} authors in {stats['seconds']:.1f} s, "
+               f"{stats['records_per_second']:.0f} records/s")
+
+
+@cli.command()
+@click.argument("first_name")
+@click.argument("last_name")
+@click.argument("output")
+@click.option('-d', '--depth', default=2, type=click.IntRange(min=1), help="Hops from the author, 2 adds the co-authors of co-authors.")
+@click.option('--max-requests', default=None, type=int, help="Stop crawling after about this many PubMed requests.")
+@click.option('--max-seconds', default=None, type=float, help="Stop crawling after about this many seconds.")
+@click.option('--max-authors', default=None, type=int, help="Crawl the publications of at most this many authors.")
+@click.option('-i', '--dpi', default=72, help="Specifies the resolution of network graph.")
+@click.option('-b', '--label', default=False, is_flag=True, help="Show the number of shared publications as edge label.")
+@click.option('--restart', default=False, is_flag=True, help="Crawl again instead of continuing from the checkpoint.")
+def expand(first_name: str, last_name: str, output: str, depth: int, max_requests: int, max_seconds: float,
+           max_authors: int, dpi: int, label: bool, restart: bool):
+    """Create the network of an author up to depth hops, e.g. with the co-authors of co-authors.
+    The crawl is checkpointed in ~/.AuthorMaps/expansions, running it again continues where a budget stopped it."""
+    from authormaps.expand import Expansion
+    from authormaps.network import Visualizer
+    checkpoint = Expansion.checkpoint_path(first_name, last_name, depth)
+    if restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    expansion = Expansion(first_name, last_name, depth=depth, max_requests=max_requests, max_seconds=max_seconds,
+                          max_authors=max_authors, checkpoint=checkpoint, progress=lambda m: click.echo(m, err=True)).run()
+    frames = expansion.to_dataframes()
+    click.echo(f"Crawled {len(expansion.crawled)} authors with {expansion.requests} requests in "
+               f"{expansion.seconds:.1f} s, {len(expansion.queued)} left"
+               + (f" ({expansion.exhausted} budget exhausted, run again to continue)" if expansion.exhausted else ""))
+    if frames is None:
+        click.echo(f"No network found for {first_name} {last_name}: {expansion.messagefrontend}")
+        return
+    network = Visualizer(first_name=first_name, last_name=last_name, node_list=frames[0], authormap_file=frames[1],
+                         postings=expansion.postings)
+    click.echo(f"{network.graph.number_of_nodes()} nodes, {network.graph.number_of_edges()} edges")
+    network.generate_graph_image(graph_output_path=output, dpi=dpi, with_edge_labels=label)
+    click.echo(f"Save graph at {os.path.abspath(output)}")
+
+
+@cli.command()
+@click.argument("authors_file", type=click.Path(exists=True, dir_okay=False))
+@click.option('-o', '--output-dir', default=None, help="Where the networks are saved. Default: ~/.AuthorMaps/artifacts, where create and compile find them")
+@click.option('-m', '--mode', default='global', type=click.Choice(MODES), help="'global' counts all publications of the co-authors, 'seed' only those of the queried author (fast, no extra requests).")
+@click.option('-p', '--processes', default=None, type=int, help="Number of processes building the networks. Default: number of CPUs")
+@click.option('-f', '--image-format', multiple=True, type=click.Choice(('png', 'jpg', 'pdf', 'svg')), help="Also draw every network in this format, can be repeated.")
+@click.option('-i', '--dpi', default=72, help="Specifies the resolution of the images.")
+@click.option('--restart', default=False, is_flag=True, help="Build every author again instead of continuing an earlier run.")
+def batch(authors_file: str, output_dir: str, mode: str, processes: int, image_format: tuple, dpi: int, restart: bool):
+    """Build the networks of all authors in a file, one 'First Last' or 'Last, First' per line.
+    An interrupted batch continues where it stopped when run again."""
+    from authormaps.batch import read_authors, run_batch, DONE
+    from authormaps.network import ARTIFACT_DIR
+    authors = read_authors(authors_file)
+    start = time.perf_counter()
+    results = run_batch(authors, output_dir or ARTIFACT_DIR, mode=mode, processes=processes, image_formats=image_format,
+                        dpi=dpi, restart=restart,
+                        progress=lambda r: click.echo(f"{r['first_name']} {r['last_name']}: {r['status']}"))
+    click.echo(f"\n{'author':<32} {'status':<8} {'nodes':>6} {'edges':>7} {'fetch s':>8} {'build s':>8}")
+    for r in results:
+        status = 'resumed' if r.get('resumed') else r['status']
+        click.echo(f"{r['first_name'] + ' ' + r['last_name']:<32} {status:<8} {r.get('nodes', '-'):>6} "
+                   f"{r.get('edges', '-'):>7} {r.get('fetch_seconds', 0):>8.2f} {r['seconds']:>8.2f}"
+                   + (f"  {r['error']}" if 'error' in r else ''))
+    done = sum(r['status'] == DONE for r in results)
+    click.echo(f"{done} of {len(results)} networks done in {time.perf_counter() - start:.1f} s")
+
+
+@cli.command()
+@click.argument("authors_file", required=False, type=click.Path(exists=True, dir_okay=False))
+@click.option('-a', '--author', multiple=True, help="Also warm this author, 'First Last', can be repeated.")
+@click.option('-m', '--mode', default='global', type=click.Choice(MODES), help="'global' counts all publications of the co-authors, 'seed' only those of the queried author (fast, no extra requests).")
+@click.option('-c', '--coauthors', default=None, type=click.IntRange(min=0), help="Also warm this many co-authors with most shared publications per author. Default: $AUTHORMAPS_WARM_COAUTHORS or 5")
+def warm(authors_file: str, author: tuple, mode: str, coauthors: int):
+    """Fill the caches for the authors in a file (default: $AUTHORMAPS_HOT_AUTHORS) and their top co-authors,
+    so their searches are fast."""
+    from authormaps.batch import read_authors
+    from authormaps.warm import warm_authors, HOT_AUTHORS, WARM_COAUTHORS
+    authors_file = authors_file or HOT_AUTHORS
+    authors = read_authors(authors_file) if authors_file else []
+    for name in author:
+        first_name, _, last_name = name.strip().rpartition(' ')
+        if not first_name:
+            raise click.BadParameter(f"expected 'First Last', not {name!r}", param_hint='--author')
+        authors.append((first_name, last_name))
+    if not authors:
+        raise click.UsageError('No authors to warm, give an authors file, --author or set AUTHORMAPS_HOT_AUTHORS')
+    start = time.perf_counter()
+
+    def progress(author, state):
+        click.echo(f"{author[0]} {author[1]}: {len(state.coauthors)} co-authors, {len(state.pairs)} edges")
+
+    warmed = warm_authors(authors, mode, WARM_COAUTHORS if coauthors is None else coauthors, progress=progress)
+    click.echo(f"Warmed {len(warmed)} authors in {time.perf_counter() - start:.1f} s")
+
+
+@cli.command()
+@click.argument("lastname", type=str)
+@click.argument("firstname", type=str)
+@click.option('-n', '--limit', default=10, help="Maximal number of names listed.")
+def similar(lastname: str, firstname: str, limit: int):
+    """List the authors in the cache whose names are similar to the given one, e.g. other spellings or initials."""
+    from authormaps.names import get_name_index, display_name
+    for name, score in get_name_index().similar(f'{lastname} {firstname}', limit=limit):
+        click.echo(f"{score:6.3f}  {display_name(name)}")
+
+
+@cli.group()
+def cache():
+    """Inspect, bound and check the cache of searches and publications."""
+
+
+def sqlite_cache():
+    from authormaps.cache import get_cache, SQLiteCache
+    store = get_cache()
+    if not isinstance(store, SQLiteCache):
+        raise click.UsageError("Only the SQLite cache can be managed, move the per-file cache into it with 'authormaps migrate'")
+    return store
+
+
+def megabytes(n: int) -> str:
+    return f"{n / 2 ** 20:.1f} MB"
+
+
+@cache.command()
+def stats():
+    """Report entries, sizes, hit rates and ages of the cache."""
+    s = sqlite_cache().stats()
+    bounds = ', '.join(filter(None, [s['max_bytes'] and f"{megabytes(s['max_bytes'])}",
+                                     s['max_entries'] and f"{s['max_entries']} entries"])) or 'none'
+    click.echo(f"{s['path']}: {megabytes(s['file_bytes'])} on disk, {megabytes(s['used_bytes'])} in use, "
+               f"bounds: {bounds} ({s['eviction']})")
+    click.echo(f"\n{'':<10} {'entries':>9} {'size':>10} {'compressed':>10} {'never read':>10} {'hits':>9} {'misses':>9} "
+               f"{'hit rate':>8}")
+    for table in ('records', 'searches'):
+        t = s[table]
+        lookups = t['hits'] + t['misses']
+        hit_rate = f"{t['hits'] / lookups:.1%}" if lookups else '-'
+        click.echo(f"{table:<10} {t['entries']:>9} {megabytes(t['bytes']):>10} {t['compressed']:>10} "
+                   f"{t['never_read']:>10} {t['hits']:>9} {t['misses']:>9} {hit_rate:>8}")
+    click.echo(f"{s['negatives']} negative entries, {s['author_index']} entries in the author index of ingested dumps")
+    for table, since in (('records', 'stored'), ('searches', 'synced')):
+        click.echo(f"\nage of {table} (since {since}): "
+                   + ', '.join(f"{label}: {n}" for label, n in s[table]['ages'].items()))
+
+
+@cache.command()
+@click.option('--max-mb', default=None, type=float, help="Prune the database to this size. Default: $AUTHORMAPS_CACHE_MAX_MB, no bound")
+@click.option('--max-entries', default=None, type=int, help="Prune to this many records and searches. Default: $AUTHORMAPS_CACHE_MAX_ENTRIES, no bound")
+@click.option('-e', '--eviction', default=None, type=click.Choice(('lru', 'lfu')), help="Evict the least recently (lru) or least frequently (lfu) read entries first. Default: $AUTHORMAPS_CACHE_EVICTION or lru")
+@click.option('--full', default=False, is_flag=True, help="Rewrite the whole file afterwards (VACUUM), needs as much free disk space as the cache.")
+def prune(max_mb: float, max_entries: int, eviction: str, full: bool):
+    """Evict entries down to the bounds, drop expired negative entries and compact the file."""
+    from authormaps.policy import NEGATIVE_TTL
+    store = sqlite_cache()
+    evicted = store.prune(max_bytes=None if max_mb is None else int(max_mb * 2 ** 20), max_entries=max_entries,
+                          eviction=eviction, negative_ttl=NEGATIVE_TTL)
+    compacted = store.compact(full=full)
+    click.echo(f"Evicted {evicted['records']} records, {evicted['searches']} searches and {evicted['negatives']} "
+               f"expired negative entries, compressed {compacted['recompressed']} entries of older versions, "
+               f"{megabytes(compacted['freed_bytes'])} freed")
+
+
+@cache.command()
+@click.option('--repair', default=False, is_flag=True, help="Delete the entries that cannot be read, they are downloaded again when needed.")
+def verify(repair: bool):
+    """Check the cache file and read every record and search."""
+    result = sqlite_cache().verify(repair=repair)
+    click.echo(f"integrity: {result['integrity']}")
+    for table, keys in result['corrupt'].items():
+        click.echo(f"{table}: {result['checked'][table]} checked, {len(keys)} unreadable"
+                   + (f" ({', '.join(keys[:10])}{', ...' if len(keys) > 10 else ''})" if keys else '')
+                   + (' and deleted' if keys and repair else ''))
+    if result['integrity'] != 'ok' or (not repair and any(result['corrupt'].values())):
+        sys.exit(1)
+
 
 def main():
+    configure_logging()
     cli()
 
 
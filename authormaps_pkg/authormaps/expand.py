@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from authormaps.startup import PROJECT_DIR, ensure_dir
+from authormaps.metrics import get_metrics, span
+from authormaps.names import canonical_key
+from authormaps.sharedwork import ApiInterface, author_query
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = os.path.join(PROJECT_DIR, 'expansions')
+# seconds between checkpoint writes during a run, every write holds all publications collected so far
+CHECKPOINT_INTERVAL = float(os.getenv('AUTHORMAPS_CHECKPOINT_INTERVAL', 30))
+# authors crawled at the same time, their requests share the rate limit of the scheduler. The crawls run on their
+# own threads because every crawl downloads its publications on the scheduler's thread pool.
+EXPAND_WORKERS = 4
+# budgets that can stop an expansion
+REQUESTS = 'requests'
+SECONDS = 'seconds'
+AUTHORS = 'authors'
+
+
+def requests_made() -> int:
+    """Return the number of E-utilities requests this process has sent, see authormaps.metrics."""
+    _, counters = get_metrics().snapshot()
+    return int(sum(value for (name, _), value in counters.items() if name == 'requests'))
+
+
+def split_author(full_name: str) -> Tuple[str, str]:
+    """Return last name and first names of an author as in the author lists, e.g. 'Schultz Bruce J'."""
+    return full_name.split(' ')[0], ' '.join(full_name.split(' ')[1:])
+
+
+class Expansion:
+    """Multi-hop co-author network of a seed author, crawled outward breadth-first.
+
+    Crawling an author downloads their publications (see ApiInterface.publicalistfiltered), whose authors become nodes
+    and are queued to be crawled in turn while their hop is below depth. Depth 1 is the network of the seed mode, depth
+    2 adds the co-authors of co-authors. Within a hop the strongest ties are crawled first: authors on most of the
+    publications collected so far. Edges count the shared publications among all collected publications.
+
+    Budgets stop the crawl early, what is collected is still a network. With a checkpoint file the state is saved after
+    a round every CHECKPOINT_INTERVAL seconds and when the run ends, so running the same expansion again continues
+    with the queued authors and a fresh budget.
+
+    Parameters
+    ----------
+    first_name: str
+    last_name: str
+    depth: int
+        Hops from the seed to the outermost nodes. Default: 2
+    max_requests: int
+        Stop after about this many E-utilities requests per run (a round of crawls is finished). Default: no limit
+    max_seconds: float
+        Stop after about this many seconds per run. Default: no limit
+    max_authors: int
+        Crawl at most this many authors including the seed. Default: no limit
+    checkpoint: str
+        JSON file the state is saved to and resumed from. Default: none
+    progress: Callable
+        Called with a message after every round
+    """
+
+    def __init__(self, first_name: str, last_name: str, depth: int = 2, max_requests: int = None,
+                 max_seconds: float = None, max_authors: int = None, checkpoint: str = None,
+                 progress: Callable = None):
+        if depth < 1:
+            raise ValueError(f'depth must be at least 1, not {depth}')
+        self.first_name = first_name
+        self.last_name = last_name
+        self.depth = depth
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self.max_authors = max_authors
+        self.checkpoint = checkpoint
+        self.progress = progress
+        self.messagefrontend = None
+        self.seed_pubmedids = []        # publications of the seed author
+        self.seed_all_authors = []      # authors of every publication found for the seed, for the name collision hints
+        self.crawled = {}               # author -> hop
+        self.queued = {}                # canonical key -> (hop, author) found but not crawled yet
+        self.strength = {}              # author -> number of collected publications
+        self.publication_authors = {}   # PMID -> authors, of all crawled authors
+        self.consortium_pubmedids = set()
+        self.requests = 0               # requests and seconds spent by all runs
+        self.seconds = 0.0
+        self.exhausted = None           # budget that stopped the last run, None if the crawl is complete
+        self.postings = None            # shared PMIDs of the edges, set by to_dataframes
+
+    @classmethod
+    def checkpoint_path(cls, first_name: str, last_name: str, depth: int, directory: str = CHECKPOINT_DIR) -> str:
+        return os.path.join(directory, f'{author_query(last_name, first_name)}_depth{depth}.json')
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted({a for authorlist in self.publication_authors.values() for a in authorlist})
+
+    def run(self) -> "Expansion":
+        """Crawl until every author up to depth is collected or a budget is exhausted, resuming from the checkpoint."""
+        self.__load_checkpoint()
+        start, requests_start = time.monotonic(), requests_made()
+        requests_before, seconds_before = self.requests, self.seconds
+        self.exhausted = None
+
+        if not self.crawled:
+            seed = ApiInterface(self.last_name, self.first_name, progress=self.progress)
+            with span('expand_crawl'):
+                seed.publicalistfiltered()
+            self.messagefrontend = seed.messagefrontend
+            self.seed_pubmedids = seed.pubmedidlist or []
+            self.seed_all_authors = seed.nodelistunique_filter or []
+            self.__add(f'{self.last_name.capitalize()} {self.first_name.capitalize()}', 0, seed)
+
+        saved_at = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=EXPAND_WORKERS, thread_name_prefix='authormaps-expand') as executor:
+                while self.queued:
+                    self.exhausted = self.__exhausted_budget(time.monotonic() - start, requests_made() - requests_start)
+                    if self.exhausted:
+                        break
+                    round_size = EXPAND_WORKERS
+                    if self.max_authors is not None:
+                        round_size = min(round_size, self.max_authors - len(self.crawled))
+                    # breadth-first, strongest ties first
+                    batch = heapq.nsmallest(round_size, self.queued.values(),
+                                            key=lambda item: (item[0], -self.strength.get(item[1], 0), item[1]))
+                    with span('expand_crawl'):
+                        apis = list(executor.map(lambda item: self.crawl(item[1]), batch))
+                    for (hop, author), api in zip(batch, apis):
+                        del self.queued[canonical_key(author)]
+                        self.__add(author, hop, api)
+                    self.requests = requests_before + requests_made() - requests_start
+                    self.seconds = seconds_before + time.monotonic() - start
+                    if time.monotonic() - saved_at >= CHECKPOINT_INTERVAL:
+                        self.save()
+                        saved_at = time.monotonic()
+                    if self.progress is not None:
+                        self.progress(f'crawled {len(self.crawled)} authors, {len(self.queued)} queued, '
+                                      f'{len(self.publication_authors)} publications')
+        finally:
+            # also when a crawl failed or was interrupted, the rounds before it are kept
+            self.requests = requests_before + requests_made() - requests_start
+            self.seconds = seconds_before + time.monotonic() - start
+            self.save()
+        logger.info(f'Expanded {self.first_name} {self.last_name} to {len(self.crawled)} crawled authors, '
+                    f'{len(self.queued)} left, budget exhausted: {self.exhausted}')
+        return self
+
+    @staticmethod
+    def crawl(author: str) -> ApiInterface:
+        """Collect the publications of one author."""
+        lastname, firstname = split_author(author)
+        api = ApiInterface(lastname, firstname)
+        api.publicalistfiltered()
+        return api
+
+    def __add(self, author: str, hop: int, api: ApiInterface) -> None:
+        """Collect the publications of a crawled author and queue their unknown co-authors."""
+        self.crawled[author] = hop
+        self.consortium_pubmedids.update(api.consortium_pubmedids)
+        for pubmedid, authorlist in api.publication_authors.items():
+            if pubmedid in self.publication_authors:
+                continue
+            self.publication_authors[pubmedid] = authorlist
+            for a in authorlist:
+                self.strength[a] = self.strength.get(a, 0) + 1
+        if hop + 1 >= self.depth:
+            return
+        known = {canonical_key(a) for a in self.crawled}
+        for a in api.nodelistunique or []:
+            key = canonical_key(a)
+            if key not in known and key not in self.queued:
+                self.queued[key] = (hop + 1, a)
+
+    def __exhausted_budget(self, seconds: float, requests: int) -> Optional[str]:
+        if self.max_authors is not None and len(self.crawled) >= self.max_authors:
+            return AUTHORS
+        if self.max_seconds is not None and seconds >= self.max_seconds:
+            return SECONDS
+        if self.max_requests is not None and requests >= self.max_requests:
+            return REQUESTS
+        return None
+
+    def connections(self) -> Dict[Tuple[str, str], List[str]]:
+        """Return the shared publications of every pair of authors among the collected publications."""
+        from authormaps.pairs import count_pairs
+        pub_dict = {}
+        for pubmedid, authorlist in self.publication_authors.items():
+            for a in authorlist:
+                pub_dict.setdefault(a, []).append(pubmedid)
+        with span('count_pairs'):
+            return count_pairs({a: pub_dict[a] for a in sorted(pub_dict)})
+
+    def to_dataframes(self) -> Optional[Tuple["Dataframe", "Dataframe"]]:
+        """Return node and edge dataframes as ApiInterface.make_dataframe does, None if no network was found.
+        Sets messagefrontend to the status code of the network, postings to the shared PMIDs."""
+        api = ApiInterface(lastname=self.last_name, firstname=self.first_name)
+        api.pubmedidlist = self.seed_pubmedids
+        api.searchlist = bool(self.seed_pubmedids)
+        api.nodelistunique = self.nodes
+        api.nodelistunique_filter = self.seed_all_authors
+        api.consortium_pubmedids = self.consortium_pubmedids
+        api.messagefrontend = self.messagefrontend
+        with span('dataframes'):
+            frames = api.dataframes_from_connections(self.connections())
+        self.messagefrontend = api.messagefrontend
+        self.postings = api.postings
+        return frames
+
+    def save(self) -> None:
+        """Write the state to the checkpoint file, if any."""
+        if not self.checkpoint:
+            return
+        ensure_dir(os.path.dirname(os.path.abspath(self.checkpoint)))
+        data = {
+            'first_name': self.first_name, 'last_name': self.last_name, 'depth': self.depth,
+            'messagefrontend': self.messagefrontend, 'seed_pubmedids': self.seed_pubmedids,
+            'seed_all_authors': self.seed_all_authors, 'crawled': self.crawled,
+            'queued': list(self.queued.values()), 'publication_authors': self.publication_authors,
+            'consortium_pubmedids': sorted(self.consortium_pubmedids),
+            'requests': self.requests, 'seconds': self.seconds, 'exhausted': self.exhausted,
+        }
+        with open(self.checkpoint + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(self.checkpoint + '.tmp', self.checkpoint)
+
+    def __load_checkpoint(self) -> None:
+        if self.crawled or not self.checkpoint or not os.path.exists(self.checkpoint):
+            return
+        with open(self.checkpoint) as f:
+            data = json.load(f)
+        if (data['first_name'], data['last_name'], data['depth']) != (self.first_name, self.last_name, self.depth):
+            raise ValueError(f'{self.checkpoint} is the expansion of {data["first_name"]} {data["last_name"]} '
+                             f'to depth {data["depth"]}')
+        self.messagefrontend = tuple(data['messagefrontend']) if isinstance(data['messagefrontend'], list) \
+            else data['messagefrontend']
+        self.seed_pubmedids = data['seed_pubmedids']
+        self.seed_all_authors = data['seed_all_authors']
+        self.crawled = data['crawled']
+        self.queued = {canonical_key(author): (hop, author) for hop, author in data['queued']}
+        self.publication_authors = data['publication_authors']
+        self.consortium_pubmedids = set(data['consortium_pubmedids'])
+        self.requests, self.seconds = data['requests'], data['seconds']
+        self.strength = {}
+        for authorlist in self.publication_authors.values():
+            for a in authorlist:
+                self.strength[a] = self.strength.get(a, 0) + 1
+        logger.info(f'Resuming expansion from {self.checkpoint}: {len(self.crawled)} crawled, {len(self.queued)} queued')
@@ -0,0 +1,185 @@
+import os
+import gzip
+import time
+import logging
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from authormaps.cache import SQLiteCache, get_cache
+from authormaps.sharedwork import author_query
+
+logger = logging.getLogger(__name__)
+
+XML_SUFFIXES = ('.xml', '.xml.gz')
+
+
+def find_dump_files(paths: Iterable[str]) -> List[str]:
+    """Return the PubMed XML files (.xml or .xml.gz) given directly or inside the given directories, sorted by name
+    so update files are applied after the baseline."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in os.listdir(path) if name.endswith(XML_SUFFIXES))
+        else:
+            files.append(path)
+    return sorted(files, key=os.path.basename)
+
+
+def parse_article(article: ET.Element) -> Optional[Tuple[str, dict]]:
+    """Return PMID and the MEDLINE fields AuthorMaps uses (FAU, AU, DP, TA, JT) of a PubmedArticle element."""
+    citation = article.find('MedlineCitation')
+    if citation is None or citation.findtext('PMID') is None:
+        return None
+    record = {}
+    full_names, short_names = [], []
+    for author in citation.iterfind('Article/AuthorList/Author'):
+        last_name = author.findtext('LastName')
+        if not last_name:
+            continue    # collective names are no persons
+        fore_name = author.findtext('ForeName')
+        full_names.append(f'{last_name}, {fore_name}' if fore_name else last_name)
+        initials = author.findtext('Initials')
+        short_names.append(f'{last_name} {initials}' if initials else last_name)
+    if full_names:
+        record['FAU'] = full_names
+        record['AU'] = short_names
+    pub_date = citation.find('Article/Journal/JournalIssue/PubDate')
+    if pub_date is not None:
+        date = pub_date.findtext('MedlineDate') or ' '.join(
+            part for part in (pub_date.findtext('Year'), pub_date.findtext('Month'), pub_date.findtext('Day')) if part)
+        if date:
+            record['DP'] = date
+    journal_abbreviation = citation.findtext('MedlineJournalInfo/MedlineTA')
+    if journal_abbreviation:
+        record['TA'] = journal_abbreviation
+    journal_title = citation.findtext('Article/Journal/Title')
+    if journal_title:
+        record['JT'] = journal_title
+    return citation.findtext('PMID').strip(), record
+
+
+def parse_file(path: str) -> Tuple[Dict[str, dict], List[str]]:
+    """Stream-parse one PubMed baseline or update file, element by element so memory does not grow with the file.
+
+    Returns
+    -------
+        records by PMID and PMIDs of deleted citations
+    """
+    records, deleted = {}, []
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        root = None
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+            if element.tag == 'PubmedArticle':
+                parsed = parse_article(element)
+                if parsed:
+                    records[parsed[0]] = parsed[1]
+            elif element.tag == 'DeleteCitation':
+                deleted.extend(pmid.text.strip() for pmid in element.iterfind('PMID'))
+            else:
+                continue
+            root.clear()
+    return records, deleted
+
+
+def author_queries(full_name: str) -> Set[str]:
+    """Return the cache keys of the author searches a publication author (FAU, e.g. 'Schultz, Bruce J') is found by.
+
+    Names are split like ApiInterface splits co-authors. Like PubMed, a search without middle name also finds the
+    authors with one, so 'Bruce Schultz' finds 'Schultz, Bruce J'.
+    """
+    parts = full_name.replace(',', '').split(' ')
+    lastname, firstname = parts[0], ' '.join(parts[1:])
+    queries = {author_query(lastname, firstname)}
+    if len(parts) > 2:
+        queries.add(author_query(lastname, parts[1]))
+    return queries
+
+
+def parse_files(files: List[str], processes: int = None) -> Iterator[Tuple[str, Tuple[Dict[str, dict], List[str]]]]:
+    """Yield path and parse_file result of every file in order, parsed in parallel processes. At most twice as many
+    files as processes are parsed or waiting to be written, so the parsed records of a large dump do not pile up."""
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        in_flight = deque()
+        for path in files:
+            in_flight.append((path, executor.submit(parse_file, path)))
+            if len(in_flight) >= processes * 2:
+                path, future = in_flight.popleft()
+                yield path, future.result()
+        while in_flight:
+            path, future = in_flight.popleft()
+            yield path, future.result()
+
+
+def ingest(paths: Iterable[str], cache: SQLiteCache = None, processes: int = None,
+           progress: Callable[[str, int], None] = None) -> Dict[str, float]:
+    """Load local PubMed XML dumps into the cache, so authors and publications they contain need no requests.
+
+    Files are parsed in parallel processes and written by this one in file order, see parse_files. Afterwards the search of every indexed author is
+    the union of the publications found in the dumps and those cached from PubMed before. Its sync time is the
+    modification time of the newest dump, so a later incremental refresh asks PubMed only for newer publications.
+
+    Parameters
+    ----------
+    paths: Iterable[str]
+        PubMed baseline or update files (.xml.gz or .xml) or directories holding them.
+    cache: SQLiteCache
+        Default: the cache of this process, which must be the SQLite backend.
+    processes: int
+        Number of parsing processes. Default: number of CPUs
+    progress: Callable
+        Called with the path and number of records of every parsed file.
+
+    Returns
+    -------
+        number of files, records, deleted records and indexed authors, seconds and records per second
+    """
+    start = time.perf_counter()
+    cache = cache or get_cache()
+    if not isinstance(cache, SQLiteCache):
+        raise ValueError('ingest needs the sqlite cache, set AUTHORMAPS_CACHE=sqlite')
+    files = find_dump_files(paths)
+    stats = {'files': len(files), 'records': 0, 'deleted': 0, 'authors': 0}
+    deleted_pmids = set()
+    dump_time = 0.0
+
+    for path, (records, deleted) in parse_files(files, processes):
+        # revised records replace their old authors in the index
+        cache.delete_records(deleted + list(records))
+        deleted_pmids.update(deleted)
+        deleted_pmids.difference_update(records)
+        cache.put_records(records)
+        cache.put_author_index((query, pmid) for pmid, record in records.items()
+                               for full_name in record.get('FAU', []) for query in author_queries(full_name))
+        stats['records'] += len(records)
+        stats['deleted'] += len(deleted)
+        dump_time = max(dump_time, os.path.getmtime(path))
+        if progress:
+            progress(path, len(records))
+
+    for batch in cache.iter_author_index():
+        searches = []
+        for query, pubmedids in batch:
+            entry = cache.get_search_entry(query)
+            synced_at = dump_time
+            if entry:
+                cached_ids, cached_sync = entry
+                pubmedids = pubmedids + [pmid for pmid in cached_ids if pmid not in deleted_pmids]
+                synced_at = max(dump_time, cached_sync)
+            # newest first, like esearch
+            pubmedids = sorted(set(pubmedids), key=lambda pmid: int(pmid) if pmid.isdigit() else 0, reverse=True)
+            searches.append((query, pubmedids, synced_at))
+        cache.put_searches(searches)
+        stats['authors'] += len(searches)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['records_per_second'] = stats['records'] / stats['seconds'] if stats['seconds'] else 0.0
+    logger.info(f'Ingested {stats}')
+    return stats
@@ -0,0 +1,147 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# number of networks built at the same time
+JOB_WORKERS = int(os.getenv('AUTHORMAPS_JOB_WORKERS', 2))
+# seconds a finished job and its result are kept
+JOB_RETENTION = 3600
+# events kept per running job, the oldest are dropped beyond
+JOB_MAX_EVENTS = 500
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+    """One submitted computation, its progress and its result.
+
+    Progress and partial results are also published as a list of (event, data) events, e.g. ('stage', message) or
+    ('coauthors', names), that clients read with events_since, see /jobevents. The last event is 'done' or 'failed'.
+    Only the latest JOB_MAX_EVENTS are kept, and once the job finished only the last one, the partial results being
+    in the result then.
+    """
+
+    def __init__(self, key: Hashable, meta: dict = None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.done = threading.Event()
+        self.events = deque(maxlen=JOB_MAX_EVENTS)
+        self.dropped = 0    # number of events published before self.events[0]
+        self.changed = threading.Condition()
+
+    def set_stage(self, stage: Any) -> None:
+        """Report progress, e.g. the messagefrontend of ApiInterface. Status codes are not stages."""
+        if isinstance(stage, str):
+            self.stage = stage
+            self.publish('stage', stage)
+
+    def publish(self, event: str, data: Any = None) -> None:
+        """Add an event, data must be JSON serializable."""
+        with self.changed:
+            if event in (DONE, FAILED):
+                self.dropped += len(self.events)
+                self.events.clear()
+            elif len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            self.events.append((event, data))
+            self.changed.notify_all()
+
+    def events_since(self, index: int, timeout: float = None) -> Tuple[int, List[Tuple[str, Any]]]:
+        """Return the events after the first index ones, waiting up to timeout seconds for one if there is none.
+        Events no longer kept are skipped, so the number of the first event returned comes with them."""
+        with self.changed:
+            self.changed.wait_for(lambda: self.dropped + len(self.events) > index, timeout)
+            start = max(index, self.dropped)
+            return start, list(self.events)[start - self.dropped:]
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until the job finished, return False on timeout."""
+        return self.done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        return {'id': self.id, 'status': self.status, 'stage': self.stage, 'error': self.error, **self.meta}
+
+
+class JobQueue:
+    """Run computations on a worker pool; submissions with the key of an unfinished job join that job.
+
+    Parameters
+    ----------
+    max_workers: int
+        Number of jobs running at the same time.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='authormaps-job')
+        self.jobs = {}          # id -> Job
+        self.in_flight = {}     # key -> Job
+        self.lock = threading.Lock()
+
+    def submit(self, key: Hashable, fn: Callable[[Job], Any], meta: dict = None) -> Job:
+        """Run fn(job) in the background, unless a job with the same key is queued or running already.
+
+        Returns
+        -------
+            the new job or the one already in flight for key
+        """
+        with self.lock:
+            self.__forget_finished()
+            job = self.in_flight.get(key)
+            if job is not None:
+                return job
+            job = Job(key, meta)
+            self.jobs[job.id] = job
+            self.in_flight[key] = job
+        self.executor.submit(self.__run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def status_counts(self) -> Dict[str, int]:
+        """Return the number of retained jobs per status."""
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        with self.lock:
+            for job in self.jobs.values():
+                counts[job.status] += 1
+        return counts
+
+    def __run(self, job: Job, fn: Callable[[Job], Any]) -> None:
+        job.status = RUNNING
+        try:
+            job.result = fn(job)
+            job.status = DONE
+        except Exception as e:
+            logger.exception(f'Job {job.id} for {job.key} failed')
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            with self.lock:
+                self.in_flight.pop(job.key, None)
+            job.publish(job.status, job.error)
+            job.done.set()
+
+    def __forget_finished(self) -> None:
+        now = time.time()
+        for job_id in [job_id for job_id, job in self.jobs.items()
+                       if job.finished_at and now - job.finished_at > JOB_RETENTION]:
+            del self.jobs[job_id]
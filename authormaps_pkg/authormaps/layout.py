@@ -0,0 +1,118 @@
+import os
+import time
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+import networkx as nx
+from scipy.spatial import cKDTree
+
+# seed of every layout, so a network always looks the same
+LAYOUT_SEED = 42
+# seconds a layout may take, the force-directed method stops early when it is used up
+LAYOUT_TIME_BUDGET = float(os.getenv('AUTHORMAPS_LAYOUT_BUDGET', 10))
+# from this number of nodes on the vectorized force-directed method is used, see benchmarks/bench_layout.py
+FORCE_MIN_NODES = 150
+# nodes further apart than this multiple of the optimal node distance do not repel each other
+REPULSION_CUTOFF = 3
+
+METHODS = ('auto', 'spring', 'force')
+
+
+def spring_layout(graph: nx.Graph, seed: int = LAYOUT_SEED, initial: Dict[Hashable, np.ndarray] = None,
+                  iterations: int = 50) -> Dict[Hashable, np.ndarray]:
+    """networkx' Fruchterman-Reingold layout, seeded."""
+    initial = {node: np.asarray(xy, dtype=float) for node, xy in (initial or {}).items() if node in graph}
+    return nx.spring_layout(graph, pos=initial or None, seed=seed, iterations=iterations)
+
+
+def force_layout(graph: nx.Graph, seed: int = LAYOUT_SEED, initial: Dict[Hashable, np.ndarray] = None,
+                 iterations: int = 50, time_budget: float = LAYOUT_TIME_BUDGET) -> Dict[Hashable, np.ndarray]:
+    """Fruchterman-Reingold layout vectorized with NumPy.
+
+    Attraction is only computed along the edges and repulsion only between nodes closer than REPULSION_CUTOFF
+    times the optimal distance, found with a k-d tree (the grid variant of Fruchterman and Reingold), so an
+    iteration takes O(n log n) instead of O(n^2). The temperature cools down linearly; when time_budget seconds
+    are used up the current positions are returned.
+
+    Parameters
+    ----------
+    graph: nx.Graph
+    seed: int
+        Seed of the random start positions.
+    initial: Dict
+        Start positions of nodes, e.g. the layout of the previous version of the network.
+    iterations: int
+    time_budget: float
+        Seconds after which the layout is stopped.
+
+    Returns
+    -------
+        node -> position, scaled to [-1, 1]
+    """
+    deadline = time.perf_counter() + time_budget
+    nodes = list(graph)
+    n = len(nodes)
+    if n < 2:
+        return {node: np.zeros(2) for node in nodes}
+
+    pos = np.random.default_rng(seed).uniform(-1, 1, (n, 2))
+    for i, node in enumerate(nodes):
+        if initial and node in initial:
+            pos[i] = initial[node]
+    adjacency = nx.to_scipy_sparse_array(graph, nodelist=nodes, weight=None, format='coo')
+    rows, cols = adjacency.row, adjacency.col
+
+    k = 1 / np.sqrt(n)   # optimal distance between nodes
+    temperature = 0.1 * max(np.ptp(pos, axis=0))
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        displacement = np.zeros((n, 2))
+        # repulsion k^2 / d between close pairs of nodes
+        close = cKDTree(pos).query_pairs(REPULSION_CUTOFF * k, output_type='ndarray')
+        i, j = close[:, 0], close[:, 1]
+        delta = pos[i] - pos[j]
+        force = delta * (k * k / np.maximum((delta ** 2).sum(axis=1), 1e-8))[:, None]
+        for axis in (0, 1):
+            displacement[:, axis] += np.bincount(i, weights=force[:, axis], minlength=n) \
+                                     - np.bincount(j, weights=force[:, axis], minlength=n)
+        # attraction d^2 / k along the edges, both directions are in the adjacency matrix
+        delta = pos[rows] - pos[cols]
+        force = -delta * (np.sqrt((delta ** 2).sum(axis=1)) / k)[:, None]
+        for axis in (0, 1):
+            displacement[:, axis] += np.bincount(rows, weights=force[:, axis], minlength=n)
+
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 0.01)
+        pos += displacement * (temperature / length)[:, None]
+        temperature -= cooling
+        if time.perf_counter() > deadline:
+            break
+
+    pos -= pos.mean(axis=0)
+    pos /= max(np.abs(pos).max(), 1e-12)
+    return dict(zip(nodes, pos))
+
+
+def compute_layout(graph: nx.Graph, method: str = 'auto', seed: int = LAYOUT_SEED,
+                   initial: Optional[Dict[Hashable, np.ndarray]] = None,
+                   time_budget: float = LAYOUT_TIME_BUDGET) -> Dict[Hashable, np.ndarray]:
+    """Return reproducible node positions of a graph.
+
+    Parameters
+    ----------
+    graph: nx.Graph
+    method: str
+        'spring' (networkx), 'force' (vectorized, for large graphs) or 'auto' to pick by number of nodes.
+        Default: 'auto'
+    seed: int
+    initial: Dict
+        Start positions, nodes of the graph missing here start at random positions.
+    time_budget: float
+        Seconds the force-directed method may take.
+    """
+    if method == 'auto':
+        method = 'force' if graph.number_of_nodes() >= FORCE_MIN_NODES else 'spring'
+    if method == 'spring':
+        return spring_layout(graph, seed=seed, initial=initial)
+    if method == 'force':
+        return force_layout(graph, seed=seed, initial=initial, time_budget=time_budget)
+    raise ValueError(f'method must be one of {METHODS}, not {method!r}')
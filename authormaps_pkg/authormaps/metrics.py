@@ -0,0 +1,106 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+# name and sorted (label, value) pairs of a counter
+CounterKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Metrics:
+    """Thread-safe timers of pipeline stages and counters.
+
+    Stages are timed with span, e.g. 'esearch', 'count_pairs' or 'render'. Spans running in parallel threads are
+    summed, so the seconds of a stage can exceed the wall time, and nested spans are counted in both stages.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timers = {}    # stage -> [calls, seconds, max seconds]
+        self.counters = {}  # CounterKey -> value
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Time the block as one call of stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Add one call of stage taking seconds."""
+        with self.lock:
+            timer = self.timers.setdefault(stage, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def count(self, name: str, n: float = 1, **labels: str) -> None:
+        """Add n to the counter name with labels, e.g. count('cache_lookups', kind='search', outcome='hit')."""
+        key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def snapshot(self) -> Tuple[Dict[str, Tuple[int, float, float]], Dict[CounterKey, float]]:
+        """Return copies of the timers (calls, seconds, max seconds) and counters."""
+        with self.lock:
+            return {stage: tuple(timer) for stage, timer in self.timers.items()}, dict(self.counters)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+
+    def report(self, wall: float = None) -> str:
+        """Return a table of the stages, slowest first, and the counters."""
+        timers, counters = self.snapshot()
+        lines = [f"{'stage':<24} {'calls':>7} {'seconds':>9} {'mean ms':>9} {'max ms':>9}"]
+        for stage, (calls, seconds, longest) in sorted(timers.items(), key=lambda item: -item[1][1]):
+            lines.append(f'{stage:<24} {calls:>7} {seconds:>9.3f} {seconds / calls * 1e3:>9.2f} {longest * 1e3:>9.2f}')
+        if wall is not None:
+            lines.append(f"{'wall time':<24} {'':>7} {wall:>9.3f}")
+        for (name, labels), value in sorted(counters.items()):
+            label = ','.join(f'{k}={v}' for k, v in labels)
+            lines.append(f"{name + (f'{{{label}}}' if label else ''):<42} {value:>9g}")
+        return '\n'.join(lines)
+
+    def prometheus(self, prefix: str = 'authormaps', gauges: Dict[str, float] = None) -> str:
+        """Return all timers, counters and the given gauges in the Prometheus text exposition format."""
+        timers, counters = self.snapshot()
+        lines = []
+        for metric, help_text, index in (('stage_calls_total', 'Calls per stage.', 0),
+                                         ('stage_seconds_total', 'Seconds per stage, summed over threads.', 1),
+                                         ('stage_seconds_max', 'Longest call per stage in seconds.', 2)):
+            lines.append(f'# HELP {prefix}_{metric} {help_text}')
+            lines.append(f'# TYPE {prefix}_{metric} {"gauge" if metric.endswith("max") else "counter"}')
+            lines.extend(f'{prefix}_{metric}{{stage="{stage}"}} {timer[index]:g}' for stage, timer in sorted(timers.items()))
+        typed = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                lines.append(f'# TYPE {prefix}_{name}_total counter')
+                typed.add(name)
+            label = ','.join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f'{prefix}_{name}_total{f"{{{label}}}" if label else ""} {value:g}')
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            lines.append(f'{prefix}_{name} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Return the metrics of this process."""
+    return _metrics
+
+
+def span(stage: str):
+    """Time a block as one call of stage in the metrics of this process, see Metrics.span."""
+    return _metrics.span(stage)
+
+
+def count(name: str, n: float = 1, **labels: str) -> None:
+    """Add n to a counter in the metrics of this process, see Metrics.count."""
+    _metrics.count(name, n, **labels)
@@ -0,0 +1,211 @@
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from authormaps.cache import CacheBackend, get_cache
+
+# letters NFKD does not decompose into a base letter and an accent
+SPECIAL_LETTERS = str.maketrans({'ß': 'ss', 'æ': 'ae', 'œ': 'oe', 'ø': 'o', 'ł': 'l', 'đ': 'd', 'ð': 'd', 'þ': 'th',
+                                 'ı': 'i'})
+# similarity above which a name is suggested even with another last name
+SIMILARITY_THRESHOLD = 0.4
+
+
+def fold(text: str) -> str:
+    """Return text in lower case without diacritics and punctuation, hyphens separate words,
+    e.g. "Gómez-O'Neill" -> 'gomez oneill'."""
+    text = unicodedata.normalize('NFKD', text.casefold().translate(SPECIAL_LETTERS).replace('-', ' '))
+    return ' '.join(''.join(c for c in text if c.isalnum() or c == ' ').split())
+
+
+def split_name(full_name: str) -> Tuple[str, List[str]]:
+    """Split an author name as in the author lists ('Schultz Bruce J') or MEDLINE ('Schultz, Bruce J') into last name
+    and given names. Like ApiInterface, the first word is taken as last name."""
+    parts = full_name.replace(',', ' ').split()
+    return (parts[0], parts[1:]) if parts else ('', [])
+
+
+def display_name(full_name: str) -> str:
+    """Return an author name in reading order, e.g. 'Bruce J Schultz' for 'Schultz, Bruce J'."""
+    last_name, given_names = split_name(full_name)
+    return ' '.join([*given_names, last_name])
+
+
+@lru_cache(maxsize=65536)
+def canonical_key(full_name: str) -> str:
+    """Return the key identifying an author name regardless of case, diacritics, hyphens and MEDLINE commas,
+    e.g. 'muller|hans peter' for 'Müller Hans-Peter' and 'Muller, Hans Peter'."""
+    last_name, given_names = split_name(full_name)
+    return f"{fold(last_name)}|{' '.join(fold(name) for name in given_names)}"
+
+
+def initials_compatible(key1: str, key2: str) -> bool:
+    """True if two canonical keys can be the same person: same last name and every given name of one is a prefix of
+    the given name of the other at the same position, e.g. 'schultz|b' and 'schultz|bruce j'."""
+    last1, given1 = key1.split('|')
+    last2, given2 = key2.split('|')
+    if last1 != last2:
+        return False
+    return all(a.startswith(b) or b.startswith(a) for a, b in zip(given1.split(), given2.split()))
+
+
+def trigrams(key: str) -> set:
+    """Return the character trigrams of a canonical key, padded so short names have some."""
+    text = f"  {key.replace('|', ' ')} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def node_ids(full_names: Iterable[str]) -> Dict[str, str]:
+    """Return a node id for every author name.
+
+    Ids are the short form of ApiInterface.reduced_name, e.g. 'Schultz_B', as long as no other person in full_names
+    has the same one. Persons sharing it (Bruce and Benjamin Schultz) get their full given names, 'Schultz_Bruce' and
+    'Schultz_Benjamin', so they stay separate nodes. Spellings of the same person (same canonical_key) share an id.
+    """
+    persons = {}    # canonical key -> names
+    for full_name in full_names:
+        persons.setdefault(canonical_key(full_name), []).append(full_name)
+    by_short_id = {}
+    for key, names in persons.items():
+        last_name, given_names = split_name(min(names))
+        by_short_id.setdefault('_'.join([last_name, *(name[0] for name in given_names)]), []).append(key)
+
+    ids = {}
+    for short_id, keys in by_short_id.items():
+        for key in keys:
+            last_name, given_names = split_name(min(persons[key]))
+            node_id = short_id if len(keys) == 1 else '_'.join([last_name, *given_names])
+            ids.update(dict.fromkeys(persons[key], node_id))
+    return ids
+
+
+class NameIndex:
+    """Index of author names answering which names belong to the same person, share a last name or look similar.
+
+    Names are grouped by canonical_key, looked up by last name through a hash and by similarity through trigrams, so
+    no lookup scans all names. The trigram index is built by index_trigrams or on the first call of similar.
+
+    Parameters
+    ----------
+    names: Iterable[str]
+        Author names as in the author lists or MEDLINE records.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.lock = threading.Lock()
+        self.names = {}         # canonical key -> spellings
+        self.by_last_name = {}  # folded last name -> canonical keys
+        self.by_trigram = None  # trigram -> canonical keys
+        self.add(names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, names: Iterable[str]) -> None:
+        with self.lock:
+            for full_name in names:
+                key = canonical_key(full_name)
+                spellings = self.names.get(key)
+                if spellings is None:
+                    self.names[key] = spellings = []
+                    self.by_last_name.setdefault(key.split('|')[0], set()).add(key)
+                    if self.by_trigram is not None:
+                        self.__index_trigrams(key)
+                if full_name not in spellings:
+                    spellings.append(full_name)
+
+    def spellings(self, full_name: str) -> List[str]:
+        """Return every indexed spelling of the same person."""
+        return list(self.names.get(canonical_key(full_name), []))
+
+    def with_last_name(self, last_name: str) -> List[str]:
+        """Return one spelling of every person with last_name, in alphabetical order."""
+        return sorted(self.names[key][0] for key in self.by_last_name.get(fold(last_name), ()))
+
+    def similar(self, full_name: str, limit: int = 10,
+                threshold: float = SIMILARITY_THRESHOLD) -> List[Tuple[str, float]]:
+        """Return up to limit (name, score) of persons similar to full_name, best first, the person itself left out.
+
+        Candidates share the last name or trigrams with full_name. The score is the trigram Jaccard similarity, plus one
+        if last name and initials agree, so 'Schultz B' ranks 'Schultz Bruce J' above 'Schulz Bruce'.
+        """
+        self.index_trigrams()
+        key = canonical_key(full_name)
+        query = trigrams(key)
+        shared = {}
+        for trigram in query:
+            for candidate in self.by_trigram.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        for candidate in self.by_last_name.get(key.split('|')[0], ()):
+            shared.setdefault(candidate, 0)
+        shared.pop(key, None)
+
+        scored = []
+        for candidate, n in shared.items():
+            score = n / (len(query) + len(trigrams(candidate)) - n)
+            if initials_compatible(key, candidate):
+                score += 1
+            if score >= threshold:
+                scored.append((self.names[candidate][0], round(score, 3)))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+    def index_trigrams(self) -> None:
+        """Build the trigram index of similar, names added later are indexed as they come."""
+        with self.lock:
+            if self.by_trigram is None:
+                self.by_trigram = {}
+                for candidate in self.names:
+                    self.__index_trigrams(candidate)
+
+    def add_records(self, records: Iterable[Tuple[str, dict]]) -> None:
+        """Add the authors of (PMID, MEDLINE record) items."""
+        self.add(full_name for _, record in records for full_name in record.get('FAU', []))
+
+    def __index_trigrams(self, key: str) -> None:
+        for trigram in trigrams(key):
+            self.by_trigram.setdefault(trigram, set()).add(key)
+
+    @classmethod
+    def from_cache(cls, cache: CacheBackend = None) -> "NameIndex":
+        """Index the authors of every publication in the cache."""
+        return cls()._add_cache(cache)
+
+    def _add_cache(self, cache: CacheBackend = None) -> "NameIndex":
+        for batch in (cache or get_cache()).iter_records():
+            self.add_records(batch)
+        return self
+
+
+_index = None           # the index of get_name_index once built
+_building = None        # the index being read from the cache, records cached meanwhile are added to it too
+_index_lock = threading.Lock()
+
+
+def get_name_index(rebuild: bool = False, wait: bool = True) -> Optional[NameIndex]:
+    """Return the index of all author names in the cache, built on first use in this process.
+    With wait=False, return None instead of building it or waiting for it, see load_name_index."""
+    global _index, _building
+    if not wait and _index is None:
+        return None
+    with _index_lock:
+        if _index is None or rebuild:
+            _building = NameIndex()
+            _index, _building = _building._add_cache(), None
+        return _index
+
+
+def load_name_index() -> threading.Thread:
+    """Build the name index with its trigrams on a background thread, so no request waits for it."""
+    thread = threading.Thread(target=lambda: get_name_index().index_trigrams(), name='authormaps-names', daemon=True)
+    thread.start()
+    return thread
+
+
+def index_records(records: Dict[str, dict]) -> None:
+    """Add the authors of records just cached to the name index, if it is built or being built. An index built
+    later reads them from the cache."""
+    index = _building or _index
+    if index is not None:
+        index.add_records(records.items())
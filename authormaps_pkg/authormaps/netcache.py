@@ -0,0 +1,66 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+# number of computed networks kept in memory per process
+NETWORK_CACHE_SIZE = int(os.getenv('AUTHORMAPS_NETWORK_CACHE_SIZE', 32))
+
+
+def network_key(first_name: str, last_name: str, mode: str = 'global') -> Tuple[str, str, str]:
+    """Return the cache key of an author network, independent of case and surplus whitespace."""
+    return ' '.join(first_name.split()).lower(), ' '.join(last_name.split()).lower(), mode
+
+
+class NetworkCache:
+    """Thread-safe, size-bounded LRU cache of computed networks.
+
+    Parameters
+    ----------
+    maxsize: int
+        Number of entries kept, the least recently used one is dropped first.
+    """
+
+    def __init__(self, maxsize: int = NETWORK_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable, max_age: float = None) -> Optional[Any]:
+        """Return the entry of key, None if missing or older than max_age seconds."""
+        with self.lock:
+            if key not in self.entries:
+                return None
+            created_at, value = self.entries[key]
+            if max_age is not None and time.time() - created_at > max_age:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store value under key and drop the least recently used entries beyond maxsize."""
+        with self.lock:
+            self.entries[key] = (time.time(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any], max_age: float = None) -> Any:
+        """Return the entry of key, computing and storing it with factory() if needed."""
+        value = self.get(key, max_age)
+        if value is None:
+            value = factory()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove the entry of key and return it."""
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -1,6 +1,8 @@
+import os
+import time
 import logging
 from pathlib import Path
-from typing import Optional, Union
+from typing import List, Optional, Union
 from collections import Counter
 
 import json
@@ -8,44 +10,116 @@ import pandas as pd
 import networkx as nx
 import matplotlib as mpl
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+import pyarrow as pa
 from networkx.readwrite import json_graph
 
-import authormaps.startup
-from authormaps.sharedwork import ApiInterface
+from authormaps.startup import PROJECT_DIR
+from authormaps.layout import compute_layout
+from authormaps.metrics import span
+from authormaps.postings import PairPostings
 
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+ARTIFACT_DIR = os.path.join(PROJECT_DIR, "artifacts")
+
 
 class Network:
     """Represent an author mapping network."""
 
-    def __init__(self, first_name: str = None, last_name: str = None):
+    def __init__(self, first_name: str = None, last_name: str = None, mode: str = 'global',
+                 node_list: pd.DataFrame = None, authormap_file: pd.DataFrame = None, version: str = None,
+                 postings: PairPostings = None):
         self.graph = None
         self.shared_pb_num = None
         self.node_mapping = None
         self.reverse_node_mapping = None
+        self.node_list = None
+        self.authormap_file = None
+        self.first_name = first_name
+        self.last_name = last_name
+        self.mode = mode
+        self.version = version      # identifies the snapshot of the network, see authormaps.render
+        self.postings = postings    # shared PMIDs per edge, None if unknown
 
-        # Request author relationships via api
-        node_list, authormap_file = ApiInterface(firstname=first_name, lastname=last_name).make_dataframe()
+        if node_list is None or authormap_file is None:
+            # Request author relationships via api
+            from authormaps.sharedwork import ApiInterface
+            api = ApiInterface(firstname=first_name, lastname=last_name)
+            node_list, authormap_file = api.make_dataframe(mode=mode)
+            self.postings = api.postings
         logger.debug(f"Shared co-author mapping has been loaded.")
 
         self.create_network(node_list=node_list, authormap_file=authormap_file)    # Assigns self.graph AND self.shared_pb_num
 
     def create_network(self, node_list: pd.DataFrame, authormap_file: pd.DataFrame) -> None:
         """Generate author mapping network."""
-        author_pairs = self.__extract_author_pairs(authormap_file)    # Count the number of publications shared between every combination of authors
-        edge_list = self.__extract_edges(author_pairs)
-        graph = nx.parse_edgelist(edge_list)
+        with span('graph_build'):
+            self.node_list = node_list.copy()
+            self.authormap_file = authormap_file
+            author_pairs = self.__extract_author_pairs(authormap_file)    # Count the number of publications shared between every combination of authors
+            graph = nx.Graph()
+            graph.add_edges_from((a1, a2, {'shared_publication': num}) for (a1, a2), num in author_pairs.items())
 
-        self.node_mapping = self.__extract_nodes(node_list)
-        self.reverse_node_mapping = self.__extract_reversed_nodes(node_list)
+            node_list = node_list.copy()
+            self.node_mapping = self.__extract_nodes(node_list)
+            self.reverse_node_mapping = self.__extract_reversed_nodes(node_list)
         self.shared_pb_num = author_pairs
         self.graph = graph
 
-    def get_shared_publication(self, author1: str, author2: str) -> int:
-        """Return the number of shared publication between author1 and author2."""
+    @staticmethod
+    def artifact_path(first_name: str, last_name: str, mode: str = 'global', directory: Union[str, Path] = ARTIFACT_DIR) -> Path:
+        """Return the directory holding the saved node and edge tables of an author network."""
+        return Path(directory) / f"{first_name.capitalize()}{last_name.capitalize()}_{mode}"
+
+    def save(self, directory: Union[str, Path] = ARTIFACT_DIR) -> Path:
+        """Save node and edge tables, and the shared PMIDs if known, as Arrow IPC files (nodes.arrow, edges.arrow,
+        postings.arrow), which can be memory-mapped."""
+        path = self.artifact_path(self.first_name, self.last_name, self.mode, directory)
+        path.mkdir(parents=True, exist_ok=True)
+        metadata = {"created_at": str(time.time())}
+        tables = [(name, pa.Table.from_pandas(frame, preserve_index=False).replace_schema_metadata(metadata))
+                  for name, frame in (("nodes", self.node_list), ("edges", self.authormap_file))]
+        if self.postings is not None:
+            tables.append(("postings", self.postings.to_table(metadata)))
+        elif (path / "postings.arrow").exists():
+            os.remove(path / "postings.arrow")
+        for name, table in tables:
+            with pa.OSFile(str(path / f"{name}.arrow.tmp"), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(path / f"{name}.arrow.tmp", path / f"{name}.arrow")
+        logger.info(f"Network saved to {path}")
+        return path
+
+    @classmethod
+    def load(cls, first_name: str, last_name: str, mode: str = 'global', directory: Union[str, Path] = ARTIFACT_DIR,
+             max_age: float = None) -> Optional["Network"]:
+        """Return the saved network of an author, or None if there is none or it is older than max_age seconds."""
+        path = cls.artifact_path(first_name, last_name, mode, directory)
+        frames = []
+        created_at = 0
+        for name in ("nodes", "edges"):
+            if not (path / f"{name}.arrow").exists():
+                return None
+            with pa.memory_map(str(path / f"{name}.arrow")) as source:
+                table = pa.ipc.open_file(source).read_all()
+            created_at = float((table.schema.metadata or {}).get(b"created_at", 0))
+            if max_age is not None and time.time() - created_at > max_age:
+                return None
+            frames.append(table.to_pandas())
+        postings = None
+        if (path / "postings.arrow").exists():
+            # the PMID arrays stay memory-mapped
+            postings = PairPostings.from_table(pa.ipc.open_file(pa.memory_map(str(path / "postings.arrow"))).read_all())
+        return cls(first_name=first_name, last_name=last_name, mode=mode, node_list=frames[0], authormap_file=frames[1],
+                   version=f"artifact-{created_at}", postings=postings)
+
+    def get_shared_publication(self, author1: str, author2: str) -> float:
+        """Return the number of shared publication between author1 and author2, consortium papers count
+        AUTHORMAPS_CONSORTIUM_WEIGHT."""
         # transform from full name to node id
         a1 = self.reverse_node_mapping[author1]
         a2 = self.reverse_node_mapping[author2]
@@ -54,18 +128,28 @@ class Network:
             a1, a2 = a2, a1
         return self.shared_pb_num.get((a1, a2), 0)
 
+    def get_shared_pmids(self, author1: str, author2: str, page: int = 1, page_size: int = 20) -> Optional[List[str]]:
+        """Return one page of the PMIDs shared by author1 and author2, newest first, None if the network was saved
+        without them."""
+        if self.postings is None:
+            return None
+        a1 = self.reverse_node_mapping[author1]
+        a2 = self.reverse_node_mapping[author2]
+        return self.postings.get(a1, a2, offset=(page - 1) * page_size, limit=page_size)
+
+    def count_shared_pmids(self, author1: str, author2: str) -> Optional[int]:
+        """Return the number of PMIDs shared by author1 and author2 (consortium papers count one), None if the
+        network was saved without them."""
+        if self.postings is None:
+            return None
+        return self.postings.count(self.reverse_node_mapping[author1], self.reverse_node_mapping[author2])
+
     def generate_node_link_data(self, filepath: Union[str, Path]) -> None:
         """Generate and save data in node-link format."""
         data = json_graph.node_link_data(self.graph)
         with open(filepath, 'w') as outfile:
             json.dump(data, outfile)
 
-    @staticmethod
-    def __extract_edges(author_pairs: dict) -> list:
-        """Return a list of edges."""
-        edge_list = [f"{pair[0]} {pair[1]} {{'shared_publication': {num}}}" for pair, num in author_pairs.items()]
-        return edge_list
-
     @staticmethod
     def __extract_author_pairs(author_mapping: pd.DataFrame = None) -> dict:
         """Generate a dict of every author combinations and the number of their shared publications."""
@@ -96,8 +180,25 @@ class Network:
 class Visualizer(Network):
     """Generate a network image."""
 
-    def __init__(self, first_name: str = None, last_name: str = None):
-        super().__init__(first_name, last_name)
+    def __init__(self, first_name: str = None, last_name: str = None, mode: str = 'global',
+                 node_list: pd.DataFrame = None, authormap_file: pd.DataFrame = None, network: Network = None,
+                 version: str = None, postings: PairPostings = None):
+        if network is not None:
+            # share the graph of an already built network instead of computing it again
+            self.graph = network.graph
+            self.shared_pb_num = network.shared_pb_num
+            self.node_mapping = network.node_mapping
+            self.reverse_node_mapping = network.reverse_node_mapping
+            self.node_list = network.node_list
+            self.authormap_file = network.authormap_file
+            self.first_name = first_name = first_name or network.first_name
+            self.last_name = last_name = last_name or network.last_name
+            self.mode = network.mode
+            self.version = network.version
+            self.postings = network.postings
+        else:
+            super().__init__(first_name, last_name, mode, node_list, authormap_file, version, postings)
+        self.graph_pos = None
         self.edge_widths = self.__edges_width_mapping()
         self.edge_colors = self.__edges_color_mapping()
         self.node_colors = self.__nodes_color_mapping(first_name=first_name, last_name=last_name)
@@ -119,25 +220,69 @@ class Visualizer(Network):
         """
 
         plt.figure(figsize=(15, 15), dpi=dpi)
-        graph_pos = nx.spring_layout(self.graph)
-        nx.draw_networkx(self.graph, pos=graph_pos,
-                         with_labels=True,
-                         labels=self.node_mapping,
-                         font_size=3,
-                         node_color=self.node_colors,
-                         edge_color=self.edge_colors,
-                         width=self.edge_widths,
-                         alpha=1,
-                         node_size=100)
-        if with_edge_labels:
-            edge_labels = nx.get_edge_attributes(self.graph, 'shared_publication')
-            nx.draw_networkx_edge_labels(self.graph, pos=graph_pos, edge_labels=edge_labels, font_size=2)
+        self.__draw(plt.gca(), with_edge_labels)
         if graph_output_path:
             self.__check_output(graph_output_path)
-            plt.savefig(graph_output_path, bbox_inches="tight", dpi=dpi)
+            with span('render_save'):
+                plt.savefig(graph_output_path, bbox_inches="tight", dpi=dpi)
             logger.info(f"New graph image saved to {graph_output_path}")
         return plt
 
+    def save_graph_images(self, graph_output_paths: List[Union[str, Path]], dpi: int = 72, with_edge_labels: bool = False) -> None:
+        """Draw the network once and save it to every path, e.g. in all download formats.
+
+        The figure does not use pyplot, so images can be rendered by several threads at once.
+        """
+        for graph_output_path in graph_output_paths:
+            self.__check_output(graph_output_path)
+        figure = Figure(figsize=(15, 15), dpi=dpi)
+        self.__draw(figure.add_subplot(), with_edge_labels)
+        for graph_output_path in graph_output_paths:
+            with span('render_save'):
+                figure.savefig(graph_output_path, bbox_inches="tight", dpi=dpi)
+            logger.info(f"New graph image saved to {graph_output_path}")
+
+    def node_link_data(self) -> dict:
+        """Return the network in node-link format with everything a client needs to draw it.
+
+        Nodes carry the author name, position (see layout) and color, links the number of shared publications as
+        weight and the edge color and width of the server rendered image.
+        """
+        graph_pos = self.layout()
+        nodes = [{"id": node, "name": self.node_mapping.get(node, node),
+                  "x": round(float(graph_pos[node][0]), 4), "y": round(float(graph_pos[node][1]), 4),
+                  "color": color}
+                 for node, color in zip(self.graph.nodes(), self.node_colors)]
+        links = [{"source": u, "target": v, "weight": self.graph[u][v]['shared_publication'],
+                  "color": mpl.colors.to_hex(color), "width": round(float(width), 2)}
+                 for (u, v), color, width in zip(self.graph.edges(), self.edge_colors, self.edge_widths)]
+        return {"directed": False, "multigraph": False, "graph": {"first_name": self.first_name, "last_name": self.last_name,
+                "mode": self.mode, "version": self.version}, "nodes": nodes, "links": links}
+
+    def layout(self) -> dict:
+        """Return the node positions, computed once per Visualizer unless graph_pos was set, e.g. to saved ones."""
+        if self.graph_pos is None:
+            with span('layout'):
+                self.graph_pos = compute_layout(self.graph)
+        return self.graph_pos
+
+    def __draw(self, ax, with_edge_labels: bool) -> None:
+        """Draw nodes, edges and labels on a matplotlib axes."""
+        graph_pos = self.layout()
+        with span('render_draw'):
+            nx.draw_networkx(self.graph, pos=graph_pos, ax=ax,
+                             with_labels=True,
+                             labels=self.node_mapping,
+                             font_size=3,
+                             node_color=self.node_colors,
+                             edge_color=self.edge_colors,
+                             width=self.edge_widths,
+                             alpha=1,
+                             node_size=100)
+            if with_edge_labels:
+                edge_labels = nx.get_edge_attributes(self.graph, 'shared_publication')
+                nx.draw_networkx_edge_labels(self.graph, pos=graph_pos, edge_labels=edge_labels, font_size=2, ax=ax)
+
     def __nodes_color_mapping(self, first_name: str = None, last_name: str = None) -> list:
         """Get a list of colors for nodes."""
         labels = [self.node_mapping[node_name] for node_name in self.graph.nodes()]
@@ -162,7 +307,7 @@ class Visualizer(Network):
         """Get a list of widths for edges."""
         edges = self.graph.edges()
         shared_pub = [self.graph[u][v]['shared_publication'] for u, v in edges]
-        if max(shared_pub) == 1:
+        if max(shared_pub) == min(shared_pub):
             k = 1
         else:
             k = 9 / (max(shared_pub) - min(shared_pub))     # normalization to [1, 10]
@@ -0,0 +1,135 @@
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# below this number of authors the plain loop is faster than building the sparse matrices,
+# see benchmarks/bench_pairs.py
+SPARSE_MIN_AUTHORS = 60
+
+
+def incidence_matrix(pub_dict: Dict[str, Optional[List[str]]]) -> Tuple[List[str], List[str], sparse.csr_matrix]:
+    """Map authors and PMIDs to integer ids and build the sparse author x publication incidence matrix.
+
+    Parameters
+    ----------
+    pub_dict: Dict
+        key: author name, value: list of PMIDs (or None when no publication was found)
+
+    Returns
+    -------
+        authors (row order), PMIDs (column order), incidence matrix with one 1 per author and publication
+    """
+    authors = [a for a, pub_list in pub_dict.items() if pub_list]
+    pmid_index = {}
+    rows, cols = [], []
+    for row, a in enumerate(authors):
+        for pmid in set(pub_dict[a]):
+            rows.append(row)
+            cols.append(pmid_index.setdefault(pmid, len(pmid_index)))
+    data = np.ones(len(rows), dtype=np.int32)
+    matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(authors), len(pmid_index)), dtype=np.int32)
+    return authors, list(pmid_index), matrix
+
+
+def pair_counts(pub_dict: Dict[str, Optional[List[str]]]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Count the shared publications of every pair of authors with one sparse product.
+
+    Returns
+    -------
+        authors, row ids i, row ids j (i < j) and number of shared publications of every pair sharing at least one
+    """
+    authors, _, matrix = incidence_matrix(pub_dict)
+    shared = sparse.triu(matrix @ matrix.T, k=1).tocoo()
+    return authors, shared.row, shared.col, shared.data
+
+
+def count_pairs_loop(pub_dict: Dict[str, Optional[List[str]]]) -> Dict[Tuple[str, str], List[str]]:
+    """Reference implementation intersecting the publication sets of every combination of authors."""
+    common_dict = {}
+    pub_sets = {a: set(pub_list) for a, pub_list in pub_dict.items() if pub_list}
+    for a_tuple in combinations(pub_sets, 2):
+        common_publication = pub_sets[a_tuple[0]].intersection(pub_sets[a_tuple[1]])
+        if common_publication:
+            common_dict[a_tuple] = list(common_publication)
+    return common_dict
+
+
+def pair_postings(pub_dict: Dict[str, Optional[List[str]]]) -> Tuple[List[str], List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Return every (author i, author j, publication) triple with i < j, sorted by pair and publication.
+
+    The pairs of each publication are generated from the columns of the incidence matrix, all publications with
+    the same number of authors at once.
+
+    Returns
+    -------
+        authors, PMIDs, row ids i, row ids j and column ids of the shared publications
+    """
+    authors, pmids, matrix = incidence_matrix(pub_dict)
+    by_publication = matrix.tocsc()
+    by_publication.sort_indices()
+    degrees = np.diff(by_publication.indptr)
+
+    pair_i, pair_j, pair_pub = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    for k in np.unique(degrees[degrees > 1]):
+        columns = np.flatnonzero(degrees == k)
+        members = by_publication.indices[by_publication.indptr[columns][:, None] + np.arange(k)]
+        first, second = np.triu_indices(k, 1)
+        pair_i.append(members[:, first].ravel())
+        pair_j.append(members[:, second].ravel())
+        pair_pub.append(np.repeat(columns, len(first)))
+    pair_i, pair_j, pair_pub = np.concatenate(pair_i), np.concatenate(pair_j), np.concatenate(pair_pub)
+
+    order = np.lexsort((pair_pub, pair_j, pair_i))
+    return authors, pmids, pair_i[order], pair_j[order], pair_pub[order]
+
+
+def count_pairs_sparse(pub_dict: Dict[str, Optional[List[str]]]) -> Dict[Tuple[str, str], List[str]]:
+    """Sparse matrix implementation, the PMID lists are cut out of the sorted pair postings.
+
+    The postings give the pairs and their PMIDs in one pass. Finding the pairs through matrix @ matrix.T instead
+    still needs the PMIDs of each pair and is two to three times slower, see benchmarks/bench_pairs.py.
+    """
+    authors, pmids, pair_i, pair_j, pair_pub = pair_postings(pub_dict)
+    if not len(pair_i):
+        return {}
+    pmids = np.asarray(pmids, dtype=object)[pair_pub].tolist()
+    pair_key = pair_i * len(authors) + pair_j
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(pair_key)) + 1, [len(pair_key)])).tolist()
+    starts = bounds[:-1]
+    first, second = pair_i[starts].tolist(), pair_j[starts].tolist()
+    return {(authors[i], authors[j]): pmids[start:end]
+            for i, j, start, end in zip(first, second, starts, bounds[1:])}
+
+
+def count_pairs(pub_dict: Dict[str, Optional[List[str]]], engine: str = 'auto') -> Dict[Tuple[str, str], List[str]]:
+    """Return dict containing list of shared publications for every pair of authors with at least one.
+
+    Parameters
+    ----------
+    pub_dict: Dict
+        key: author name, value: list of PMIDs (or None when no publication was found)
+    engine: str
+        'loop', 'sparse' or 'auto' to pick by number of authors. Default: 'auto'
+
+    Returns
+    -------
+    common_dict: key: Tuple of two authors in the order of pub_dict, value: List of PMIDs
+    """
+    if engine == 'auto':
+        engine = 'sparse' if len(pub_dict) >= SPARSE_MIN_AUTHORS else 'loop'
+    if engine == 'sparse':
+        return count_pairs_sparse(pub_dict)
+    if engine == 'loop':
+        return count_pairs_loop(pub_dict)
+    raise ValueError(f"engine must be 'auto', 'loop' or 'sparse', not {engine!r}")
+
+
+def pair_count_frame(pub_dict: Dict[str, Optional[List[str]]]) -> pd.DataFrame:
+    """Return the number of shared publications of every connected pair in the edge DataFrame layout
+    of ApiInterface.make_dataframe (columns author1, author2, pub_id) with full author names."""
+    authors, i, j, counts = pair_counts(pub_dict)
+    authors = np.asarray(authors, dtype=object)
+    return pd.DataFrame({'author1': authors[i], 'author2': authors[j], 'pub_id': counts})
@@ -0,0 +1,122 @@
+import os
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from authormaps.cache import CacheBackend, get_cache
+from authormaps.metrics import count, span
+
+# seconds until a cached author search is refreshed, default one week
+SEARCH_TTL = float(os.getenv('AUTHORMAPS_SEARCH_TTL', 7 * 24 * 3600))
+# seconds until a failed lookup (702 author not found, 701 no authors in record) is tried again, default one day
+NEGATIVE_TTL = float(os.getenv('AUTHORMAPS_NEGATIVE_TTL', 24 * 3600))
+# answer every lookup from the cache without asking PubMed, e.g. after `authormaps ingest`
+OFFLINE = os.getenv('AUTHORMAPS_OFFLINE', '') not in ('', '0')
+
+HIT = 'hit'
+MISS = 'miss'
+STALE = 'stale'
+NEGATIVE = 'negative'
+
+
+class CacheStats:
+    """Thread-safe counters of cache lookups."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, kind: str, outcome: str, n: int = 1) -> None:
+        """Add n lookups of kind ('search' or 'record') with outcome (hit, miss, stale or negative)."""
+        with self.lock:
+            self.counts[f'{kind}_{outcome}'] = self.counts.get(f'{kind}_{outcome}', 0) + n
+        if n:
+            count('cache_lookups', n, kind=kind, outcome=outcome)
+
+    def as_dict(self) -> Dict[str, int]:
+        """Return a copy of all counters."""
+        with self.lock:
+            return dict(self.counts)
+
+    def hit_rate(self, kind: str) -> Optional[float]:
+        """Return the share of lookups of kind answered from cache without asking PubMed."""
+        counts = self.as_dict()
+        answered = counts.get(f'{kind}_{HIT}', 0) + counts.get(f'{kind}_{NEGATIVE}', 0)
+        total = answered + counts.get(f'{kind}_{MISS}', 0) + counts.get(f'{kind}_{STALE}', 0)
+        return answered / total if total else None
+
+
+class CachePolicy:
+    """Decide which cached lookups can be answered locally and which have to be refreshed.
+
+    Parameters
+    ----------
+    cache: CacheBackend
+        Default: the cache of this process.
+    ttl: float
+        Seconds an author search stays fresh.
+    negative_ttl: float
+        Seconds a failed lookup is remembered.
+    offline: bool
+        Never refresh: cached searches are always fresh, uncached authors and publications count as not found.
+    """
+
+    def __init__(self, cache: CacheBackend = None, ttl: float = SEARCH_TTL, negative_ttl: float = NEGATIVE_TTL,
+                 offline: bool = OFFLINE):
+        self._cache = cache
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.offline = offline
+        self.stats = CacheStats()
+
+    @property
+    def cache(self) -> CacheBackend:
+        return self._cache or get_cache()
+
+    def lookup_search(self, query: str) -> Tuple[str, Optional[List[str]], Optional[float]]:
+        """Return (outcome, PMIDs, time of last sync) of an author query.
+
+        outcome is HIT for a fresh entry, STALE for an entry older than ttl that should be refreshed
+        incrementally from its last sync, NEGATIVE for a recently unknown author and MISS otherwise.
+        """
+        with span('cache_read'):
+            entry = self.cache.get_search_entry(query)
+        if entry:
+            pubmedids, synced_at = entry
+            outcome = HIT if self.offline or time.time() - synced_at < self.ttl else STALE
+            self.stats.count('search', outcome)
+            return outcome, pubmedids, synced_at
+        if self.offline or self.lookup_negative(f'search:{query}'):
+            self.stats.count('search', NEGATIVE)
+            return NEGATIVE, None, None
+        self.stats.count('search', MISS)
+        return MISS, None, None
+
+    def lookup_negative(self, key: str) -> Optional[Tuple[int, str]]:
+        """Return (code, message) of a negative entry younger than negative_ttl."""
+        return self.lookup_negatives([key]).get(key)
+
+    def lookup_negatives(self, keys: List[str]) -> Dict[str, Tuple[int, str]]:
+        """Bulk version of lookup_negative, expired entries are left out."""
+        now = time.time()
+        return {key: (code, message) for key, (code, message, created_at) in self.cache.get_negatives(keys).items()
+                if now - created_at < self.negative_ttl}
+
+    def count_records(self, hits: int, misses: int, negatives: int = 0) -> None:
+        """Record the outcome of record lookups done directly on the cache."""
+        self.stats.count('record', HIT, hits)
+        self.stats.count('record', MISS, misses)
+        self.stats.count('record', NEGATIVE, negatives)
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_policy() -> CachePolicy:
+    """Return the cache policy shared by every ApiInterface of this process."""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = CachePolicy()
+        return _policy
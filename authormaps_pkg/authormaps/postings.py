@@ -0,0 +1,149 @@
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+# Fibonacci hashing of the pair keys into the lookup table
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+UINT64_MASK = (1 << 64) - 1
+
+
+class PairPostings:
+    """Shared PMIDs of every connected author pair, held in a few integer arrays.
+
+    Authors get integer ids (their position in the sorted authors), a pair (i, j) with i < j the key i * n + j. The
+    PMIDs of each pair are sorted and delta-encoded into one uint32 array, the postings of pair p are
+    deltas[offsets[p]:offsets[p + 1]]. Pairs are found in O(1) through an open addressing hash table over the keys,
+    so a posting costs four bytes and a pair less than forty, instead of a tuple of strings and a list of strings.
+
+    Parameters
+    ----------
+    authors: List[str]
+        Sorted node ids, e.g. 'Schultz_B'
+    first, second: np.ndarray
+        Author ids of every pair, first < second
+    offsets: np.ndarray
+        Start of the postings of every pair in deltas, followed by the total number of postings
+    deltas: np.ndarray
+        First PMID of a pair, then the differences to the previous PMID
+    """
+
+    def __init__(self, authors: List[str], first: np.ndarray, second: np.ndarray, offsets: np.ndarray,
+                 deltas: np.ndarray):
+        self.authors = list(authors)
+        self.author_ids = {author: i for i, author in enumerate(self.authors)}
+        self.first = np.asarray(first, dtype=np.int32)
+        self.second = np.asarray(second, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.deltas = np.asarray(deltas, dtype=np.uint32)
+        self.__build_table()
+
+    def __len__(self) -> int:
+        return len(self.first)
+
+    @property
+    def n_postings(self) -> int:
+        return len(self.deltas)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the arrays, without the author names."""
+        return sum(array.nbytes for array in (self.first, self.second, self.offsets, self.deltas, self.slots))
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[Tuple[str, str], Iterable[str]]]) -> "PairPostings":
+        """Build the postings from ((author1, author2), PMIDs) items, e.g. of ApiInterface.get_every_author_connection.
+        Pairs given twice or in both orders are merged, pairs of an author with itself are left out."""
+        pairs = [(tuple(sorted(pair)), list(pub_list)) for pair, pub_list in pairs if pair[0] != pair[1] and pub_list]
+        authors = sorted({author for pair, _ in pairs for author in pair})
+        index = {author: i for i, author in enumerate(authors)}
+        if not pairs:
+            return cls(authors, [], [], [0], [])
+
+        lengths = np.fromiter((len(pub_list) for _, pub_list in pairs), dtype=np.int64, count=len(pairs))
+        pair_keys = np.fromiter((index[a] * len(authors) + index[b] for (a, b), _ in pairs), dtype=np.int64,
+                                count=len(pairs))
+        keys = np.repeat(pair_keys, lengths)
+        pmids = np.array([pmid for _, pub_list in pairs for pmid in pub_list], dtype=np.int64)
+        if pmids.min() < 0 or pmids.max() > np.iinfo(np.uint32).max:
+            raise ValueError('PMIDs must fit into 32 bit unsigned integers')
+
+        order = np.lexsort((pmids, keys))
+        keys, pmids = keys[order], pmids[order]
+        distinct = np.ones(len(keys), dtype=bool)
+        distinct[1:] = (keys[1:] != keys[:-1]) | (pmids[1:] != pmids[:-1])
+        keys, pmids = keys[distinct], pmids[distinct]
+
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        deltas = np.diff(pmids, prepend=0)
+        deltas[starts] = pmids[starts]
+        pair_keys = keys[starts]
+        return cls(authors, pair_keys // len(authors), pair_keys % len(authors),
+                   np.concatenate((starts, [len(keys)])), deltas)
+
+    def authors_of(self, ids: np.ndarray) -> List[str]:
+        """Return the node ids of author ids, e.g. of first or second."""
+        return [self.authors[i] for i in ids.tolist()]
+
+    def pair_index(self, author1: str, author2: str) -> Optional[int]:
+        """Return the position of the pair of two node ids in any order, None if they share no publication."""
+        i, j = self.author_ids.get(author1), self.author_ids.get(author2)
+        if i is None or j is None or i == j:
+            return None
+        i, j = min(i, j), max(i, j)
+        slot = (((i * len(self.authors) + j) * HASH_MULTIPLIER) & UINT64_MASK) >> self.shift
+        while True:
+            pair = int(self.slots[slot])
+            if pair < 0:
+                return None
+            if self.first[pair] == i and self.second[pair] == j:
+                return pair
+            slot = (slot + 1) & self.mask
+
+    def count(self, author1: str, author2: str) -> int:
+        """Return the number of shared publications of two node ids."""
+        pair = self.pair_index(author1, author2)
+        return 0 if pair is None else int(self.offsets[pair + 1] - self.offsets[pair])
+
+    def get(self, author1: str, author2: str, offset: int = 0, limit: int = None) -> List[str]:
+        """Return the shared PMIDs of two node ids, newest (highest PMID) first, skipping offset and returning at most
+        limit of them."""
+        pair = self.pair_index(author1, author2)
+        if pair is None:
+            return []
+        pmids = np.cumsum(self.deltas[self.offsets[pair]:self.offsets[pair + 1]], dtype=np.int64)[::-1]
+        end = None if limit is None else offset + limit
+        return [str(pmid) for pmid in pmids[offset:end].tolist()]
+
+    def to_table(self, metadata: Dict[str, str] = None) -> pa.Table:
+        """Return the postings as Arrow table, one row per pair with the delta-encoded PMIDs as list column, the
+        authors and metadata in the schema metadata."""
+        pmids = pa.ListArray.from_arrays(pa.array(self.offsets, type=pa.int32()), pa.array(self.deltas, type=pa.uint32()))
+        table = pa.table({'author1': pa.array(self.first), 'author2': pa.array(self.second), 'pmids': pmids})
+        return table.replace_schema_metadata({**(metadata or {}), 'authors': json.dumps(self.authors)})
+
+    @classmethod
+    def from_table(cls, table: pa.Table) -> "PairPostings":
+        """Inverse of to_table, the arrays of a memory-mapped table are used without copying."""
+        pmids = table.column('pmids').combine_chunks()
+        authors = json.loads(table.schema.metadata[b'authors'])
+        return cls(authors, table.column('author1').to_numpy(), table.column('author2').to_numpy(),
+                   pmids.offsets.to_numpy(), pmids.values.to_numpy())
+
+    def __build_table(self) -> None:
+        """Insert all keys with linear probing into a table of at least twice their number of slots."""
+        keys = self.first.astype(np.uint64) * np.uint64(len(self.authors)) + self.second.astype(np.uint64)
+        bits = max(3, (2 * len(keys)).bit_length())
+        self.shift, self.mask = 64 - bits, (1 << bits) - 1
+        self.slots = np.full(1 << bits, -1, dtype=np.int32)
+        positions = ((keys * np.uint64(HASH_MULTIPLIER)) >> np.uint64(self.shift)).astype(np.int64)
+        pending = np.arange(len(keys))
+        while len(pending):
+            free = self.slots[positions] < 0
+            # the first pending key of a free slot takes it, the others probe the next slot
+            taken, first = np.unique(positions[free], return_index=True)
+            self.slots[taken] = pending[free][first]
+            placed = np.zeros(len(pending), dtype=bool)
+            placed[np.flatnonzero(free)[first]] = True
+            pending, positions = pending[~placed], (positions[~placed] + 1) & self.mask
@@ -0,0 +1,134 @@
+import os
+import gzip
+import json
+import uuid
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Union
+
+import pandas as pd
+
+from authormaps.startup import PROJECT_DIR
+from authormaps.metrics import count
+from authormaps.netcache import network_key
+
+logger = logging.getLogger(__name__)
+
+RENDER_DIR = os.path.join(PROJECT_DIR, 'renders')
+IMAGE_FORMATS = ('png', 'jpg', 'pdf', 'svg')
+
+
+def network_version(network) -> str:
+    """Return the snapshot version of a network, a digest of its edge table if it was not built from a snapshot."""
+    if network.version is not None:
+        return str(network.version)
+    digest = pd.util.hash_pandas_object(network.authormap_file, index=False).values.tobytes()
+    return hashlib.sha256(digest).hexdigest()
+
+
+def render_key(network, dpi: int, with_edge_labels: bool) -> str:
+    """Return the content address of the images of a network, the same for all formats.
+
+    The key is built from the author, the snapshot version, the resolution and whether edge labels are shown,
+    so a refreshed network gets new images and old ones never have to be invalidated.
+    """
+    name = json.dumps([*network_key(network.first_name, network.last_name, network.mode),
+                       network_version(network), int(dpi), bool(with_edge_labels)])
+    return hashlib.sha256(name.encode()).hexdigest()[:32]
+
+
+def node_link_key(network) -> str:
+    """Return the content address of the node-link data of a network."""
+    name = json.dumps([*network_key(network.first_name, network.last_name, network.mode),
+                       network_version(network), 'node-link'])
+    return hashlib.sha256(name.encode()).hexdigest()[:32]
+
+
+class RenderCache:
+    """Directory of rendered network images named by their render_key, e.g. 3f2a...c1.png, and of gzipped node-link
+    data named by their node_link_key, e.g. 9b0e...4d.json.gz.
+
+    Parameters
+    ----------
+    directory: Union[str, Path]
+        Where images are saved. Default: ~/.AuthorMaps/renders
+    """
+
+    def __init__(self, directory: Union[str, Path] = RENDER_DIR):
+        self.directory = Path(directory)
+        self.locks = {}     # render key -> lock, so concurrent requests draw a network only once
+        self.lock = threading.Lock()
+
+    def path(self, key: str, image_format: str) -> Path:
+        return self.directory / f'{key}.{image_format}'
+
+    def get_or_render(self, visualizer, image_format: str = 'png', dpi: int = 300, with_edge_labels: bool = False,
+                      formats: Iterable[str] = None) -> Path:
+        """Return the path of a network image, rendering it first if it is not cached.
+
+        Parameters
+        ----------
+        visualizer: Visualizer
+        image_format: str
+            'png', 'jpg', 'pdf' or 'svg'
+        dpi: int
+        with_edge_labels: bool
+        formats: Iterable[str]
+            Formats rendered together with image_format from the same figure when it is missing. Default: only
+            image_format
+
+        Returns
+        -------
+            path of the image
+        """
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f'image_format must be one of {IMAGE_FORMATS}, not {image_format!r}')
+        key = render_key(visualizer, dpi, with_edge_labels)
+        path = self.path(key, image_format)
+        if path.exists():
+            count('render_cache_lookups', outcome='hit')
+            return path
+        with self.__key_lock(key):
+            if not path.exists():
+                count('render_cache_lookups', outcome='miss')
+                self.directory.mkdir(parents=True, exist_ok=True)
+                formats = dict.fromkeys([image_format, *(formats or [])])
+                missing = [f for f in formats if not self.path(key, f).exists()]
+                # save to temporary files first, so a half written image is never served
+                temporary = {f: self.directory / f'{key}.{uuid.uuid4().hex}.tmp.{f}' for f in missing}
+                visualizer.save_graph_images(list(temporary.values()), dpi=dpi, with_edge_labels=with_edge_labels)
+                for f, temporary_path in temporary.items():
+                    os.replace(temporary_path, self.path(key, f))
+                logger.info(f'Rendered {", ".join(missing)} images of {key}')
+        return path
+
+    def get_or_write_node_link(self, visualizer) -> Path:
+        """Return the path of the gzipped node-link data of a network (see Visualizer.node_link_data),
+        writing it first if it is not cached."""
+        key = node_link_key(visualizer)
+        path = self.path(key, 'json.gz')
+        if path.exists():
+            return path
+        with self.__key_lock(key):
+            if not path.exists():
+                self.directory.mkdir(parents=True, exist_ok=True)
+                temporary = self.directory / f'{key}.{uuid.uuid4().hex}.tmp'
+                with gzip.open(temporary, 'wt', encoding='utf-8') as f:
+                    json.dump(visualizer.node_link_data(), f, separators=(',', ':'))
+                os.replace(temporary, path)
+        return path
+
+    @contextmanager
+    def __key_lock(self, key: str):
+        """Hold the lock of one key, so concurrent requests write a file only once."""
+        with self.lock:
+            key_lock = self.locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                yield
+        finally:
+            with self.lock:
+                self.locks.pop(key, None)
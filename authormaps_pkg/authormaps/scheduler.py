@@ -0,0 +1,226 @@
+import os
+import time
+import functools
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from authormaps.metrics import count, span
+
+logger = logging.getLogger(__name__)
+
+EUTILS_URL = os.getenv('AUTHORMAPS_EUTILS_URL', 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils')
+EMAIL = 'dhwanisolanki128@gmail.com'
+TOOL = 'authormaps'
+
+# requests per second allowed by NCBI
+ANONYMOUS_RATE = 3
+API_KEY_RATE = 10
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# priority of the requests of the current thread, see background
+_priority = threading.local()
+
+
+@contextmanager
+def background():
+    """Send the requests of the current thread, and of the map calls it makes, with low priority: before every
+    attempt they wait until no request of normal priority is waiting for or sending a request. Used for prefetching,
+    see authormaps.warm."""
+    previous = in_background()
+    _priority.background = True
+    try:
+        yield
+    finally:
+        _priority.background = previous
+
+
+def in_background() -> bool:
+    """True while the current thread sends with low priority."""
+    return getattr(_priority, 'background', False)
+
+
+def _call_in_background(fn: Callable, item):
+    with background():
+        return fn(item)
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting how many requests are sent per second."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.nominal_rate = rate
+        self.rate = rate
+        # at least one token, else rates below one request per second (e.g. the share of a batch worker) never get one
+        self.capacity = max(1, capacity or rate)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available and take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def slow_down(self) -> None:
+        """Halve the rate after the server pushed back, never below one request every two seconds."""
+        with self.lock:
+            self.rate = max(0.5, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def speed_up(self) -> None:
+        """Recover the rate step by step after successful requests."""
+        with self.lock:
+            self.rate = min(self.nominal_rate, self.rate * 1.1)
+
+
+class FetchScheduler:
+    """Send requests to the E-utilities through pooled keep-alive connections at the rate NCBI allows.
+
+    Parameters
+    ----------
+    api_key: str
+        NCBI API key, raises the allowed rate from 3 to 10 requests per second. Defaults to $NCBI_API_KEY.
+    max_workers: int
+        Number of threads used by map, half as many run the map calls of background prefetching.
+    max_retries: int
+        How often a request is repeated after a 429/5xx response or a connection error.
+    base_url: str
+        Base url of the E-utilities.
+    rate: float
+        Requests per second. Default: the NCBI limit, 3 or 10 with API key
+    """
+
+    def __init__(self, api_key: str = None, max_workers: int = None, max_retries: int = 5,
+                 base_url: str = EUTILS_URL, rate: float = None):
+        self.api_key = api_key if api_key is not None else os.getenv('NCBI_API_KEY')
+        rate = rate or (API_KEY_RATE if self.api_key else ANONYMOUS_RATE)
+        self.bucket = TokenBucket(rate)
+        # at least one thread, as for the token bucket capacity
+        self.max_workers = max_workers or max(1, int(rate * 2))
+        self.max_retries = max_retries
+        self.base_url = base_url.rstrip('/')
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='authormaps-fetch')
+        # background tasks get their own threads, so they never hold up the map calls of interactive requests
+        self.background_executor = ThreadPoolExecutor(max_workers=max(1, self.max_workers // 2),
+                                                      thread_name_prefix='authormaps-prefetch')
+        self.interactive = 0    # requests of normal priority waiting or in flight
+        self.idle = threading.Condition()
+
+    def request(self, method: str, endpoint: str, params: dict = None, data: dict = None,
+                headers: dict = None) -> requests.Response:
+        """Send one rate limited request, backing off on 429/5xx responses and connection errors.
+        Requests sent in background() wait until no other request is waiting or in flight.
+
+        Returns the last response when every retry failed with a retryable status code.
+        """
+        if in_background():
+            return self.__send(method, endpoint, params, data, headers, background=True)
+        with self.idle:
+            self.interactive += 1
+        try:
+            return self.__send(method, endpoint, params, data, headers, background=False)
+        finally:
+            with self.idle:
+                self.interactive -= 1
+                self.idle.notify_all()
+
+    def __send(self, method: str, endpoint: str, params: Optional[dict], data: Optional[dict],
+               headers: Optional[dict], background: bool) -> requests.Response:
+        params = dict(params or {}, tool=TOOL, email=EMAIL)
+        if self.api_key:
+            params['api_key'] = self.api_key
+        url = f'{self.base_url}/{endpoint}'
+        stage = endpoint.split('.')[0]    # e.g. esearch
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                count('request_retries', endpoint=stage)
+            if background:
+                with span('background_wait'), self.idle:
+                    self.idle.wait_for(lambda: self.interactive == 0)
+            with span('rate_limit_wait'):
+                self.bucket.acquire()
+            try:
+                with span(stage):
+                    response = self.session.request(method, url, params=params, data=data, headers=headers, timeout=60)
+            except requests.ConnectionError:
+                count('requests', endpoint=stage, status='connection_error')
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f'Connection error for {url}, retrying')
+                self.__backoff(attempt)
+                continue
+            count('requests', endpoint=stage, status=response.status_code)
+            count('bytes_downloaded', len(response.content), endpoint=stage)
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    self.bucket.speed_up()
+                return response
+            logger.warning(f'{response.status_code} from {url}, backing off')
+            self.__backoff(attempt, response.headers.get('Retry-After'))
+
+    def get(self, endpoint: str, params: dict = None, headers: dict = None) -> requests.Response:
+        """Send a rate limited GET request to an E-utility, e.g. 'esearch.fcgi'."""
+        return self.request('GET', endpoint, params=params, headers=headers)
+
+    def post(self, endpoint: str, data: dict = None, headers: dict = None) -> requests.Response:
+        """Send a rate limited POST request to an E-utility, e.g. 'epost.fcgi'."""
+        return self.request('POST', endpoint, data=data, headers=headers)
+
+    def map(self, fn: Callable, items: Iterable) -> Iterator:
+        """Apply fn to every item on the thread pool, results are yielded in input order. Called in background(), fn
+        runs in background on the threads for background tasks."""
+        if in_background():
+            return self.background_executor.map(functools.partial(_call_in_background, fn), items)
+        return self.executor.map(fn, items)
+
+    def __backoff(self, attempt: int, retry_after: Optional[str] = None) -> None:
+        """Slow the bucket down and wait before the next attempt."""
+        self.bucket.slow_down()
+        try:
+            wait = float(retry_after)
+        except (TypeError, ValueError):
+            wait = 0.5 * 2 ** attempt
+        time.sleep(min(wait, 30))
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> FetchScheduler:
+    """Return the scheduler shared by every ApiInterface of this process."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FetchScheduler()
+        return _scheduler
+
+
+def set_scheduler(scheduler: Optional[FetchScheduler]) -> None:
+    """Replace the scheduler of this process, e.g. by one sending to a local server. None falls back to the default
+    on next access."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
@@ -1,76 +1,178 @@
-import requests
+import io
+import os
+import logging
 import xmltodict as xmltodict
-from itertools import combinations
-from Bio import Entrez
 from Bio import Medline
-import os
 
-Entrez.email = 'dhwanisolanki128@gmail.com'
-import json
-from authormaps.startup import DATA_DIR
 import time
-import pandas as pd
-from tqdm import tqdm
-import xml.etree.ElementTree as ET
-from typing import List, Dict, Tuple
+from authormaps.policy import get_policy, HIT, STALE, NEGATIVE
+from authormaps.scheduler import get_scheduler
+from authormaps.metrics import span
+from authormaps.names import NameIndex, canonical_key, node_ids, display_name, index_records
+from typing import Callable, List, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# number of MEDLINE records requested per EFetch call
+EFETCH_BATCH_SIZE = 200
+# number of PMIDs requested per ESearch page, PubMed returns no more than the first ESEARCH_MAX_IDS of a search
+ESEARCH_PAGE_SIZE = 5000
+ESEARCH_MAX_IDS = 9999
+# publications downloaded and read per step of publicalistfiltered, only one step of records is held in memory
+STREAM_BATCH_SIZE = 1000
+# authors with more publications are refused with status 705, 0 for no limit
+MAX_PUBLICATIONS = int(os.getenv('AUTHORMAPS_MAX_PUBLICATIONS', 0))
+# publications with more authors are consortium papers: their members are no nodes and a paper shared by two
+# co-authors counts as CONSORTIUM_WEIGHT shared publications, 0 leaves consortium papers out
+CONSORTIUM_SIZE = int(os.getenv('AUTHORMAPS_CONSORTIUM_SIZE', 50))
+CONSORTIUM_WEIGHT = float(os.getenv('AUTHORMAPS_CONSORTIUM_WEIGHT', 0.1))
+# partial results are published after this many new co-authors or co-authors searched, see ApiInterface.partial
+PARTIAL_BATCH_SIZE = 25
+
+# edge computation modes: 'global' counts every publication of the co-authors (one esearch per co-author),
+# 'seed' counts only the publications of the queried author (no additional requests)
+GLOBAL_MODE = 'global'
+SEED_MODE = 'seed'
+MODES = (GLOBAL_MODE, SEED_MODE)
+
+
+def author_query(lastname: str, firstname: str) -> str:
+    """key of an author query in cache, e.g. 'BruceSchultz'"""
+    return f'{firstname.capitalize()}{lastname.capitalize()}'
 
 
 class ApiInterface:
-    def __init__(self,  lastname,firstname,):
+    def __init__(self,  lastname,firstname, progress: Callable = None, partial: Callable = None):
         """
 
         Parameters
         ----------
         firstname
         lastname
+        progress: called with every new messagefrontend, e.g. to report the stage to a waiting web page
+        partial: called with partial results as they are found, ('coauthors', names) for new co-authors and
+                 ('edges', [[name1, name2, shared publications], ...]) for new or grown edges, names in reading order
         """
 
         self.firstname = firstname.capitalize()
         self.lastname = lastname.capitalize()
+        self.progress = progress
+        self.partial = partial
         self.pubmedidlist = None
         self.nodelistunique = None
         self.messagefrontend = None
         self.searchlist = False
         self.nodelistunique_filter = None
-
-
-    def getpubmedidlist(self):
-        """get list of publication for a queried author saved as xml file in cache or from API """
-        
-        path = os.path.join(DATA_DIR, f'{self.firstname}{self.lastname}.xml')
+        self.publication_authors = {}
+        self.consortium_pubmedids = set()
+        self.pub_dict = {}
+        self.postings = None
+
+
+    @property
+    def messagefrontend(self):
+        """current stage (str) or final status code and data (tuple) of the query"""
+        return self._messagefrontend
+
+    @messagefrontend.setter
+    def messagefrontend(self, value):
+        self._messagefrontend = value
+        if self.progress is not None:
+            self.progress(value)
+
+    def publish(self, event: str, data) -> None:
+        """Pass a partial result to the partial callback, if any."""
+        if self.partial is not None:
+            self.partial(event, data)
+
+    def publish_edges(self, pairs) -> None:
+        """Publish ((author1, author2), shared publications) items as 'edges'."""
+        if self.partial is None:
+            return
+        edges = [[display_name(a), display_name(b), self.shared_publications(pub_list)] for (a, b), pub_list in pairs]
+        if edges:
+            self.publish('edges', edges)
+
+    @property
+    def query(self) -> str:
+        """key of the author query in cache"""
+        return author_query(self.lastname, self.firstname)
+
+    def getpubmedidlist(self, refresh: bool = False):
+        """get list of publication for a queried author saved in cache or from API.
+        Searches older than the cache TTL, or every cached search with refresh=True, are refreshed incrementally,
+        asking only for publications added since the last sync. Authors not found are remembered for the negative TTL."""
+
+        policy = get_policy()
+        outcome, cached_ids, synced_at = policy.lookup_search(self.query)
+        if refresh and outcome == HIT and not policy.offline:
+            outcome = STALE
         # checks if we have the pubmed ids of author in cache
-        if f'{self.firstname}{self.lastname}.xml' in os.listdir(DATA_DIR):
-            self.pubmedidlist = xmltodict.parse(ET.tostring(ET.parse(path).getroot()))['eSearchResult']['IdList']['Id']
-            if not isinstance(self.pubmedidlist, list):
-                self.pubmedidlist = [self.pubmedidlist]
+        if outcome == HIT:
+            self.pubmedidlist = cached_ids
             self.searchlist = True
+        elif outcome == NEGATIVE:
+            self.messagefrontend = (702, f"No list of publications for this author found: {self.firstname} {self.lastname}")
         else:
             self.messagefrontend = 'searching pubmed database for list of publication of authors'
-            api_query = f'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?db=pubmed&term={self.lastname}+{self.firstname}%5Bauthor%5D&retmax=9999'
-
-            header = {"Accept": "text/xml"}
-            r = requests.get(api_query, headers=header)
-            if r.status_code == 200:
-                if xmltodict.parse(r.text)['eSearchResult']['IdList'] is None:
+            params = {'db': 'pubmed', 'term': f'{self.lastname} {self.firstname}[author]'}
+            if outcome == STALE:
+                # only publications entered since the day of the last sync
+                params.update(datetype='edat', mindate=time.strftime('%Y/%m/%d', time.localtime(synced_at)), maxdate='3000')
+
+            status_code, new_ids = self.esearch(params)
+            if status_code == 200:
+                if outcome == STALE:
+                    self.pubmedidlist = list(dict.fromkeys(new_ids + cached_ids))
+                elif new_ids:
+                    self.pubmedidlist = new_ids
+
+                if self.pubmedidlist:
+                    self.messagefrontend = f'downloading {len(self.pubmedidlist)} publications  of author, it may take a moment'
+                    policy.cache.put_search(self.query, self.pubmedidlist)
+                    self.searchlist = True
+                else:
                     print("No list of publications for this author found :", f'{self.firstname} {self.lastname}')
                     # author not found
                     self.messagefrontend = (702, f"No list of publications for this author found: {self.firstname} {self.lastname}")
+                    policy.cache.put_negative(f'search:{self.query}', 702, self.messagefrontend[1])
 
-                elif xmltodict.parse(r.text)['eSearchResult']['IdList']['Id'] != None:
-                    self.pubmedidlist = xmltodict.parse(r.text)['eSearchResult']['IdList']['Id']
-                    self.messagefrontend = f'downloading {len(self.pubmedidlist)} publications  of author, it may take a moment'
-                    if not isinstance(self.pubmedidlist, list):
-                        self.pubmedidlist = [self.pubmedidlist]
-                    with open(path, "w") as f:
-                        f.write(r.text)          # write to xml file
-                    self.searchlist = True
-
-            elif r.status_code == 400:
+            elif outcome == STALE:
+                # PubMed unavailable, the outdated list is better than none
+                self.pubmedidlist = cached_ids
+                self.searchlist = True
+            elif status_code == 400:
                 print(f'Bad Request!! for {self.firstname}{self.lastname}')
                 self.messagefrontend = (702, f'Bad Request!! for {self.firstname} {self.lastname}')
             else:
                 self.messagefrontend = (702, 'Other errors while requesting pubmed')
-            time.sleep(0.4)
+
+    def esearch(self, params: dict) -> Tuple[int, List[str]]:
+        """ Return the status code and the PMIDs of an ESearch, requested page by page with retstart,
+            ESEARCH_PAGE_SIZE ids at a time. PubMed answers at most ESEARCH_MAX_IDS ids of one search.
+        """
+        header = {"Accept": "text/xml"}
+        ids = []
+        count = 1
+        while len(ids) < min(count, ESEARCH_MAX_IDS):
+            page = dict(params, retstart=len(ids), retmax=min(ESEARCH_PAGE_SIZE, ESEARCH_MAX_IDS - len(ids)))
+            r = get_scheduler().get('esearch.fcgi', params=page, headers=header)
+            if r.status_code != 200:
+                return r.status_code, []
+            result = xmltodict.parse(r.text)['eSearchResult']
+            idlist = result['IdList']
+            page_ids = idlist['Id'] if idlist and idlist.get('Id') is not None else []
+            if not isinstance(page_ids, list):
+                page_ids = [page_ids]
+            if not page_ids:
+                break
+            ids.extend(page_ids)
+            count = int(result.get('Count') or len(ids))
+            if len(ids) < count:
+                self.messagefrontend = f'found {len(ids)} of {count} publications of author'
+        if count > ESEARCH_MAX_IDS:
+            logger.warning(f'{params["term"]} has {count} publications, only the first {ESEARCH_MAX_IDS} are used')
+        return 200, ids
 
 
     def coauthorslist(self, pubmedid:str) -> List:
@@ -84,73 +186,235 @@ class ApiInterface:
            coauthors: List containing the coauthors
 
         """
-        # check if we have the json file for publication in cache
-        if f'{pubmedid}.json' in os.listdir(DATA_DIR):
-            path = os.path.join(DATA_DIR, f'{pubmedid}.json')
-            with open(path) as json_file:
-                content = json.load(json_file)
-                if 'FAU' in content:
-                    co_authors = [i.replace(',','') for i in content['FAU']]
-                    return co_authors
-                else:
-                    self.messagefrontend = (701, 'FAU Key Not Found')
+        policy = get_policy()
+        # check if we have the record of publication in cache
+        with span('cache_read'):
+            content = policy.cache.get_record(pubmedid)
+        if content is not None:
+            policy.count_records(hits=1, misses=0)
+            if 'FAU' in content:
+                co_authors = [i.replace(',','') for i in content['FAU']]
+                return co_authors
+            else:
+                self.messagefrontend = (701, 'FAU Key Not Found')
+        elif policy.offline or policy.lookup_negative(f'record:{pubmedid}'):
+            policy.count_records(hits=0, misses=0, negatives=1)
+            self.messagefrontend = (701, 'FAU Key Not Found')
         else:
-            from urllib.error import HTTPError
-
+            policy.count_records(hits=0, misses=1)
             self.messagefrontend = 'downloading all publications of author'
-            try:
-                Entrez.efetch(db="pubmed", id=pubmedid, rettype="medline", retmode="text")
-            except HTTPError as e:  # using urllib2.HTTPError
-                print(f'publication {pubmedid} not found, {e}')
-                self.messagefrontend = f'publication {pubmedid} not found, {e}' 
+            r = get_scheduler().get('efetch.fcgi', params={'db': 'pubmed', 'id': pubmedid, 'rettype': 'medline', 'retmode': 'text'})
+            if r.status_code != 200:
+                print(f'publication {pubmedid} not found, {r.status_code}')
+                self.messagefrontend = f'publication {pubmedid} not found, {r.status_code}'
             else:
-                filedb = Entrez.efetch(db="pubmed", id=pubmedid, rettype="medline", retmode="text")
-                for i in Medline.parse(filedb):
+                dicfiledb = {}
+                for i in Medline.parse(io.StringIO(r.text)):
                     dicfiledb = dict(i)
 
                 if 'FAU' in dicfiledb:
                     co_authors = [i.replace(',','') for i in dicfiledb['FAU']]
-                    with open(os.path.join(DATA_DIR, f'{pubmedid}.json'), 'w') as fp:
-                        json.dump(dicfiledb, fp)
-                    time.sleep(0.4)
+                    policy.cache.put_records({pubmedid: dicfiledb})
+                    index_records({pubmedid: dicfiledb})
                     return co_authors
                 else:
                     self.messagefrontend = (701,'FAU Key Not Found')
+                    policy.cache.put_negative(f'record:{pubmedid}', 701, 'FAU Key Not Found')
+
+    def fetch_publications(self, pubmedids: List[str]) -> None:
+        """ download the records of all uncached publications in batches and save them to cache.
+            The uncached ids are posted once to the history server (EPost) and the MEDLINE records are
+            then streamed back EFETCH_BATCH_SIZE at a time, instead of one request per publication.
+
+           Parameters
+           ----------
+           pubmedids: List of pubmed ids
+        """
+        policy = get_policy()
+        cache = policy.cache
+        with span('cache_read'):
+            missing = cache.missing(pubmedids)
+        negatives = policy.lookup_negatives([f'record:{pubmedid}' for pubmedid in missing])
+        missing = [pubmedid for pubmedid in missing if f'record:{pubmedid}' not in negatives]
+        if not missing or policy.offline:
+            return
+
+        self.messagefrontend = f'downloading {len(missing)} publications of author in batches'
+        scheduler = get_scheduler()
+        r = scheduler.post('epost.fcgi', data={'db': 'pubmed', 'id': ",".join(missing)})
+        if r.status_code != 200:
+            # whatever is still missing falls back to coauthorslist fetching it one by one
+            print(f'batch download of publications failed, {r.status_code}')
+            self.messagefrontend = f'batch download of publications failed, {r.status_code}'
+            return
+        posted = xmltodict.parse(r.text)['ePostResult']
+
+        def fetch_batch(retstart: int) -> None:
+            params = {'db': 'pubmed', 'rettype': 'medline', 'retmode': 'text', 'WebEnv': posted['WebEnv'],
+                      'query_key': posted['QueryKey'], 'retstart': retstart, 'retmax': EFETCH_BATCH_SIZE}
+            r = scheduler.get('efetch.fcgi', params=params)
+            if r.status_code != 200:
+                return
+            records = {}
+            with span('parse_medline'):
+                parsed = list(Medline.parse(io.StringIO(r.text)))
+            for record in parsed:
+                if 'PMID' not in record:
+                    continue
+                if 'FAU' in record:
+                    records[record['PMID']] = dict(record)
+                else:
+                    cache.put_negative(f"record:{record['PMID']}", 701, 'FAU Key Not Found')
+            with span('cache_write'):
+                cache.put_records(records)
+            index_records(records)
+
+        list(scheduler.map(fetch_batch, range(0, len(missing), EFETCH_BATCH_SIZE)))
 
+    def iter_publications(self, pubmedids: List[str]) -> Iterator[Tuple[str, List[str]]]:
+        """ Yield PMID and authors of every publication with authors. The records are downloaded and read from cache
+            STREAM_BATCH_SIZE publications at a time, so memory does not grow with the number of publications,
+            and the progress is reported after every step.
+
+           Parameters
+           ----------
+           pubmedids: List of pubmed ids
+        """
+        from tqdm import tqdm
+        policy = get_policy()
+        with tqdm(total=len(pubmedids)) as bar:
+            for start in range(0, len(pubmedids), STREAM_BATCH_SIZE):
+                batch = pubmedids[start:start + STREAM_BATCH_SIZE]
+                self.fetch_publications(batch)
+                with span('cache_read'):
+                    records = policy.cache.get_records(batch)
+                found = [pubmedid for pubmedid in batch if 'FAU' in records.get(pubmedid, {})]
+                policy.count_records(hits=len(found), misses=0)
+                found = set(found)
+                for pubmedid in batch:
+                    if pubmedid in found:
+                        authorlist = [i.replace(',', '') for i in records[pubmedid]['FAU']]
+                    else:
+                        # not downloaded or without authors, coauthorslist tries once more or reports it
+                        authorlist = self.coauthorslist(pubmedid)
+                    if authorlist:
+                        yield pubmedid, authorlist
+                bar.update(len(batch))
+                self.messagefrontend = f'read {start + len(batch)} of {len(pubmedids)} publications of author'
 
     def publicalistfiltered(self) -> List:
-        """ coauthors list filtered only for first author query to handle name collisions
+        """ coauthors list filtered only for first author query to handle name collisions.
+            Publications are streamed, see iter_publications. Members of consortium papers (more than CONSORTIUM_SIZE
+            authors) are no nodes, the papers are kept in publication_authors with the co-authors found on the other
+            publications and listed in consortium_pubmedids.
             Returns
             -------
             self.nodelistunique: Node list containing coauthors
             
         """
         
-        nodelist_filter = []
-        nodelist = []
+        nodes = set()
+        all_authors = set()
+        new_nodes = []
+        consortium = []
+        self.publication_authors = {}
+        self.consortium_pubmedids = set()
         self.getpubmedidlist()
 
         if self.pubmedidlist:
             # check for max. allowed publications
-            if len(self.pubmedidlist) > 1000:
+            if MAX_PUBLICATIONS and len(self.pubmedidlist) > MAX_PUBLICATIONS:
                 self.messagefrontend = (705, f"PLease specify your search, too many publications found {len(self.pubmedidlist)}")
-            else:
-                if self.searchlist:
-                    for pubmedid in tqdm(self.pubmedidlist, total=len(self.pubmedidlist)):
-                        authorlist = self.coauthorslist(pubmedid)
-
-                        if authorlist:
-                            if len(authorlist) > 1 and len(authorlist) < 51 :  # restricts articles that have more than 50 authors
-                                if f'{self.lastname} {self.firstname}'.lower() in [a.lower() for a in authorlist]:
+            elif self.searchlist:
+                for pubmedid, authorlist in self.iter_publications(self.pubmedidlist):
+                    if self.is_consortium_paper(authorlist):
+                        if self.is_own_publication(authorlist):
+                            consortium.append(pubmedid)
+                        continue
+                    all_authors.update(authorlist)
+                    if self.is_own_publication(authorlist):
+                        if self.partial is not None:
+                            new_nodes.extend(a for a in dict.fromkeys(authorlist) if a not in nodes)
+                            if len(new_nodes) >= PARTIAL_BATCH_SIZE:
+                                self.publish('coauthors', [display_name(a) for a in new_nodes])
+                                new_nodes = []
+                        nodes.update(authorlist)
+                        self.publication_authors[pubmedid] = authorlist
+                if new_nodes:
+                    self.publish('coauthors', [display_name(a) for a in new_nodes])
+
+                if consortium and CONSORTIUM_WEIGHT:
+                    # read again once the co-authors are known instead of keeping thousands of members in memory
+                    for pubmedid, authorlist in self.iter_publications(consortium):
+                        members = self.consortium_members(authorlist, nodes)
+                        if members:
+                            self.publication_authors[pubmedid] = members
+                            self.consortium_pubmedids.add(pubmedid)
+
+        self.nodelistunique = list(nodes)
+        self.nodelistunique_filter = list(all_authors)
+        return self.nodelistunique
 
-                                    nodelist.append(authorlist)
-                            nodelist_filter.append(authorlist)
+    def is_own_publication(self, authorlist: List[str]) -> bool:
+        """ True if the queried author is among the authors of a publication with at least 2 authors,
+        names are compared by canonical_key, so case and diacritics do not matter"""
+        if len(authorlist) < 2:
+            return False
+        key = canonical_key(f'{self.lastname} {self.firstname}')
+        return any(canonical_key(a) == key for a in authorlist)
 
+    @staticmethod
+    def is_consortium_paper(authorlist: List[str]) -> bool:
+        """ True for publications with more than CONSORTIUM_SIZE authors"""
+        return len(authorlist) > CONSORTIUM_SIZE
 
+    @staticmethod
+    def consortium_members(authorlist: List[str], coauthors: set) -> Optional[List[str]]:
+        """ Return the authors of a consortium paper among coauthors, None if fewer than two"""
+        members = [a for a in authorlist if a in coauthors]
+        return members if len(members) > 1 else None
+
+    def consortium_papers(self, pubmedids: List[str]) -> set:
+        """ Return the consortium papers among pubmedids. Their records are read from cache, the missing ones
+            downloaded in batches first, publications without a record count as no consortium paper"""
+        policy = get_policy()
+        consortium = set()
+        for start in range(0, len(pubmedids), STREAM_BATCH_SIZE):
+            batch = pubmedids[start:start + STREAM_BATCH_SIZE]
+            self.fetch_publications(batch)
+            with span('cache_read'):
+                records = policy.cache.get_records(batch)
+            consortium.update(pubmedid for pubmedid, record in records.items()
+                              if self.is_consortium_paper(record.get('FAU', [])))
+        return consortium
+
+    def weight_consortium_papers(self, pairs: Dict) -> Dict:
+        """ Find the consortium papers among the shared publications of pairs, also those the queried author is
+            not on, so they count CONSORTIUM_WEIGHT like those of publicalistfiltered. They are added to
+            consortium_pubmedids, with CONSORTIUM_WEIGHT 0 they are left out of the pairs instead.
 
-        self.nodelistunique = list(set(sum(nodelist, [])))
-        self.nodelistunique_filter = list(set(sum(nodelist_filter, [])))
-        return self.nodelistunique
+            Returns
+            -------
+            pairs still sharing a publication
+        """
+        if CONSORTIUM_WEIGHT == 1:
+            return pairs
+        consortium = self.consortium_papers(sorted({pubmedid for pub_list in pairs.values() for pubmedid in pub_list}))
+        if CONSORTIUM_WEIGHT:
+            self.consortium_pubmedids.update(consortium)
+            return pairs
+        pairs = {pair: [pubmedid for pubmedid in pub_list if pubmedid not in consortium]
+                 for pair, pub_list in pairs.items()}
+        return {pair: pub_list for pair, pub_list in pairs.items() if pub_list}
+
+    def shared_publications(self, pub_list: List[str]) -> float:
+        """ Return the number of shared publications in pub_list, consortium papers counting CONSORTIUM_WEIGHT"""
+        n = len(pub_list)
+        if self.consortium_pubmedids:
+            consortium = len(self.consortium_pubmedids.intersection(pub_list))
+            if consortium:
+                return round(n - consortium * (1 - CONSORTIUM_WEIGHT), 3)
+        return n
 
     def get_every_author_connection(self) -> Dict:
         """ Returns dict containing list of publications for every pair of authors
@@ -160,39 +424,63 @@ class ApiInterface:
             common_dict: key: Tuple, value: List
 
         """
-        common_dict = {}
+        from tqdm import tqdm
+        from authormaps.pairs import count_pairs
         pub_dict = {}
         author_list = self.publicalistfiltered()
-
-        # fetching pub details of every author
-        for a in tqdm(author_list, total=len(author_list)):
-
-            lastname,firstname = a.split(' ')[0], ' '.join(a.split(' ')[1:])
-
-            obj_a = ApiInterface(lastname,firstname) #+ order name
-            obj_a.getpubmedidlist()
-            pub_list = obj_a.pubmedidlist
+        self.pub_dict = pub_dict
+
+        # fetching pub details of every author, the searches run concurrently on the shared scheduler
+        if author_list:
+            self.messagefrontend = f'searching publications of {len(author_list)} co-authors'
+        pub_lists = get_scheduler().map(coauthor_publications, author_list)
+        holders, shared, changed = {}, {}, set()   # for the partial edges
+        for n, (a, pub_list) in enumerate(tqdm(zip(author_list, pub_lists), total=len(author_list)), 1):
             pub_dict[a] = pub_list
+            if self.partial is not None:
+                # edges among the co-authors searched so far, published in batches
+                for pubmedid in dict.fromkeys(pub_list or []):
+                    for b in holders.setdefault(pubmedid, []):
+                        shared.setdefault((b, a), []).append(pubmedid)
+                        changed.add((b, a))
+                    holders[pubmedid].append(a)
+                if n % PARTIAL_BATCH_SIZE == 0 or n == len(author_list):
+                    self.publish_edges((pair, shared[pair]) for pair in changed)
+                    changed = set()
+
+        with span('count_pairs'):
+            common_dict = count_pairs(pub_dict)
+        return self.weight_consortium_papers(common_dict)
+
+
+    def get_seed_author_connection(self) -> Dict:
+        """ Returns dict containing list of publications for every pair of authors, counting only the
+            publications of the queried author. Pairs are taken from the author lists already downloaded
+            by publicalistfiltered, so no further requests are made.
 
-        author_combination = combinations(author_list, 2)
-        dict_keys = pub_dict.keys()
-        for a_tuple in author_combination:
-            if a_tuple[0] in dict_keys and a_tuple[1] in dict_keys:
-                if pub_dict[a_tuple[0]] and pub_dict[a_tuple[1]]:
-                    common_publication = set(pub_dict[a_tuple[0]]).intersection(set(pub_dict[a_tuple[1]]))
-                    if common_publication:
-                        common_dict[a_tuple] = list(common_publication)
-
+            Returns
+            -------
+            common_dict: key: Tuple, value: List
 
+        """
+        from authormaps.pairs import count_pairs
+        self.publicalistfiltered()
+        pub_dict = {}
+        for pubmedid, authorlist in self.publication_authors.items():
+            for a in authorlist:
+                pub_dict.setdefault(a, []).append(pubmedid)
+        with span('count_pairs'):
+            common_dict = count_pairs({a: pub_dict[a] for a in sorted(pub_dict)})
+        self.publish_edges(common_dict.items())
         return common_dict
 
-
     def printmessage(self):
         """ print message to frontend web server to notify when potential name collisions happen"""
 
-        if self.nodelistunique_filter and self.nodelistunique:
+        # one spelling of every author with the queried last name, looked up in an index instead of scanning
+        listnamecollision = NameIndex(self.nodelistunique_filter or []).with_last_name(self.lastname)
 
-            listnamecollision=[i for i in self.nodelistunique_filter if self.lastname in i]
+        if self.nodelistunique_filter and self.nodelistunique:
 
             if listnamecollision:
 
@@ -205,7 +493,7 @@ class ApiInterface:
                 self.messagefrontend = (700, f'Done')
 
         elif self.nodelistunique_filter:
-            self.messagefrontend =(704, [" ".join(l.split()[1:])+" "+l.split()[0] for l in self.nodelistunique_filter if self.lastname.lower() in l.lower()])
+            self.messagefrontend =(704, [" ".join(l.split()[1:])+" "+l.split()[0] for l in listnamecollision])
 
         else:
 
@@ -228,15 +516,40 @@ class ApiInterface:
         return name.split(' ')[0]+'_'+ '_'.join([i[0] for i in (name.split(' ')[1:])]) #+ order name
 
 
-    def make_dataframe(self) -> "Dataframe":
+    def make_dataframe(self, mode: str = GLOBAL_MODE) -> "Dataframe":
         """ Returns node and edge dataframes
+            Parameters
+            ----------
+            mode: 'global' to count all publications of every co-author pair, 'seed' to count only the
+                  publications of the queried author. Default: 'global'
+
             Returns 
             -------
             node_df, edge_df
         """
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {MODES}, not {mode!r}')
+
+        if mode == SEED_MODE:
+            author_dict = self.get_seed_author_connection()
+        else:
+            author_dict = self.get_every_author_connection()
+        with span('dataframes'):
+            return self.dataframes_from_connections(author_dict)
 
-        author_dict = self.get_every_author_connection()
+    def dataframes_from_connections(self, author_dict: Dict) -> "Dataframe":
+        """ Returns node and edge dataframes of the pairs in author_dict, using the co-authors
+            found by publicalistfiltered as nodes
+            Parameters
+            ----------
+            author_dict: key: Tuple, value: List of shared publications
 
+            Returns
+            -------
+            node_df, edge_df
+        """
+        import pandas as pd
+        from authormaps.postings import PairPostings
         if self.nodelistunique:
             nodes_from_edges = set([item for t in author_dict.keys() for item in t])
             nodes_set = set(self.nodelistunique)
@@ -252,16 +565,28 @@ class ApiInterface:
             if self.searchlist:
                 edge_list = []
                 for k, v in author_dict.items():
-                    edge_list.append([k[0], k[1], len(v)])
+                    edge_list.append([k[0], k[1], self.shared_publications(v)])
 
                 edge_df = pd.DataFrame(edge_list, columns=['author1', 'author2', 'pub_id'])
 
                 node_df = pd.DataFrame.from_records([self.nodelistunique]).transpose()
                 node_df.columns = ['full_name']
-                node_df['short_name'] = node_df['full_name'].apply(self.reduced_name)
+                # ids like reduced_name, but authors sharing one (Bruce and Benjamin Schultz) stay apart
+                ids = node_ids(nodes_set.union(*author_dict))
+                node_df['short_name'] = node_df['full_name'].map(ids)
                 node_df = node_df[node_df.columns[::-1]]
-                edge_df['author1'] = edge_df['author1'].apply(self.reduced_name)
-                edge_df['author2'] = edge_df['author2'].apply(self.reduced_name)
+                edge_df['author1'] = edge_df['author1'].map(ids)
+                edge_df['author2'] = edge_df['author2'].map(ids)
+                # the shared PMIDs of every edge, spellings of one author merged
+                self.postings = PairPostings.from_pairs(((ids[a], ids[b]), v) for (a, b), v in author_dict.items())
+                if len(set(ids.values())) < len(ids):
+                    # spellings of one author (Müller, Muller) are one node, their edges count the distinct shared
+                    # publications of all spellings, as the postings list them
+                    node_df = node_df.drop_duplicates('short_name').reset_index(drop=True)
+                    edge_list = [[a, b, self.shared_publications(self.postings.get(a, b))]
+                                 for a, b in zip(self.postings.authors_of(self.postings.first),
+                                                 self.postings.authors_of(self.postings.second))]
+                    edge_df = pd.DataFrame(edge_list, columns=['author1', 'author2', 'pub_id'])
                 self.printmessage() 
                 return node_df, edge_df
 
@@ -271,6 +596,14 @@ class ApiInterface:
 
 
 
+def coauthor_publications(full_name: str) -> List:
+    """ get list of publications of a co-author given as in the author lists, e.g. 'Schultz Bruce J'"""
+    lastname, firstname = full_name.split(' ')[0], ' '.join(full_name.split(' ')[1:])
+    author = ApiInterface(lastname, firstname)
+    author.getpubmedidlist()
+    return author.pubmedidlist
+
+
 if __name__ == "__main__":
 
     nodeedge = ApiInterface( 'Hofmann-Apitius','Martin')
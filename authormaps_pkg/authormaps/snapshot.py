@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import logging
+from itertools import combinations
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from authormaps.startup import PROJECT_DIR
+from authormaps.scheduler import get_scheduler
+from authormaps import sharedwork
+from authormaps.sharedwork import ApiInterface, GLOBAL_MODE, SEED_MODE, MODES
+from authormaps.layout import compute_layout
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.path.join(PROJECT_DIR, 'networks')
+# seconds after which a saved network is refreshed before it is used, default one day
+REFRESH_AFTER = float(os.getenv('AUTHORMAPS_REFRESH_AFTER', 24 * 3600))
+# number of snapshots kept per network
+KEEP_SNAPSHOTS = 3
+
+
+class NetworkState:
+    """Persisted state of the network of one seed author, from which the network can be refreshed incrementally.
+
+    Parameters
+    ----------
+    first_name: str
+    last_name: str
+    mode: str
+        'global' or 'seed', see ApiInterface.make_dataframe
+    directory: str
+        Where snapshots are saved. Default: ~/.AuthorMaps/networks
+    """
+
+    def __init__(self, first_name: str, last_name: str, mode: str = GLOBAL_MODE, directory: str = SNAPSHOT_DIR,
+                 progress: Callable = None, partial: Callable = None):
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {MODES}, not {mode!r}')
+        self.first_name = first_name
+        self.last_name = last_name
+        self.mode = mode
+        self.directory = directory
+        self.progress = progress
+        self.partial = partial
+        self.version = 0
+        self.created_at = None
+        self.messagefrontend = None
+        self.pubmedids = []             # publications of the seed author
+        self.publication_authors = {}   # PMID -> authors of the seed author's publications used for the network
+        self.consortium_pubmedids = []  # consortium papers among them, see ApiInterface.publicalistfiltered
+        self.all_authors = []           # authors of every publication found, used for the name collision hints
+        self.coauthor_publications = {}  # co-author -> PMIDs, global mode only
+        self.pairs = {}                 # alphabetically sorted author pair -> shared PMIDs
+        self.postings = None            # pairs as PairPostings of node ids, set by to_dataframes
+
+    def api(self) -> ApiInterface:
+        return ApiInterface(lastname=self.last_name, firstname=self.first_name, progress=self.progress,
+                            partial=self.partial)
+
+    @property
+    def key(self) -> str:
+        return f'{self.api().query}_{self.mode}'
+
+    @property
+    def coauthors(self) -> List[str]:
+        return sorted({a for authorlist in self.publication_authors.values() for a in authorlist})
+
+    @property
+    def snapshot_id(self) -> str:
+        """Identifies this version of the network, also when it was built from scratch again."""
+        return f'{self.version}-{self.created_at}'
+
+    @property
+    def age(self) -> float:
+        """Seconds since this snapshot was created."""
+        return time.time() - self.created_at if self.created_at else float('inf')
+
+    @classmethod
+    def build(cls, first_name: str, last_name: str, mode: str = GLOBAL_MODE, directory: str = SNAPSHOT_DIR,
+              progress: Callable = None, partial: Callable = None) -> "NetworkState":
+        """Compute the network from scratch, progress and partial are called with every stage message and partial
+        result of ApiInterface."""
+        state = cls(first_name, last_name, mode, directory, progress, partial)
+        api = state.api()
+        if mode == SEED_MODE:
+            common_dict = api.get_seed_author_connection()
+        else:
+            common_dict = api.get_every_author_connection()
+            state.coauthor_publications = {a: pub_list for a, pub_list in api.pub_dict.items() if pub_list}
+        state.pubmedids = api.pubmedidlist or []
+        state.publication_authors = api.publication_authors
+        state.consortium_pubmedids = sorted(api.consortium_pubmedids)
+        state.all_authors = api.nodelistunique_filter or []
+        state.pairs = {tuple(sorted(pair)): list(pub_list) for pair, pub_list in common_dict.items()}
+        state.messagefrontend = api.messagefrontend
+        state.version = 1
+        state.created_at = time.time()
+        return state
+
+    def refresh(self) -> Dict[str, int]:
+        """Fetch only what changed since this snapshot and update the pairs in place.
+
+        New publications of the seed author are downloaded and their authors added. In global mode the publication
+        lists of the co-authors are refreshed incrementally as well, also within the search TTL (new co-authors
+        completely), and only the shared publications added since the snapshot are counted.
+
+        Returns
+        -------
+            number of new publications, new co-authors and changed edges
+        """
+        api = self.api()
+        api.getpubmedidlist(refresh=True)
+        summary = {'publications': 0, 'coauthors': 0, 'edges': 0}
+        if not api.pubmedidlist:
+            return summary
+
+        known = set(self.pubmedids)
+        new_ids = [pubmedid for pubmedid in api.pubmedidlist if pubmedid not in known]
+        self.pubmedids = api.pubmedidlist
+        # the settings as ApiInterface reads them, at call time
+        max_publications, consortium_weight = sharedwork.MAX_PUBLICATIONS, sharedwork.CONSORTIUM_WEIGHT
+        if max_publications and len(self.pubmedids) > max_publications:
+            self.messagefrontend = (705, f"PLease specify your search, too many publications found {len(self.pubmedids)}")
+            return summary
+
+        coauthors_before = set(self.coauthors)
+        all_authors = set(self.all_authors)
+        changed = set()
+        for pubmedid, authorlist in api.iter_publications(new_ids):
+            if api.is_consortium_paper(authorlist):
+                if not consortium_weight or not api.is_own_publication(authorlist):
+                    continue
+                authorlist = api.consortium_members(authorlist, coauthors_before)
+                if not authorlist:
+                    continue
+                self.consortium_pubmedids.append(pubmedid)
+            else:
+                all_authors.update(authorlist)
+            if api.is_own_publication(authorlist):
+                self.publication_authors[pubmedid] = authorlist
+                summary['publications'] += 1
+                if self.mode == SEED_MODE:
+                    for pair in combinations(sorted(set(authorlist)), 2):
+                        self.pairs.setdefault(pair, []).append(pubmedid)
+                        changed.add(pair)
+        self.all_authors = sorted(all_authors)
+        summary['coauthors'] = len(set(self.coauthors) - coauthors_before)
+
+        if self.mode == GLOBAL_MODE:
+            changed = self.__refresh_coauthor_publications()
+            # consortium papers among the newly shared publications count as in a new build
+            weighted = api.weight_consortium_papers({pair: self.pairs[pair] for pair in changed})
+            for pair in changed:
+                if pair in weighted:
+                    self.pairs[pair] = weighted[pair]
+                else:
+                    del self.pairs[pair]
+            self.consortium_pubmedids = sorted(set(self.consortium_pubmedids) | api.consortium_pubmedids)
+        summary['edges'] = len(changed)
+
+        # status of the refreshed network, e.g. new name collisions, as to_dataframes would report it
+        api.nodelistunique = self.coauthors
+        api.nodelistunique_filter = self.all_authors
+        api.printmessage()
+        self.messagefrontend = api.messagefrontend
+        self.version += 1
+        self.created_at = time.time()
+        return summary
+
+    def __refresh_coauthor_publications(self) -> set:
+        """Update the publication lists of all co-authors and add the newly shared publications to the pairs."""
+        coauthors = self.coauthors
+
+        def fetch_author(a: str) -> Optional[List[str]]:
+            lastname, firstname = a.split(' ')[0], ' '.join(a.split(' ')[1:])
+            obj_a = ApiInterface(lastname, firstname)
+            # like the seed author: a cached list younger than the search TTL would miss the newest publications
+            obj_a.getpubmedidlist(refresh=True)
+            return obj_a.pubmedidlist
+
+        # inverted index of the known publication lists
+        publication_coauthors = {}
+        for a, pub_list in self.coauthor_publications.items():
+            for pubmedid in pub_list:
+                publication_coauthors.setdefault(pubmedid, set()).add(a)
+
+        changed = set()
+        pub_lists = get_scheduler().map(fetch_author, coauthors)
+        for a, pub_list in tqdm(zip(coauthors, pub_lists), total=len(coauthors)):
+            if not pub_list:
+                continue
+            known = set(self.coauthor_publications.get(a, []))
+            added = [pubmedid for pubmedid in dict.fromkeys(pub_list) if pubmedid not in known]
+            for pubmedid in added:
+                holders = publication_coauthors.setdefault(pubmedid, set())
+                for b in holders:
+                    pair = (a, b) if a < b else (b, a)
+                    self.pairs.setdefault(pair, []).append(pubmedid)
+                    changed.add(pair)
+                holders.add(a)
+            if added:
+                self.coauthor_publications[a] = list(known) + added
+        return changed
+
+    def to_dataframes(self) -> Optional[Tuple["Dataframe", "Dataframe"]]:
+        """Return node and edge dataframes as ApiInterface.make_dataframe does, None if no network was found.
+        Sets messagefrontend to the status code of the network."""
+        api = self.api()
+        api.pubmedidlist = self.pubmedids
+        api.searchlist = bool(self.pubmedids)
+        api.nodelistunique = self.coauthors
+        api.nodelistunique_filter = self.all_authors
+        api.consortium_pubmedids = set(self.consortium_pubmedids)
+        api.messagefrontend = self.messagefrontend
+        frames = api.dataframes_from_connections(self.pairs)
+        self.messagefrontend = api.messagefrontend
+        self.postings = api.postings
+        return frames
+
+    def save(self) -> str:
+        """Save this state as new snapshot and remove the oldest ones beyond KEEP_SNAPSHOTS."""
+        directory = os.path.join(self.directory, self.key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{self.version:06d}.json')
+        data = {
+            'first_name': self.first_name, 'last_name': self.last_name, 'mode': self.mode,
+            'version': self.version, 'created_at': self.created_at, 'messagefrontend': self.messagefrontend,
+            'pubmedids': self.pubmedids, 'publication_authors': self.publication_authors,
+            'consortium_pubmedids': self.consortium_pubmedids,
+            'all_authors': self.all_authors, 'coauthor_publications': self.coauthor_publications,
+            'pairs': [[a, b, pub_list] for (a, b), pub_list in self.pairs.items()],
+        }
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
+        snapshots = self.__snapshot_names(directory)
+        for old in snapshots[:-KEEP_SNAPSHOTS]:
+            os.remove(os.path.join(directory, old))
+        kept = {name[:-len('.json')] for name in snapshots[-KEEP_SNAPSHOTS:]}
+        for name in os.listdir(directory):
+            if name.endswith('.layout.json') and name[:-len('.layout.json')] not in kept:
+                os.remove(os.path.join(directory, name))
+        return path
+
+    def layout(self, graph: "nx.Graph") -> Dict[str, "np.ndarray"]:
+        """Return the node positions of the graph of this network, see authormaps.layout.
+
+        Positions are computed once per version and saved next to its snapshot. A new version starts from the
+        positions of the previous one, so a refreshed network keeps its shape.
+        """
+        directory = os.path.join(self.directory, self.key)
+        path = os.path.join(directory, f'{self.version:06d}.layout.json')
+        positions = self.__read_layout(path)
+        if positions is not None and positions.keys() == set(graph):
+            return positions
+
+        previous = sorted(name for name in os.listdir(directory) if name.endswith('.layout.json')) \
+            if os.path.isdir(directory) else []
+        initial = self.__read_layout(os.path.join(directory, previous[-1])) if previous else None
+        positions = compute_layout(graph, initial=initial)
+        if os.path.isdir(directory):
+            with open(path + '.tmp', 'w') as f:
+                json.dump({node: [float(x), float(y)] for node, (x, y) in positions.items()}, f)
+            os.replace(path + '.tmp', path)
+        return positions
+
+    @staticmethod
+    def __read_layout(path: str) -> Optional[Dict[str, "np.ndarray"]]:
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return {node: np.asarray(xy) for node, xy in json.load(f).items()}
+
+    @staticmethod
+    def __snapshot_names(directory: str) -> List[str]:
+        """Return the snapshot files of a network directory, oldest first."""
+        return sorted(name for name in os.listdir(directory)
+                      if name.endswith('.json') and not name.endswith('.layout.json'))
+
+    @classmethod
+    def load(cls, first_name: str, last_name: str, mode: str = GLOBAL_MODE,
+             directory: str = SNAPSHOT_DIR) -> Optional["NetworkState"]:
+        """Return the latest snapshot of a network or None."""
+        state = cls(first_name, last_name, mode, directory)
+        snapshot_dir = os.path.join(directory, state.key)
+        snapshots = cls.__snapshot_names(snapshot_dir) if os.path.isdir(snapshot_dir) else []
+        if not snapshots:
+            return None
+        with open(os.path.join(snapshot_dir, snapshots[-1])) as f:
+            data = json.load(f)
+        state.version = data['version']
+        state.created_at = data['created_at']
+        state.messagefrontend = tuple(data['messagefrontend']) if isinstance(data['messagefrontend'], list) \
+            else data['messagefrontend']
+        state.pubmedids = data['pubmedids']
+        state.publication_authors = data['publication_authors']
+        state.consortium_pubmedids = data.get('consortium_pubmedids', [])
+        state.all_authors = data['all_authors']
+        state.coauthor_publications = data['coauthor_publications']
+        state.pairs = {(a, b): pub_list for a, b, pub_list in data['pairs']}
+        return state
+
+
+def load_network(first_name: str, last_name: str, mode: str = GLOBAL_MODE, max_age: float = REFRESH_AFTER,
+                 directory: str = SNAPSHOT_DIR, progress: Callable = None, partial: Callable = None) -> NetworkState:
+    """Return the saved network of an author, refreshed first when older than max_age seconds.
+    Networks without snapshot are built and saved if any co-author was found. progress is called with the stage
+    messages while the network is built or refreshed, partial with the partial results while it is built."""
+    state = NetworkState.load(first_name, last_name, mode, directory)
+    if state is None:
+        state = NetworkState.build(first_name, last_name, mode, directory, progress, partial)
+        if state.publication_authors:
+            state.save()
+    elif state.age > max_age:
+        state.progress = progress
+        summary = state.refresh()
+        logger.info(f'Refreshed network of {first_name} {last_name}: {summary}')
+        state.save()
+    return state
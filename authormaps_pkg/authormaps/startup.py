@@ -8,10 +8,20 @@ home_dir = str(Path.home())
 PROJECT_DIR = os.path.join(home_dir,  ".AuthorMaps")
 LOG_DIR = os.path.join(PROJECT_DIR, "logs")
 DATA_DIR = os.path.join(PROJECT_DIR, "data")
-os.makedirs(LOG_DIR, exist_ok=True)
-os.makedirs(DATA_DIR, exist_ok=True)
-
-# Logging Configuration
 LOG_FILE_PATH = os.path.join(LOG_DIR, "project_log.log")
-logging.basicConfig(filename=LOG_FILE_PATH,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+# Importing this module has no side effects: directories are created when first written to, logging is set up by
+# the entry points (CLI, web app) calling configure_logging.
+
+
+def ensure_dir(path: str) -> str:
+    """Create directory path and its parents if missing, return path."""
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def configure_logging(log_file: str = LOG_FILE_PATH) -> None:
+    """Log to the project log file."""
+    ensure_dir(os.path.dirname(log_file))
+    logging.basicConfig(filename=log_file,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
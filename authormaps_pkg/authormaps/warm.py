@@ -0,0 +1,187 @@
+import os
+import time
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from authormaps.names import canonical_key
+from authormaps.netcache import network_key
+from authormaps.scheduler import background
+from authormaps.sharedwork import GLOBAL_MODE
+from authormaps.snapshot import NetworkState, load_network, REFRESH_AFTER, SNAPSHOT_DIR
+
+logger = logging.getLogger(__name__)
+
+# file of authors warmed when the web app starts, one 'First Last' or 'Last, First' per line (see batch.read_authors)
+HOT_AUTHORS = os.getenv('AUTHORMAPS_HOT_AUTHORS')
+# co-authors warmed after a network was viewed, the ones with most shared publications. 0 turns prefetching off
+WARM_COAUTHORS = int(os.getenv('AUTHORMAPS_WARM_COAUTHORS', 5))
+# authors waiting to be warmed, the least recently requested ones are dropped beyond
+WARM_QUEUE_SIZE = 200
+
+Author = Tuple[str, str]
+
+
+def top_coauthors(state: NetworkState, n: int = WARM_COAUTHORS) -> List[Author]:
+    """Return (first name, last name) of the n co-authors sharing most publications with the author of a network."""
+    seed = canonical_key(f'{state.last_name} {state.first_name}')
+    strength = Counter(a for authorlist in state.publication_authors.values() for a in set(authorlist)
+                       if canonical_key(a) != seed)
+    authors = []
+    for name, _ in sorted(strength.items(), key=lambda item: (-item[1], item[0])):
+        last_name, _, first_name = name.partition(' ')
+        if first_name:      # e.g. no consortium names
+            authors.append((first_name, last_name))
+        if len(authors) == n:
+            break
+    return authors
+
+
+def warm_author(first_name: str, last_name: str, mode: str = GLOBAL_MODE, max_age: float = REFRESH_AFTER,
+                directory: str = SNAPSHOT_DIR) -> NetworkState:
+    """Fill the PMID, record and network caches for an author, as a search for them would.
+    Returns the network, built and saved if there was no snapshot, refreshed if it was older than max_age seconds."""
+    return load_network(first_name, last_name, mode, max_age=max_age, directory=directory)
+
+
+def warm_authors(authors: List[Author], mode: str = GLOBAL_MODE, coauthors: int = 0, directory: str = SNAPSHOT_DIR,
+                 progress: Callable = None) -> List[Author]:
+    """Warm every author and then their top co-authors, each author once. progress is called with every author and
+    their network. Returns the authors warmed."""
+    seeds, warmed, todo = set(authors), [], list(authors)
+    seen = {network_key(first_name, last_name, mode) for first_name, last_name in todo}
+    while todo:
+        first_name, last_name = author = todo.pop(0)
+        state = warm_author(first_name, last_name, mode, directory=directory)
+        warmed.append(author)
+        if progress is not None:
+            progress(author, state)
+        if coauthors and author in seeds:
+            for coauthor in top_coauthors(state, coauthors):
+                if network_key(*coauthor, mode) not in seen:
+                    seen.add(network_key(*coauthor, mode))
+                    todo.append(coauthor)
+    return warmed
+
+
+class Warmer:
+    """Warm author networks on a background thread, so the next search finds them in the caches.
+
+    The web app submits the top co-authors of every network viewed, the most likely next searches, and the
+    AUTHORMAPS_HOT_AUTHORS at start. Requests are sent in scheduler.background(): they share the rate limit and wait
+    while interactive requests are in flight. The most recently submitted authors are warmed first, and an author is
+    not warmed again within max_age seconds.
+
+    Parameters
+    ----------
+    coauthors: int
+        Number of co-authors warmed per viewed network. Default: AUTHORMAPS_WARM_COAUTHORS
+    max_age: float
+        Seconds a warmed network counts as fresh. Default: AUTHORMAPS_REFRESH_AFTER
+    max_pending: int
+        Authors waiting to be warmed at most. Default: 200
+    directory: str
+        Directory of the network snapshots
+    """
+
+    def __init__(self, coauthors: int = WARM_COAUTHORS, max_age: float = REFRESH_AFTER,
+                 max_pending: int = WARM_QUEUE_SIZE, directory: str = SNAPSHOT_DIR):
+        self.coauthors = coauthors
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self.directory = directory
+        self.pending = OrderedDict()    # network key -> (first name, last name, mode, warm the co-authors)
+        self.warmed = {}                # network key -> time warmed
+        self.changed = threading.Condition()
+        self.thread = None
+        self.busy = False
+        self.stopped = False
+
+    def __len__(self) -> int:
+        with self.changed:
+            return len(self.pending)
+
+    def submit(self, first_name: str, last_name: str, mode: str = GLOBAL_MODE, with_coauthors: bool = False) -> bool:
+        """Queue an author to be warmed next, with their top co-authors after them if with_coauthors.
+        Returns False if the author was warmed recently."""
+        key = network_key(first_name, last_name, mode)
+        with self.changed:
+            warmed_at = self.warmed.get(key)
+            if warmed_at is not None and time.monotonic() - warmed_at < self.max_age and not with_coauthors:
+                return False
+            if key in self.pending:
+                with_coauthors = with_coauthors or self.pending[key][3]
+            self.pending[key] = (first_name, last_name, mode, with_coauthors)
+            self.pending.move_to_end(key, last=False)
+            while len(self.pending) > self.max_pending:
+                self.pending.popitem()
+            self.__start()
+            self.changed.notify_all()
+        return True
+
+    def warm_coauthors(self, first_name: str, last_name: str, mode: str = GLOBAL_MODE) -> bool:
+        """Queue the top co-authors of a viewed network. Returns False if prefetching is off or they were queued
+        within max_age seconds."""
+        if not self.coauthors:
+            return False
+        with self.changed:
+            key = ('coauthors', *network_key(first_name, last_name, mode))
+            warmed_at = self.warmed.get(key)
+            if warmed_at is not None and time.monotonic() - warmed_at < self.max_age:
+                return False
+            self.warmed[key] = time.monotonic()
+        return self.submit(first_name, last_name, mode, with_coauthors=True)
+
+    def submit_hot_authors(self, path: Optional[str] = HOT_AUTHORS, mode: str = GLOBAL_MODE) -> int:
+        """Queue the authors listed in a file, see batch.read_authors. Returns their number."""
+        if not path:
+            return 0
+        from authormaps.batch import read_authors
+        authors = read_authors(path)
+        # submitted last to first, so they are warmed in the order of the file
+        for first_name, last_name in reversed(authors):
+            self.submit(first_name, last_name, mode)
+        logger.info(f'Warming {len(authors)} hot authors of {path}')
+        return len(authors)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until no author is pending or being warmed, return False on timeout."""
+        with self.changed:
+            return self.changed.wait_for(lambda: not self.pending and not self.busy, timeout)
+
+    def stop(self) -> None:
+        """Stop the thread after the author being warmed."""
+        with self.changed:
+            self.stopped = True
+            self.changed.notify_all()
+
+    def __start(self) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.__run, name='authormaps-warm', daemon=True)
+            self.thread.start()
+
+    def __run(self) -> None:
+        while True:
+            with self.changed:
+                self.busy = False
+                self.changed.notify_all()
+                self.changed.wait_for(lambda: self.pending or self.stopped)
+                if self.stopped:
+                    return
+                key, (first_name, last_name, mode, with_coauthors) = self.pending.popitem(last=False)
+                self.busy = True
+            try:
+                with background():
+                    state = warm_author(first_name, last_name, mode, max_age=self.max_age, directory=self.directory)
+            except Exception:
+                logger.exception(f'Warming {first_name} {last_name} failed')
+                continue
+            with self.changed:
+                now = time.monotonic()
+                self.warmed = {k: t for k, t in self.warmed.items() if now - t < self.max_age}
+                self.warmed[key] = now
+            if with_coauthors:
+                # warmed next, the strongest tie first
+                for coauthor in reversed(top_coauthors(state, self.coauthors)):
+                    self.submit(*coauthor, mode)
@@ -0,0 +1,40 @@
+"""Benchmark of the layout methods of authormaps.layout.
+
+Times networkx' spring layout against the vectorized force-directed layout on synthetic co-author graphs of
+growing size and reports the crossover.
+
+    python benchmarks/bench_layout.py
+"""
+import time
+
+import networkx as nx
+
+from authormaps.layout import spring_layout, force_layout
+
+
+def synthetic_graph(n_authors: int, seed: int = 0) -> nx.Graph:
+    """Clustered graph like a co-author network, groups of about 20 authors with a few links between them."""
+    return nx.relaxed_caveman_graph(max(1, n_authors // 20), 20, 0.1, seed=seed)
+
+
+def timed(fn, graph) -> float:
+    start = time.perf_counter()
+    fn(graph)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'nodes':>6} {'edges':>7} {'spring [s]':>11} {'force [s]':>10} {'speedup':>8}")
+    crossover = None
+    for n_authors in (40, 80, 160, 320, 640, 1280, 2560):
+        graph = synthetic_graph(n_authors)
+        spring = timed(spring_layout, graph)
+        force = timed(lambda g: force_layout(g, time_budget=float('inf')), graph)
+        if crossover is None and force < spring:
+            crossover = graph.number_of_nodes()
+        print(f'{graph.number_of_nodes():>6} {graph.number_of_edges():>7} {spring:>11.3f} {force:>10.3f} {spring / force:>7.1f}x')
+    print(f'force-directed layout faster from {crossover} nodes on')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark of the pair counting engines of authormaps.pairs.
+
+Times the set-intersection loop against the sparse matrix engine on synthetic co-author publication lists of
+growing size and reports the crossover. The sparse engine is also timed against finding the pairs through the
+product matrix @ matrix.T and their PMIDs by intersecting the rows of both authors, which it must not be slower than.
+
+    python benchmarks/bench_pairs.py
+"""
+import time
+import random
+from typing import Dict, List, Tuple
+
+from scipy import sparse
+
+from authormaps.pairs import count_pairs_loop, count_pairs_sparse, incidence_matrix
+
+
+def synthetic_pub_dict(n_authors: int, pubs_per_author: int = 60, seed: int = 0) -> Dict[str, List[str]]:
+    """Publication lists of n_authors co-authors, a shared pool makes about a third of the pairs connected."""
+    rng = random.Random(seed)
+    pool = [str(30000000 + i) for i in range(n_authors * pubs_per_author // 4)]
+    return {f'Author{a} A': [rng.choice(pool) for _ in range(rng.randint(1, 2 * pubs_per_author))] +
+            [str(40000000 + a * 1000 + p) for p in range(pubs_per_author)]
+            for a in range(n_authors)}
+
+
+def count_pairs_product(pub_dict: Dict[str, List[str]]) -> Dict[Tuple[str, str], List[str]]:
+    """The connected pairs from the sparse product, the PMIDs of each from the incidence rows of both authors."""
+    authors, pmids, matrix = incidence_matrix(pub_dict)
+    shared = sparse.triu(matrix @ matrix.T, k=1).tocoo()
+    rows = [set(matrix.indices[start:end].tolist()) for start, end in zip(matrix.indptr[:-1], matrix.indptr[1:])]
+    return {(authors[i], authors[j]): [pmids[pub] for pub in rows[i] & rows[j]]
+            for i, j in zip(shared.row.tolist(), shared.col.tolist())}
+
+
+def best_of(fn, arg, repeat: int = 3) -> float:
+    """Return the fastest of repeat runs in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"{'authors':>8} {'loop [s]':>10} {'sparse [s]':>11} {'speedup':>8} {'product [s]':>12}")
+    crossover = None
+    for n_authors in (10, 20, 40, 80, 160, 320, 640, 1280, 2560):
+        pub_dict = synthetic_pub_dict(n_authors)
+        expected = {k: sorted(v) for k, v in count_pairs_loop(pub_dict).items()}
+        assert expected == {k: sorted(v) for k, v in count_pairs_sparse(pub_dict).items()}
+        assert expected == {k: sorted(v) for k, v in count_pairs_product(pub_dict).items()}
+        loop = best_of(count_pairs_loop, pub_dict)
+        sparse_time = best_of(count_pairs_sparse, pub_dict)
+        product = best_of(count_pairs_product, pub_dict)
+        if crossover is None and sparse_time < loop:
+            crossover = n_authors
+        print(f'{n_authors:>8} {loop:>10.4f} {sparse_time:>11.4f} {loop / sparse_time:>7.1f}x {product:>12.4f}')
+    print(f'sparse engine faster from {crossover} authors on')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Synthetic PubMed corpus for the benchmarks.
+
+Author productivity follows a power law, as in real bibliographic data a few authors write most publications.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+FIRST_NAMES = ('Anna', 'Ben', 'Clara', 'David', 'Eva', 'Felix', 'Greta', 'Hugo', 'Ida', 'Jonas', 'Kim', 'Lena',
+               'Max', 'Nora', 'Oskar', 'Paula')
+SYLLABLES = ('ba', 'ke', 'lo', 'mi', 'nu', 'ra', 'si', 'to', 'va', 'ze')
+
+
+def last_name(i: int) -> str:
+    """Unique pronounceable last name of author i, e.g. 'Kelomner'."""
+    syllables = []
+    while True:
+        i, rest = divmod(i, len(SYLLABLES))
+        syllables.append(SYLLABLES[rest])
+        if i == 0:
+            break
+        i -= 1
+    return (''.join(reversed(syllables)) + 'ner').capitalize()
+
+
+class SyntheticCorpus:
+    """Publications with author lists, searchable like PubMed.
+
+    Parameters
+    ----------
+    n_publications: int
+    n_authors: int
+    authors_per_paper: float
+        Mean number of authors of a publication, drawn from a Poisson distribution (at least one).
+    exponent: float
+        Power law exponent of the author productivity, author i writes in proportion to (i + 1) ** -exponent.
+    seed: int
+    """
+
+    def __init__(self, n_publications: int = 2000, n_authors: int = 500, authors_per_paper: float = 5,
+                 exponent: float = 1.0, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        # author names in PubMed's "Last First" order
+        self.authors = [f'{last_name(i)} {FIRST_NAMES[i % len(FIRST_NAMES)]}' for i in range(n_authors)]
+        weights = (np.arange(n_authors) + 1.0) ** -exponent
+        weights /= weights.sum()
+
+        self.publications = {}  # PMID -> authors
+        self.index = {}         # lower case author -> PMIDs
+        for p in range(n_publications):
+            size = min(n_authors, max(1, rng.poisson(authors_per_paper - 1) + 1))
+            authorlist = [self.authors[a] for a in rng.choice(n_authors, size=size, replace=False, p=weights)]
+            pubmedid = str(30000000 + p)
+            self.publications[pubmedid] = authorlist
+            for author in authorlist:
+                self.index.setdefault(author.lower(), []).append(pubmedid)
+
+    def search(self, term: str) -> List[str]:
+        """Return the PMIDs of an esearch term such as 'Kelomiber Anna[author]', newest first like PubMed."""
+        name = term.replace('[author]', '').strip().lower()
+        return self.index.get(' '.join(name.split()), [])[::-1]
+
+    def medline(self, pubmedids: List[str]) -> str:
+        """Return the MEDLINE text efetch answers for the given PMIDs, unknown ones are skipped."""
+        records = []
+        for pubmedid in pubmedids:
+            if pubmedid not in self.publications:
+                continue
+            lines = [f'PMID- {pubmedid}', 'DP  - 2021', 'TA  - Synth J', 'JT  - Journal of Synthetic Results']
+            for author in self.publications[pubmedid]:
+                last, first = author.split(' ', 1)
+                lines.append(f'FAU - {last}, {first}')
+                lines.append(f'AU  - {last} {first[0]}')
+            records.append('\n'.join(lines))
+        return '\n\n'.join(records) + '\n'
+
+    def seed_author(self, publications: int = 100) -> Tuple[str, str]:
+        """Return (first name, last name) of the author whose number of publications is closest to publications."""
+        author = min(self.authors, key=lambda a: abs(len(self.index.get(a.lower(), [])) - publications))
+        last, first = author.split(' ', 1)
+        return first, last
+
+    def pub_dict(self, n_authors: int) -> Dict[str, List[str]]:
+        """Return the publication lists of the n_authors most productive authors, as ApiInterface.pub_dict."""
+        return {a: self.index.get(a.lower(), []) for a in self.authors[:n_authors]}
@@ -0,0 +1,108 @@
+"""Local stand-in for the NCBI E-utilities (esearch, epost, efetch) serving a SyntheticCorpus.
+
+    with FakeEutils(SyntheticCorpus(), latency=0.01) as server:
+        set_scheduler(FetchScheduler(base_url=server.url))
+
+The same works for a running frontend or CLI with AUTHORMAPS_EUTILS_URL=<server.url>.
+"""
+import time
+import uuid
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from corpus import SyntheticCorpus
+
+
+class FakeEutils:
+    """Threaded HTTP server answering E-utilities requests from a corpus.
+
+    Parameters
+    ----------
+    corpus: SyntheticCorpus
+    latency: float
+        Seconds every response is delayed, to mimic the round trip to NCBI.
+    """
+
+    def __init__(self, corpus: SyntheticCorpus, latency: float = 0.0):
+        self.corpus = corpus
+        self.latency = latency
+        self.requests = 0
+        self.posted = {}    # WebEnv -> PMIDs
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.__handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def start(self) -> "FakeEutils":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeEutils":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def respond(self, endpoint: str, params: dict) -> str:
+        """Return the body of the answer to one request."""
+        with self.lock:
+            self.requests += 1
+        if endpoint == 'esearch.fcgi':
+            found = self.corpus.search(params.get('term', ''))
+            start = int(params.get('retstart', 0))
+            ids = found[start:start + int(params.get('retmax', 20))]
+            return (f'<eSearchResult><Count>{len(found)}</Count><RetMax>{len(ids)}</RetMax><RetStart>{start}</RetStart><IdList>'
+                    + ''.join(f'<Id>{pubmedid}</Id>' for pubmedid in ids) + '</IdList></eSearchResult>')
+        if endpoint == 'epost.fcgi':
+            web_env = uuid.uuid4().hex
+            with self.lock:
+                self.posted[web_env] = params.get('id', '').split(',')
+            return f'<ePostResult><QueryKey>1</QueryKey><WebEnv>{web_env}</WebEnv></ePostResult>'
+        if endpoint == 'efetch.fcgi':
+            if 'id' in params:
+                ids = params['id'].split(',')
+            else:
+                start = int(params.get('retstart', 0))
+                ids = self.posted.get(params.get('WebEnv'), [])[start:start + int(params.get('retmax', 20))]
+            return self.corpus.medline(ids)
+        raise KeyError(endpoint)
+
+    def __handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                params = dict(urllib.parse.parse_qsl(url.query))
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    params.update(urllib.parse.parse_qsl(self.rfile.read(length).decode()))
+                time.sleep(fake.latency)
+                try:
+                    body = fake.respond(url.path.rsplit('/', 1)[-1], params).encode()
+                    self.send_response(200)
+                except KeyError:
+                    body = b'unknown endpoint'
+                    self.send_response(404)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_POST = do_GET
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,178 @@
+"""Offline benchmark suite of AuthorMaps.
+
+Generates a synthetic corpus, serves it from a local fake E-utilities server and times the pipeline end to end:
+make_dataframe with cold and warm cache, pair counting, Network construction, layout and rendering. Results are
+saved as JSON and compared against a saved baseline, slower timings beyond the tolerance are reported as
+regressions (exit code 1).
+
+    python benchmarks/run_benchmarks.py --save-baseline     # once, on the reference commit
+    python benchmarks/run_benchmarks.py                     # after a change
+"""
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+from typing import Callable, Dict, List
+
+os.environ.setdefault('TQDM_DISABLE', '1')
+
+import networkx as nx
+
+from authormaps.cache import SQLiteCache, set_cache
+from authormaps.scheduler import FetchScheduler, set_scheduler
+from authormaps.sharedwork import ApiInterface, MODES
+from authormaps.pairs import count_pairs
+from authormaps.network import Network, Visualizer
+from authormaps.layout import compute_layout
+
+from corpus import SyntheticCorpus
+from fake_eutils import FakeEutils
+
+BENCHMARK_DIR = Path(__file__).parent.resolve()
+RESULTS_PATH = BENCHMARK_DIR / 'results.json'
+BASELINE_PATH = BENCHMARK_DIR / 'baseline.json'
+# parameters that change the workload, results are only comparable when they are the same
+WORKLOAD_PARAMETERS = ('publications', 'authors', 'authors_per_paper', 'exponent', 'seed_publications', 'seed',
+                       'latency', 'rate', 'workers')
+
+
+def timed(fn: Callable, repeat: int = 1, setup: Callable = None) -> float:
+    """Return the fastest of repeat runs of fn in seconds, setup runs untimed before each. Output of fn is hidden."""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(args: argparse.Namespace) -> Dict[str, float]:
+    """Run every benchmark, return seconds per benchmark name."""
+    results = {}
+    corpus = SyntheticCorpus(n_publications=args.publications, n_authors=args.authors,
+                             authors_per_paper=args.authors_per_paper, exponent=args.exponent, seed=args.seed)
+    first_name, last_name = corpus.seed_author(args.seed_publications)
+    print(f'corpus: {args.publications} publications, {args.authors} authors, seed author {first_name} {last_name}')
+
+    frames = {}
+    with FakeEutils(corpus, latency=args.latency) as server, tempfile.TemporaryDirectory() as tmp:
+        set_scheduler(FetchScheduler(api_key='', base_url=server.url, rate=args.rate, max_workers=args.workers))
+
+        def fresh_cache():
+            set_cache(SQLiteCache(os.path.join(tmp, f'{time.time_ns()}.sqlite')))
+
+        for mode in MODES:
+            def make_dataframe():
+                frames[mode] = ApiInterface(lastname=last_name, firstname=first_name).make_dataframe(mode=mode)
+
+            server.requests = 0
+            results[f'make_dataframe.{mode}.miss'] = timed(make_dataframe, args.repeat, setup=fresh_cache)
+            requests = server.requests // args.repeat
+            server.requests = 0
+            results[f'make_dataframe.{mode}.hit'] = timed(make_dataframe, args.repeat)
+            print(f'make_dataframe {mode}: {requests} requests per cold run, {server.requests} with warm cache')
+        set_scheduler(None)
+        set_cache(None)
+
+    for n_authors in (n for n in (100, 400, 1600) if n <= args.authors):
+        pub_dict = corpus.pub_dict(n_authors)
+        for engine in ('loop', 'sparse'):
+            results[f'count_pairs.{engine}.{n_authors}'] = timed(lambda: count_pairs(pub_dict, engine=engine), args.repeat)
+
+    node_list, authormap_file = frames['global']
+    results['network.build'] = timed(
+        lambda: Network(first_name, last_name, node_list=node_list, authormap_file=authormap_file), args.repeat)
+    network = Network(first_name, last_name, node_list=node_list, authormap_file=authormap_file)
+
+    # layouts of the network and of the co-author graph of the whole corpus
+    corpus_graph = nx.Graph()
+    for authorlist in corpus.publications.values():
+        corpus_graph.add_edges_from((a, b) for i, a in enumerate(authorlist) for b in authorlist[i + 1:])
+    for name, graph in (('network', network.graph), ('corpus', corpus_graph)):
+        for method in ('spring', 'force'):
+            results[f'layout.{method}.{name}'] = timed(lambda: compute_layout(graph, method=method), args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def render(image_format):
+            visualizer = Visualizer(network=network)
+            visualizer.save_graph_images([os.path.join(tmp, f'network.{image_format}')], dpi=72)
+
+        for image_format in ('png', 'svg'):
+            results[f'render.{image_format}'] = timed(lambda: render(image_format), args.repeat)
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Print results next to the baseline, return the names of benchmarks slower than baseline * (1 + tolerance)."""
+    regressions = []
+    print(f"{'benchmark':<32} {'seconds':>10} {'baseline':>10} {'change':>8}")
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f'{name:<32} {seconds:>10.4f} {"-":>10} {"":>8}')
+            continue
+        change = seconds / base - 1 if base else 0
+        # timings below a millisecond are too noisy to judge
+        regressed = change > tolerance and seconds - base > 1e-3
+        if regressed:
+            regressions.append(name)
+        print(f'{name:<32} {seconds:>10.4f} {base:>10.4f} {change:>+7.0%}{" REGRESSION" if regressed else ""}')
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--publications', type=int, default=5000, help='Number of synthetic publications.')
+    parser.add_argument('--authors', type=int, default=2000, help='Number of synthetic authors.')
+    parser.add_argument('--authors-per-paper', type=float, default=5, help='Mean number of authors per publication.')
+    parser.add_argument('--exponent', type=float, default=1.0, help='Power law exponent of author productivity.')
+    parser.add_argument('--seed-publications', type=int, default=30, help='Publications of the queried author.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the corpus.')
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds the fake server delays each response.')
+    parser.add_argument('--rate', type=float, default=1000, help='Requests per second allowed by the scheduler.')
+    parser.add_argument('--workers', type=int, default=16, help='Concurrent requests of the scheduler.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark, the fastest counts.')
+    parser.add_argument('--output', type=Path, default=RESULTS_PATH, help='Where the results are saved.')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH, help='Results to compare against.')
+    parser.add_argument('--save-baseline', action='store_true', help='Save the results as new baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown against the baseline.')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    report = {'created_at': time.time(), 'python': sys.version.split()[0], 'platform': platform.platform(),
+              'parameters': {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+              'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+
+    baseline = {}
+    if args.baseline.exists():
+        with open(args.baseline) as f:
+            saved = json.load(f)
+        differing = [p for p in WORKLOAD_PARAMETERS if saved['parameters'].get(p) != report['parameters'][p]]
+        if differing:
+            print(f'Baseline was run with different {", ".join(differing)}, not comparing')
+        else:
+            baseline = saved['results']
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f'{len(regressions)} regressions: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,7 +7,7 @@ from setuptools import setup, find_packages
 with open('HISTORY.md') as history_file:
     history = history_file.read()
 
-requirements = ['click>=8.0.3', 'pandas>=1.3.5', 'networkx>=2.6.3', 'matplotlib>=3.5.0', 'flask==2.0.2', 'lxml>=4.7.1', 'xmltodict>=0.12.0', 'bio>=1.3.3']
+requirements = ['click>=8.0.3', 'pandas>=1.3.5', 'networkx>=2.7', 'matplotlib>=3.5.0', 'flask==2.0.2', 'lxml>=4.7.1', 'xmltodict>=0.12.0', 'bio>=1.3.3', 'requests>=2.26.0', 'numpy>=1.21.0', 'scipy>=1.7.0', 'pyarrow>=6.0.0']
 
 test_requirements = ['pytest>=6.2.4']
 
@@ -0,0 +1,54 @@
+"""Tests for the batch mode."""
+import pytest
+
+from authormaps.batch import read_authors, run_batch, DONE, FAILED
+from authormaps.cache import SQLiteCache, set_cache
+from authormaps.scheduler import FetchScheduler, set_scheduler
+
+PUBLICATIONS = {'1': ['Doe, John', 'Roe, Jane'], '2': ['Doe, John', 'Poe, Edgar', 'Roe, Jane'],
+                '3': ['Roe, Jane', 'Poe, Edgar']}
+
+
+@pytest.fixture
+def cached_corpus(tmp_path):
+    """Cache holding every search and publication of the corpus, requests go nowhere."""
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+    cache.put_records({pmid: {'FAU': authors} for pmid, authors in PUBLICATIONS.items()})
+    for query, pubmedids in (('JohnDoe', ['2', '1']), ('JaneRoe', ['3', '2', '1']), ('EdgarPoe', ['3', '2'])):
+        cache.put_search(query, pubmedids)
+    set_cache(cache)
+    set_scheduler(FetchScheduler(base_url='http://127.0.0.1:9', max_retries=0))
+    yield cache
+    set_cache(None)
+    set_scheduler(None)
+
+
+def test_read_authors(tmp_path):
+    path = tmp_path / 'authors.txt'
+    path.write_text('# department\nJohn Doe\n\nRoe, Jane\nMary  Ann Smith\nJohn Doe\n')
+    assert read_authors(str(path)) == [('John', 'Doe'), ('Jane', 'Roe'), ('Mary Ann', 'Smith')]
+
+    path.write_text('Doe\n')
+    with pytest.raises(ValueError):
+        read_authors(str(path))
+
+
+def test_run_batch(tmp_path, cached_corpus):
+    authors = [('John', 'Doe'), ('Jane', 'Roe'), ('Nobody', 'Here')]
+    cached_corpus.put_negative('search:NobodyHere', 702, 'not found')
+    output = tmp_path / 'networks'
+
+    results = run_batch(authors, str(output), processes=2, image_formats=['png'])
+    assert [r['status'] for r in results] == [DONE, DONE, FAILED]
+    assert (results[0]['nodes'], results[0]['edges']) == (3, 3)
+    assert (output / 'JohnDoe_global' / 'edges.arrow').exists()
+    assert (output / 'JaneRoe_global' / 'network.png').exists()
+
+    # a second run only retries the failed author
+    finished = []
+    results = run_batch(authors, str(output), processes=2, progress=finished.append)
+    assert [r.get('resumed', False) for r in results] == [True, True, False]
+    assert [(r['first_name'], r['status']) for r in finished] == [('Nobody', FAILED)]
+
+    results = run_batch(authors[:1], str(output), processes=1, restart=True)
+    assert not results[0].get('resumed')
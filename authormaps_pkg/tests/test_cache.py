@@ -0,0 +1,121 @@
+"""Tests for the cache backends."""
+import json
+
+import pytest
+
+from authormaps.cache import SQLiteCache, JSONDirCache, compact_record, migrate_data_dir
+
+RECORD = {'PMID': '34754938', 'FAU': ['Srinivasan, Sanjana', 'Carugo, Alessandro'], 'AU': ['Srinivasan S', 'Carugo A'],
+          'DP': '2021 Nov', 'TA': 'Nat Commun', 'AB': 'A long abstract', 'MH': ['Humans']}
+
+
+@pytest.fixture(params=['sqlite', 'json'])
+def cache(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteCache(str(tmp_path / 'cache.sqlite'))
+    return JSONDirCache(str(tmp_path))
+
+
+class TestCacheBackend:
+    """Tests both cache backends"""
+
+    def test_records(self, cache):
+        assert cache.get_record('34754938') is None
+        cache.put_records({'34754938': RECORD})
+        assert cache.get_record('34754938') == compact_record(RECORD)
+        assert 'AB' not in cache.get_record('34754938')
+        assert cache.missing(['1', '34754938', '1']) == ['1']
+
+    def test_bulk_records(self, cache):
+        records = {str(i): {'FAU': [f'Author, {i}']} for i in range(1200)}
+        cache.put_records(records)
+        assert len(cache.get_records(list(records) + ['x'])) == 1200
+        batches = list(cache.iter_records(batch_size=500))
+        assert [len(batch) for batch in batches] == [500, 500, 200]
+        assert dict(pair for batch in batches for pair in batch) == records
+
+    def test_searches(self, cache):
+        assert cache.get_search('SanjanaSrinivasan') is None
+        cache.put_search('SanjanaSrinivasan', ['34754938', '34062049'])
+        assert cache.get_search('SanjanaSrinivasan') == ['34754938', '34062049']
+
+
+def test_migrate_data_dir(tmp_path):
+    """Tests the migration of the per-file cache"""
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    with open(data_dir / '34754938.json', 'w') as f:
+        json.dump(RECORD, f)
+    (data_dir / 'SanjanaSrinivasan.xml').write_text(
+        '<eSearchResult><IdList><Id>34754938</Id><Id>34062049</Id></IdList></eSearchResult>')
+    (data_dir / 'broken.xml').write_text('<eSearchResult>')
+
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+    counts = migrate_data_dir(str(data_dir), cache=cache, remove=True)
+
+    assert counts == {'records': 1, 'searches': 1}
+    assert cache.get_record('34754938')['FAU'] == RECORD['FAU']
+    assert cache.get_search('SanjanaSrinivasan') == ['34754938', '34062049']
+    assert [p.name for p in data_dir.iterdir()] == ['broken.xml']
+
+
+def test_compression(tmp_path):
+    """Records are stored compressed, uncompressed ones of older versions are read and compressed by compact"""
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+    cache.put_records({'34754938': RECORD})
+    cache.connection.execute("INSERT INTO records (pmid, record) VALUES ('1', ?)", (json.dumps({'FAU': ['Doe, John']}),))
+    cache.connection.commit()
+    assert cache.get_records(['1', '34754938']) == {'1': {'FAU': ['Doe, John']}, '34754938': compact_record(RECORD)}
+    assert cache.stats()['records']['compressed'] == 1
+    assert cache.compact(full=True)['recompressed'] == 1
+    assert cache.stats()['records']['compressed'] == 2
+    assert cache.get_record('1') == {'FAU': ['Doe, John']}
+
+
+def test_prune(tmp_path):
+    """The least recently or least frequently read entries are evicted, ingested records are kept"""
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+    cache.put_records({str(i): {'FAU': [f'Author, {i}']} for i in range(20)})
+    cache.put_author_index([('AuthorZero', '0')])
+    cache.get_records([str(i) for i in range(10, 15)])
+    cache.get_records(['14'])
+    assert cache.prune(max_entries=10) == {'records': 11, 'searches': 0, 'negatives': 0}
+    kept = cache.get_records([str(i) for i in range(20)])
+    assert len(kept) == 9 and {'0', '10', '11', '12', '13', '14'} <= set(kept)
+    cache.put_search('JohnDoe', ['14'])
+    cache.get_search('JohnDoe')
+    cache.get_search('JohnDoe')
+    # records 14 and the search were read twice, 10 to 13 once
+    assert cache.prune(max_entries=4, eviction='lfu') == {'records': 7, 'searches': 0, 'negatives': 0}
+    assert sorted(cache.get_records([str(i) for i in range(20)])) == ['0', '14']
+    assert cache.prune(max_bytes=1, negative_ttl=0)['searches'] == 1
+
+
+def test_bounded_cache(tmp_path):
+    """A bounded cache is pruned by the first write and then every MAINTENANCE_INTERVAL seconds"""
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'), max_entries=10)
+    cache.put_records({str(i): {'FAU': [f'Author, {i}']} for i in range(20)})
+    assert len(list(cache.iter_records())[0]) == 9
+    cache.put_records({str(i): {'FAU': [f'Author, {i}']} for i in range(20, 25)})
+    assert len(list(cache.iter_records())[0]) == 14
+
+
+def test_stats_and_verify(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+    cache.put_records({'34754938': RECORD})
+    cache.put_search('SanjanaSrinivasan', ['34754938'])
+    cache.get_records(['34754938', '1'])
+    cache.get_search('JohnDoe')
+    # the reads are written by flush, another process sees them
+    cache.flush()
+    stats = SQLiteCache(cache.path).stats()
+    assert (stats['records']['hits'], stats['records']['misses']) == (1, 1)
+    assert (stats['searches']['hits'], stats['searches']['misses']) == (0, 1)
+    assert stats['records']['ages']['< 1 day'] == 1 and stats['searches']['never_read'] == 1
+
+    assert cache.verify() == {'integrity': 'ok', 'checked': {'records': 1, 'searches': 1},
+                              'corrupt': {'records': [], 'searches': []}}
+    cache.connection.execute("INSERT INTO records (pmid, record) VALUES ('2', ?)", (b'garbage',))
+    cache.connection.commit()
+    assert cache.verify(repair=True)['corrupt'] == {'records': ['2'], 'searches': []}
+    assert cache.verify()['corrupt']['records'] == []
@@ -0,0 +1,95 @@
+"""Tests for the multi-hop expansion."""
+import pytest
+
+from authormaps import expand
+from authormaps.expand import Expansion, AUTHORS
+from authormaps.cache import SQLiteCache, set_cache
+from authormaps.scheduler import FetchScheduler, set_scheduler
+
+PUBLICATIONS = {'1': ['Doe, John', 'Roe, Jane'], '2': ['Doe, John', 'Poe, Edgar', 'Roe, Jane'],
+                '3': ['Roe, Jane', 'Poe, Edgar'], '4': ['Roe, Jane', 'Moe, Anna'], '5': ['Moe, Anna', 'Zoe, Ben']}
+SEARCHES = {'JohnDoe': ['1', '2'], 'JaneRoe': ['1', '2', '3', '4'], 'EdgarPoe': ['2', '3'], 'AnnaMoe': ['4', '5']}
+
+
+@pytest.fixture
+def cached_corpus(tmp_path):
+    """Cache holding every search and publication of the corpus, requests go nowhere."""
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+    cache.put_records({pmid: {'FAU': authors} for pmid, authors in PUBLICATIONS.items()})
+    for query, pubmedids in SEARCHES.items():
+        cache.put_search(query, pubmedids)
+    set_cache(cache)
+    set_scheduler(FetchScheduler(base_url='http://127.0.0.1:9', max_retries=0))
+    yield cache
+    set_cache(None)
+    set_scheduler(None)
+
+
+def edges(frames):
+    node_df, edge_df = frames
+    return {tuple(sorted((a, b))): n for a, b, n in edge_df.itertuples(index=False)}
+
+
+def test_depth_one_is_seed_network(cached_corpus):
+    expansion = Expansion('John', 'Doe', depth=1).run()
+    assert list(expansion.crawled) == ['Doe John']
+    assert edges(expansion.to_dataframes()) == {('Doe_J', 'Roe_J'): 2, ('Doe_J', 'Poe_E'): 1, ('Poe_E', 'Roe_J'): 1}
+    assert expansion.messagefrontend == (700, 'Done')
+
+
+def test_budget_and_checkpoint(cached_corpus, tmp_path):
+    checkpoint = str(tmp_path / 'expansion.json')
+    expansion = Expansion('John', 'Doe', depth=2, max_authors=2, checkpoint=checkpoint).run()
+    # Jane Roe is on both publications of the seed, the strongest tie
+    assert expansion.crawled == {'Doe John': 0, 'Roe Jane': 1}
+    assert expansion.exhausted == AUTHORS
+    assert [author for _, author in expansion.queued.values()] == ['Poe Edgar']
+
+    resumed = Expansion('John', 'Doe', depth=2, checkpoint=checkpoint).run()
+    assert resumed.crawled == {'Doe John': 0, 'Roe Jane': 1, 'Poe Edgar': 1}
+    assert resumed.exhausted is None and not resumed.queued
+    # Anna Moe is two hops away, Ben Zoe three
+    node_df, edge_df = frames = resumed.to_dataframes()
+    assert sorted(node_df['short_name']) == ['Doe_J', 'Moe_A', 'Poe_E', 'Roe_J']
+    assert edges(frames) == {('Doe_J', 'Roe_J'): 2, ('Doe_J', 'Poe_E'): 1, ('Poe_E', 'Roe_J'): 2, ('Moe_A', 'Roe_J'): 1}
+    assert resumed.postings.get('Poe_E', 'Roe_J') == ['3', '2']
+
+    with pytest.raises(ValueError):
+        Expansion('Jane', 'Roe', depth=2, checkpoint=checkpoint).run()
+
+
+def test_checkpoint_interval(cached_corpus, tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / 'expansion.json')
+    monkeypatch.setattr(expand, 'EXPAND_WORKERS', 1)
+    saves = []
+    save = Expansion.save
+    monkeypatch.setattr(Expansion, 'save', lambda self: saves.append(len(self.crawled)) or save(self))
+    # two rounds, written once when the run ends
+    monkeypatch.setattr(expand, 'CHECKPOINT_INTERVAL', 3600)
+    Expansion('John', 'Doe', depth=2, checkpoint=checkpoint).run()
+    assert saves == [3]
+
+    # and after every round without an interval
+    saves.clear()
+    monkeypatch.setattr(expand, 'CHECKPOINT_INTERVAL', 0)
+    Expansion('Jane', 'Roe', depth=2, checkpoint=str(tmp_path / 'roe.json')).run()
+    assert saves == [2, 3, 4, 4]
+
+
+def test_checkpoint_on_failure(cached_corpus, tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / 'expansion.json')
+    monkeypatch.setattr(expand, 'EXPAND_WORKERS', 1)
+    crawl = Expansion.crawl
+
+    def failing_crawl(author):
+        if author == 'Poe Edgar':
+            raise ConnectionError('PubMed unreachable')
+        return crawl(author)
+
+    monkeypatch.setattr(Expansion, 'crawl', staticmethod(failing_crawl))
+    with pytest.raises(ConnectionError):
+        Expansion('John', 'Doe', depth=2, checkpoint=checkpoint).run()
+    monkeypatch.setattr(Expansion, 'crawl', staticmethod(crawl))
+    # the round before the failure is not crawled again
+    resumed = Expansion('John', 'Doe', depth=2, max_authors=2, checkpoint=checkpoint).run()
+    assert resumed.crawled == {'Doe John': 0, 'Roe Jane': 1} and resumed.exhausted == AUTHORS
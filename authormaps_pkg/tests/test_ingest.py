@@ -0,0 +1,89 @@
+"""Tests for the ingest of PubMed XML dumps."""
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+
+from authormaps import policy as policy_module
+from authormaps.cache import SQLiteCache
+from authormaps import ingest as ingest_module
+from authormaps.ingest import ingest, parse_file, parse_files, author_queries
+from authormaps.policy import CachePolicy, HIT, NEGATIVE
+from authormaps.sharedwork import ApiInterface
+
+
+def article(pmid, authors, year='2020'):
+    author_list = ''.join(f'<Author ValidYN="Y"><LastName>{last}</LastName><ForeName>{first}</ForeName>'
+                          f'<Initials>{first[0]}</Initials></Author>' for last, first in authors)
+    return (f'<PubmedArticle><MedlineCitation Status="MEDLINE" Owner="NLM"><PMID Version="1">{pmid}</PMID>'
+            f'<Article><Journal><JournalIssue><PubDate><Year>{year}</Year><Month>Jan</Month></PubDate>'
+            f'</JournalIssue><Title>Journal of Tests</Title></Journal><AuthorList CompleteYN="Y">{author_list}'
+            f'<Author><CollectiveName>Test Consortium</CollectiveName></Author></AuthorList></Article>'
+            f'<MedlineJournalInfo><MedlineTA>J Tests</MedlineTA></MedlineJournalInfo></MedlineCitation>'
+            f'</PubmedArticle>')
+
+
+def write_dumps(directory):
+    with gzip.open(directory / 'pubmed24n0001.xml.gz', 'wt') as f:
+        f.write('<?xml version="1.0"?>\n<PubmedArticleSet>'
+                + article('1', [('Doe', 'John'), ('Roe', 'Jane')])
+                + article('2', [('Doe', 'John A'), ('Poe', 'Edgar')])
+                + article('3', [('Roe', 'Jane')]) + '</PubmedArticleSet>')
+    with gzip.open(directory / 'pubmed24n0002.xml.gz', 'wt') as f:
+        f.write('<PubmedArticleSet>' + article('4', [('Doe', 'John'), ('Poe', 'Edgar')], year='2021')
+                + '<DeleteCitation><PMID Version="1">3</PMID></DeleteCitation></PubmedArticleSet>')
+
+
+def test_parse_file(tmp_path):
+    write_dumps(tmp_path)
+    records, deleted = parse_file(str(tmp_path / 'pubmed24n0001.xml.gz'))
+    assert deleted == []
+    assert records['2'] == {'FAU': ['Doe, John A', 'Poe, Edgar'], 'AU': ['Doe J', 'Poe E'], 'DP': '2020 Jan',
+                            'TA': 'J Tests', 'JT': 'Journal of Tests'}
+    assert parse_file(str(tmp_path / 'pubmed24n0002.xml.gz'))[1] == ['3']
+
+
+def test_parse_files_window(tmp_path, monkeypatch):
+    submitted = []
+
+    class Executor(ThreadPoolExecutor):
+        def submit(self, fn, path):
+            submitted.append(path)
+            return super().submit(fn, path)
+
+    monkeypatch.setattr(ingest_module, 'ProcessPoolExecutor', Executor)
+    files = []
+    for pmid in range(6):
+        files.append(str(tmp_path / f'pubmed24n000{pmid}.xml'))
+        with open(files[-1], 'w') as f:
+            f.write('<PubmedArticleSet>' + article(str(pmid), [('Doe', 'John')]) + '</PubmedArticleSet>')
+    parsed = parse_files(files, processes=1)
+    # two files per process are parsed ahead of the one written
+    assert next(parsed)[0] == files[0] and submitted == files[:2]
+    # and written in file order
+    assert [list(records) for _, (records, _) in parsed] == [[str(pmid)] for pmid in range(1, 6)]
+
+
+def test_author_queries():
+    assert author_queries('Schultz, Bruce') == {'BruceSchultz'}
+    assert author_queries('Schultz, Bruce J') == {'Bruce jSchultz', 'BruceSchultz'}
+
+
+def test_ingest(tmp_path, monkeypatch):
+    write_dumps(tmp_path)
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+    stats = ingest([str(tmp_path)], cache=cache, processes=2)
+    assert (stats['files'], stats['records'], stats['deleted']) == (2, 4, 1)
+
+    assert cache.get_search('JohnDoe') == ['4', '2', '1']
+    assert cache.get_search('JaneRoe') == ['1']
+    assert cache.get_records(['3']) == {}
+
+    policy = CachePolicy(cache, offline=True)
+    assert policy.lookup_search('EdgarPoe')[:2] == (HIT, ['4', '2'])
+    assert policy.lookup_search('NobodyHere')[0] == NEGATIVE
+
+    # the ApiInterface answers from the ingested dumps without any request
+    monkeypatch.setattr(policy_module, '_policy', policy)
+    api = ApiInterface('Doe', 'John')
+    api.getpubmedidlist()
+    assert api.pubmedidlist == ['4', '2', '1']
+    assert sorted(api.coauthorslist('2')) == ['Doe John A', 'Poe Edgar']
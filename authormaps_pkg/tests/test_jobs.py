@@ -0,0 +1,76 @@
+"""Tests for the background job queue."""
+import threading
+
+from authormaps import jobs
+from authormaps.jobs import Job, JobQueue, DONE, FAILED
+
+
+class TestJobQueue:
+    """Tests JobQueue class"""
+
+    def test_single_flight(self):
+        queue = JobQueue(max_workers=2)
+        release = threading.Event()
+        calls = []
+
+        def build(job):
+            calls.append(job.id)
+            job.set_stage('downloading publications')
+            job.set_stage((700, 'Done'))   # status codes are no stages
+            release.wait(5)
+            return 'network'
+
+        first = queue.submit('john doe', build)
+        second = queue.submit('john doe', build)
+        assert first is second
+        release.set()
+        assert first.wait(5)
+        assert first.status == DONE and first.result == 'network'
+        assert first.stage == 'downloading publications'
+        assert len(calls) == 1
+        # finished jobs are not joined anymore
+        third = queue.submit('john doe', lambda job: 'again')
+        assert third is not first and third.wait(5) and third.result == 'again'
+
+    def test_failure(self):
+        queue = JobQueue(max_workers=1)
+
+        def build(job):
+            raise ConnectionError('PubMed unreachable')
+
+        job = queue.submit('jane roe', build, meta={'first_name': 'Jane'})
+        assert job.wait(5)
+        assert job.status == FAILED
+        assert queue.get(job.id).to_dict()['error'] == 'PubMed unreachable'
+        assert job.to_dict()['first_name'] == 'Jane'
+        assert queue.get('unknown') is None
+        assert queue.status_counts() == {'queued': 0, 'running': 0, 'done': 0, 'failed': 1}
+
+    def test_events(self):
+        queue = JobQueue(max_workers=1)
+        release = threading.Event()
+
+        def build(job):
+            job.set_stage('downloading publications')
+            job.publish('coauthors', ['Jane Roe'])
+            release.wait(5)
+            return 'network'
+
+        job = queue.submit('john doe', build)
+        assert job.events_since(0, timeout=5)[1][0] == ('stage', 'downloading publications')
+        assert job.events_since(1, timeout=5) == (1, [('coauthors', ['Jane Roe'])])
+        # no new event yet
+        assert job.events_since(2, timeout=0.01) == (2, [])
+        release.set()
+        assert job.events_since(2, timeout=5) == (2, [(DONE, None)])
+        # the partial results are dropped once the job finished
+        assert job.events_since(0) == (2, [(DONE, None)])
+
+    def test_events_bounded(self, monkeypatch):
+        monkeypatch.setattr(jobs, 'JOB_MAX_EVENTS', 3)
+        job = Job('john doe')
+        for i in range(5):
+            job.publish('edges', [i])
+        # the oldest are dropped, the numbers of the others stay
+        assert job.events_since(0) == (2, [('edges', [2]), ('edges', [3]), ('edges', [4])])
+        assert job.events_since(4) == (4, [('edges', [4])])
@@ -0,0 +1,39 @@
+"""Tests for the graph layouts."""
+import pytest
+import numpy as np
+import networkx as nx
+
+from authormaps.layout import compute_layout, force_layout
+
+
+def same_layout(a, b):
+    return a.keys() == b.keys() and all(np.allclose(a[node], b[node]) for node in a)
+
+
+class TestLayout:
+    """Tests layout functions"""
+
+    @pytest.mark.parametrize("method", ["spring", "force"])
+    def test_reproducible(self, method):
+        graph = nx.relaxed_caveman_graph(5, 8, 0.1, seed=1)
+        positions = compute_layout(graph, method=method)
+        assert positions.keys() == set(graph)
+        assert same_layout(positions, compute_layout(graph, method=method))
+        assert not same_layout(positions, compute_layout(graph, method=method, seed=1))
+        assert max(np.abs(xy).max() for xy in positions.values()) == pytest.approx(1)
+
+    def test_time_budget(self):
+        graph = nx.relaxed_caveman_graph(20, 10, 0.1, seed=1)
+        assert force_layout(graph, time_budget=0).keys() == set(graph)
+
+    def test_initial_positions(self):
+        graph = nx.path_graph(4)
+        initial = compute_layout(graph, method='force')
+        graph.add_edge(3, 4)
+        positions = compute_layout(graph, method='force', initial=initial)
+        assert positions.keys() == set(graph)
+
+    def test_small_graphs(self):
+        assert compute_layout(nx.Graph(), method='force') == {}
+        with pytest.raises(ValueError):
+            compute_layout(nx.path_graph(3), method='circle')
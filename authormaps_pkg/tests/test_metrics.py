@@ -0,0 +1,64 @@
+"""Tests for the stage timers and counters."""
+import threading
+
+from authormaps.metrics import Metrics
+
+
+class TestMetrics:
+    """Tests Metrics class"""
+
+    def test_span(self):
+        metrics = Metrics()
+        for _ in range(3):
+            with metrics.span('esearch'):
+                pass
+        metrics.observe('layout', 0.5)
+        timers, _ = metrics.snapshot()
+        assert timers['esearch'][0] == 3
+        assert timers['layout'] == (1, 0.5, 0.5)
+
+    def test_span_on_error(self):
+        metrics = Metrics()
+        try:
+            with metrics.span('render_save'):
+                raise OSError('disk full')
+        except OSError:
+            pass
+        assert metrics.snapshot()[0]['render_save'][0] == 1
+
+    def test_count_threads(self):
+        metrics = Metrics()
+
+        def work():
+            for _ in range(1000):
+                metrics.count('requests', endpoint='esearch', status=200)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert metrics.snapshot()[1] == {('requests', (('endpoint', 'esearch'), ('status', '200'))): 4000}
+
+    def test_report(self):
+        metrics = Metrics()
+        metrics.observe('esearch', 0.2)
+        metrics.observe('layout', 1.0)
+        metrics.count('bytes_downloaded', 2048, endpoint='efetch')
+        lines = metrics.report(wall=1.5).splitlines()
+        # slowest stage first
+        assert lines[1].startswith('layout') and lines[2].startswith('esearch')
+        assert lines[3].startswith('wall time')
+        assert lines[4].startswith('bytes_downloaded{endpoint=efetch}') and lines[4].endswith('2048')
+
+    def test_prometheus(self):
+        metrics = Metrics()
+        metrics.observe('esearch', 0.25)
+        metrics.count('cache_lookups', kind='search', outcome='hit')
+        metrics.count('cache_lookups', 2, kind='search', outcome='miss')
+        text = metrics.prometheus(gauges={'network_cache_entries': 3})
+        assert 'authormaps_stage_seconds_total{stage="esearch"} 0.25\n' in text
+        assert 'authormaps_stage_calls_total{stage="esearch"} 1\n' in text
+        assert text.count('# TYPE authormaps_cache_lookups_total counter') == 1
+        assert 'authormaps_cache_lookups_total{kind="search",outcome="miss"} 2\n' in text
+        assert text.endswith('authormaps_network_cache_entries 3\n')
@@ -0,0 +1,75 @@
+"""Tests for the author name index."""
+from authormaps import names
+from authormaps.cache import SQLiteCache, set_cache
+from authormaps.names import (fold, canonical_key, initials_compatible, node_ids, display_name, NameIndex,
+                              get_name_index, load_name_index, index_records)
+
+
+def test_canonical_key():
+    assert fold("Gómez-O'Neill") == 'gomez oneill'
+    assert fold('Łukasz Straße') == 'lukasz strasse'
+    assert canonical_key('Müller Hans-Peter') == canonical_key('Muller, Hans Peter') == 'muller|hans peter'
+    assert canonical_key('Schultz Bruce J') != canonical_key('Schultz Bruce')
+    assert initials_compatible('schultz|b', 'schultz|bruce j')
+    assert not initials_compatible('schultz|benjamin', 'schultz|bruce j')
+    assert display_name('Schultz, Bruce J') == 'Bruce J Schultz'
+
+
+def test_node_ids():
+    ids = node_ids(['Srinivasan Sanjana', 'Schultz Bruce J', 'Schultz Benjamin J', 'Müller Hans', 'Muller Hans'])
+    # the short id as long as it is unique
+    assert ids['Srinivasan Sanjana'] == 'Srinivasan_S'
+    # different persons sharing it stay apart
+    assert (ids['Schultz Bruce J'], ids['Schultz Benjamin J']) == ('Schultz_Bruce_J', 'Schultz_Benjamin_J')
+    # spellings of one person are one node
+    assert ids['Müller Hans'] == ids['Muller Hans']
+
+
+class TestNameIndex:
+    """Tests NameIndex class"""
+
+    names = ['Schultz Bruce J', 'Schultz Benjamin', 'Schulz Bruce', 'Müller Hans-Peter', 'Muller, Hans Peter',
+             'Miller Hans', 'Doe John']
+
+    def test_lookup(self):
+        index = NameIndex(self.names)
+        assert len(index) == 6
+        assert index.spellings('muller hans peter') == ['Müller Hans-Peter', 'Muller, Hans Peter']
+        assert index.with_last_name('SCHULTZ') == ['Schultz Benjamin', 'Schultz Bruce J']
+        assert index.with_last_name('Mueller') == []
+
+    def test_similar(self):
+        index = NameIndex(self.names)
+        # same last name and initials first
+        assert [name for name, _ in index.similar('Schultz B')][:2] == ['Schultz Bruce J', 'Schultz Benjamin']
+        assert [name for name, _ in index.similar('Mueller Hans Peter')][0] == 'Müller Hans-Peter'
+        # the person itself is no suggestion
+        assert 'Doe John' not in [name for name, _ in index.similar('Doe, John')]
+        # names added after the first lookup are found too
+        index.add(['Schultze Bruce'])
+        assert 'Schultze Bruce' in [name for name, _ in index.similar('Schultz Bruce')]
+
+    def test_from_cache(self, tmp_path):
+        cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+        cache.put_records({str(pmid): {'FAU': ['Doe, John', f'Roe, Jane {chr(65 + pmid)}']} for pmid in range(3)})
+        index = NameIndex.from_cache(cache)
+        assert len(index) == 4
+        assert index.with_last_name('roe') == ['Roe, Jane A', 'Roe, Jane B', 'Roe, Jane C']
+
+
+def test_name_index(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+    cache.put_records({'1': {'FAU': ['Doe, John', 'Roe, Jane']}})
+    set_cache(cache)
+    try:
+        # no request builds the index or waits for it
+        assert get_name_index(wait=False) is None
+        load_name_index().join()
+        index = get_name_index(wait=False)
+        assert len(index) == 2 and index.by_trigram is not None
+        # records cached later extend it
+        index_records({'2': {'FAU': ['Poe, Edgar']}})
+        assert [name for name, _ in get_name_index().similar('Poe Edgar A')] == ['Poe, Edgar']
+    finally:
+        set_cache(None)
+        names._index = None
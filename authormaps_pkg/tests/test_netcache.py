@@ -0,0 +1,33 @@
+"""Tests for the in-process network cache."""
+from authormaps.netcache import NetworkCache, network_key
+
+
+class TestNetworkCache:
+    """Tests NetworkCache class"""
+
+    def test_network_key(self):
+        assert network_key('Bruce ', 'SCHULTZ') == network_key('bruce', 'Schultz')
+        assert network_key('Bruce', 'Schultz', 'seed') != network_key('Bruce', 'Schultz')
+
+    def test_lru(self):
+        cache = NetworkCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == 1
+        cache.put('c', 3)   # drops b, the least recently used
+        assert cache.get('b') is None
+        assert cache.get('a') == 1 and cache.get('c') == 3
+        assert len(cache) == 2
+
+    def test_max_age(self):
+        cache = NetworkCache()
+        cache.put('a', 1)
+        assert cache.get('a', max_age=-1) is None
+        assert cache.get('a') is None
+
+    def test_get_or_create(self):
+        cache = NetworkCache()
+        calls = []
+        for _ in range(3):
+            assert cache.get_or_create('a', lambda: calls.append(1) or 'network') == 'network'
+        assert len(calls) == 1
@@ -2,9 +2,18 @@
 import os
 import json
 import pytest
+import pandas as pd
 
 from authormaps.network import Network, Visualizer
 
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data")
+
+
+def load_test_frames():
+    node_list = pd.read_csv(os.path.join(TEST_DATA, "BruceSchultz_nodelist.csv"), index_col=0)
+    edge_list = pd.read_csv(os.path.join(TEST_DATA, "BruceSchultz_edgelist.csv"), index_col=0)
+    return node_list, edge_list
+
 
 class TestNetwork:
     """Tests Network class"""
@@ -32,6 +41,29 @@ class TestNetwork:
         assert len(node_link_data["nodes"]) == 35
         assert len(node_link_data["links"]) == 476
 
+    def test_create_network_from_frames(self):
+        """Test building the graph directly from node and edge dataframes"""
+        node_list, edge_list = load_test_frames()
+        network = Network(first_name="Bruce", last_name="Schultz", node_list=node_list, authormap_file=edge_list)
+        assert network.graph.number_of_nodes() == 35
+        assert network.graph.number_of_edges() == len(edge_list)
+        assert network.get_shared_publication("Andrea Zaliani", "Gerd Geisslinger") == 2
+        # the passed dataframes stay unchanged
+        assert node_list.loc[0, "full_name"] == "Zaliani Andrea"
+
+    def test_save_and_load(self, tmp_path):
+        """Test saving the network as Arrow files and loading it again"""
+        node_list, edge_list = load_test_frames()
+        network = Network(first_name="Bruce", last_name="Schultz", node_list=node_list, authormap_file=edge_list)
+        path = network.save(directory=tmp_path)
+        assert (path / "nodes.arrow").exists() and (path / "edges.arrow").exists()
+
+        loaded = Network.load(first_name="bruce", last_name="schultz", directory=tmp_path)
+        assert loaded.shared_pb_num == network.shared_pb_num
+        assert loaded.node_mapping == network.node_mapping
+        assert Network.load(first_name="Bruce", last_name="Schultz", directory=tmp_path, max_age=-1) is None
+        assert Network.load(first_name="Bruce", last_name="Schultz", mode="seed", directory=tmp_path) is None
+
 
 class TestVisualizer:
     """Tests Visualizer class"""
@@ -48,3 +80,12 @@ class TestVisualizer:
 
         with pytest.raises(ValueError):
             network.generate_graph_image(graph_output_path=graph_fake_path, with_edge_labels=True, dpi=300)
+
+    def test_prebuilt_network(self):
+        """Tests that a Visualizer reuses the graph of a prebuilt network"""
+        node_list, edge_list = load_test_frames()
+        network = Network(first_name="Bruce", last_name="Schultz", node_list=node_list, authormap_file=edge_list)
+        visualizer = Visualizer(network=network)
+        assert visualizer.graph is network.graph
+        assert len(visualizer.node_colors) == network.graph.number_of_nodes()
+        assert visualizer.node_colors.count("#fdd0a2") == 1
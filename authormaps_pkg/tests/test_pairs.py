@@ -0,0 +1,38 @@
+"""Tests for the pair counting engines."""
+import pytest
+
+from authormaps.pairs import count_pairs, pair_count_frame
+
+PUB_DICT = {
+    'Srinivasan Sanjana': ['1', '2', '3'],
+    'Carugo Alessandro': ['2', '3', '4'],
+    'Concina Isabella': ['3', '5'],
+    'Tripathi Durga N': ['6'],
+    'Yu Fei': None,
+}
+
+
+class TestCountPairs:
+    """Tests count_pairs with both engines"""
+
+    @pytest.mark.parametrize('engine', ['loop', 'sparse'])
+    def test_count_pairs(self, engine):
+        common_dict = count_pairs(PUB_DICT, engine=engine)
+        assert {k: sorted(v) for k, v in common_dict.items()} == {
+            ('Srinivasan Sanjana', 'Carugo Alessandro'): ['2', '3'],
+            ('Srinivasan Sanjana', 'Concina Isabella'): ['3'],
+            ('Carugo Alessandro', 'Concina Isabella'): ['3'],
+        }
+
+    def test_empty(self):
+        assert count_pairs({'Yu Fei': ['1']}, engine='sparse') == {}
+
+    def test_wrong_engine(self):
+        with pytest.raises(ValueError):
+            count_pairs(PUB_DICT, engine='fast')
+
+    def test_pair_count_frame(self):
+        edge_df = pair_count_frame(PUB_DICT)
+        assert list(edge_df.columns) == ['author1', 'author2', 'pub_id']
+        assert len(edge_df) == 3
+        assert edge_df['pub_id'].sum() == 4
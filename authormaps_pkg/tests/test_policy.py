@@ -0,0 +1,38 @@
+"""Tests for the cache policy."""
+import time
+
+from authormaps.cache import SQLiteCache
+from authormaps.policy import CachePolicy, HIT, MISS, STALE, NEGATIVE
+
+
+class TestCachePolicy:
+    """Tests CachePolicy class"""
+
+    def test_lookup_search(self, tmp_path):
+        cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+        policy = CachePolicy(cache, ttl=60, negative_ttl=60)
+        assert policy.lookup_search('SanjanaSrinivasan') == (MISS, None, None)
+
+        cache.put_search('SanjanaSrinivasan', ['34754938'])
+        outcome, pubmedids, _ = policy.lookup_search('SanjanaSrinivasan')
+        assert (outcome, pubmedids) == (HIT, ['34754938'])
+
+        synced_at = time.time() - 120
+        cache.put_search('SanjanaSrinivasan', ['34754938'], synced_at=synced_at)
+        assert policy.lookup_search('SanjanaSrinivasan') == (STALE, ['34754938'], synced_at)
+
+        assert policy.stats.as_dict() == {'search_miss': 1, 'search_hit': 1, 'search_stale': 1}
+        assert policy.stats.hit_rate('search') == 1 / 3
+
+    def test_negative(self, tmp_path):
+        cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+        cache.put_negative('search:DhwaniSolanki', 702, 'not found')
+        cache.put_negative('record:1', 701, 'FAU Key Not Found')
+
+        policy = CachePolicy(cache, negative_ttl=60)
+        assert policy.lookup_search('DhwaniSolanki') == (NEGATIVE, None, None)
+        assert policy.lookup_negatives(['record:1', 'record:2']) == {'record:1': (701, 'FAU Key Not Found')}
+
+        expired = CachePolicy(cache, negative_ttl=0)
+        assert expired.lookup_search('DhwaniSolanki')[0] == MISS
+        assert expired.lookup_negative('record:1') is None
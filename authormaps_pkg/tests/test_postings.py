@@ -0,0 +1,53 @@
+"""Tests for the pair postings."""
+import pandas as pd
+import pyarrow as pa
+
+from authormaps.network import Network
+from authormaps.postings import PairPostings
+
+PAIRS = {('Doe_J', 'Roe_J'): ['5', '3', '12'], ('Roe_J', 'Doe_J'): ['3', '40'], ('Poe_E', 'Doe_J'): ['7'],
+         ('Poe_E', 'Poe_E'): ['1']}
+
+
+def test_postings():
+    postings = PairPostings.from_pairs(PAIRS.items())
+    assert postings.authors == ['Doe_J', 'Poe_E', 'Roe_J']
+    assert len(postings) == 2
+    # both orders of a pair are merged, PMIDs sorted and deduplicated, newest first
+    assert postings.get('Roe_J', 'Doe_J') == ['40', '12', '5', '3']
+    assert postings.get('Doe_J', 'Roe_J', offset=1, limit=2) == ['12', '5']
+    assert postings.count('Doe_J', 'Poe_E') == 1
+    assert postings.get('Poe_E', 'Roe_J') == []
+    assert postings.pair_index('Doe_J', 'Nobody') is None
+    assert postings.n_postings == 5
+    assert postings.deltas.tolist() == [7, 3, 2, 7, 28]
+
+    restored = PairPostings.from_table(postings.to_table())
+    assert restored.get('Doe_J', 'Roe_J') == postings.get('Doe_J', 'Roe_J')
+    assert len(PairPostings.from_pairs([])) == 0
+
+
+def test_lookup_many_pairs():
+    pairs = {(f'A_{i}', f'B_{j}'): [str(1000 * i + j)] for i in range(60) for j in range(30)}
+    postings = PairPostings.from_pairs(pairs.items())
+    assert len(postings) == len(pairs)
+    assert all(postings.get(a, b) == pub_list for (a, b), pub_list in pairs.items())
+    assert postings.nbytes < 40 * len(pairs)
+
+
+def test_network_saves_postings(tmp_path):
+    nodes = pd.DataFrame({'short_name': ['Doe_J', 'Roe_J', 'Poe_E'], 'full_name': ['Doe John', 'Roe Jane', 'Poe Edgar']})
+    edges = pd.DataFrame({'author1': ['Doe_J', 'Doe_J'], 'author2': ['Roe_J', 'Poe_E'], 'pub_id': [4, 1]})
+    network = Network(first_name='John', last_name='Doe', mode='seed', node_list=nodes, authormap_file=edges,
+                      postings=PairPostings.from_pairs(PAIRS.items()))
+    network.save(tmp_path)
+
+    loaded = Network.load('John', 'Doe', mode='seed', directory=tmp_path)
+    assert loaded.get_shared_pmids('John Doe', 'Jane Roe', page=2, page_size=3) == ['3']
+    assert loaded.count_shared_pmids('Jane Roe', 'John Doe') == 4
+    with pa.memory_map(str(tmp_path / 'JohnDoe_seed' / 'postings.arrow')) as source:
+        assert pa.ipc.open_file(source).schema.field('pmids').type == pa.list_(pa.uint32())
+
+    # saved without postings, e.g. from an older version
+    Network(first_name='John', last_name='Doe', mode='seed', node_list=nodes, authormap_file=edges).save(tmp_path)
+    assert Network.load('John', 'Doe', mode='seed', directory=tmp_path).get_shared_pmids('John Doe', 'Jane Roe') is None
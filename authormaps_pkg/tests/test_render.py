@@ -0,0 +1,53 @@
+"""Tests for the render cache of network images and node-link data."""
+import gzip
+import json
+
+from authormaps.network import Visualizer
+from authormaps.render import RenderCache, render_key, IMAGE_FORMATS
+
+from .test_network import load_test_frames
+
+
+def make_visualizer(version="1-100.0"):
+    node_list, edge_list = load_test_frames()
+    return Visualizer(first_name="Bruce", last_name="Schultz", node_list=node_list, authormap_file=edge_list,
+                      version=version)
+
+
+class TestRenderCache:
+    """Tests RenderCache class"""
+
+    def test_render_key(self):
+        visualizer = make_visualizer()
+        key = render_key(visualizer, dpi=72, with_edge_labels=False)
+        assert key == render_key(make_visualizer(), dpi=72, with_edge_labels=False)
+        assert key != render_key(make_visualizer(version="2-200.0"), dpi=72, with_edge_labels=False)
+        assert key != render_key(visualizer, dpi=300, with_edge_labels=False)
+        assert key != render_key(visualizer, dpi=72, with_edge_labels=True)
+        # networks without snapshot version are addressed by their edges
+        assert render_key(make_visualizer(None), 72, False) == render_key(make_visualizer(None), 72, False)
+
+    def test_get_or_render(self, tmp_path):
+        cache = RenderCache(tmp_path)
+        visualizer = make_visualizer()
+        path = cache.get_or_render(visualizer, 'svg', dpi=20, formats=IMAGE_FORMATS)
+        assert path.exists() and path.suffix == '.svg'
+        key = render_key(visualizer, dpi=20, with_edge_labels=False)
+        assert sorted(p.name for p in tmp_path.iterdir()) == sorted(f'{key}.{f}' for f in IMAGE_FORMATS)
+
+        # cached images are not drawn again
+        visualizer.save_graph_images = None
+        assert cache.get_or_render(visualizer, 'png', dpi=20) == cache.path(key, 'png')
+
+    def test_get_or_write_node_link(self, tmp_path):
+        cache = RenderCache(tmp_path)
+        visualizer = make_visualizer()
+        path = cache.get_or_write_node_link(visualizer)
+        assert path.name.endswith('.json.gz')
+        with gzip.open(path) as f:
+            data = json.load(f)
+        assert len(data['nodes']) == 35 and len(data['links']) == visualizer.graph.number_of_edges()
+        assert {'id', 'name', 'x', 'y', 'color'} <= data['nodes'][0].keys()
+        assert {'source', 'target', 'weight', 'color', 'width'} <= data['links'][0].keys()
+        assert [node['color'] for node in data['nodes']].count('#fdd0a2') == 1
+        assert cache.get_or_write_node_link(make_visualizer()) == path
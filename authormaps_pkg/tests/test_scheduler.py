@@ -0,0 +1,158 @@
+"""Tests for the rate limited fetch scheduler."""
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+
+import pytest
+
+from authormaps.metrics import get_metrics
+from authormaps.scheduler import TokenBucket, FetchScheduler, get_scheduler, set_scheduler, background, in_background
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers the first request with 429 and every later one with 200."""
+    hits = 0
+
+    def do_GET(self):
+        FlakyHandler.hits += 1
+        if FlakyHandler.hits == 1:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """Answers every request after 0.3 seconds, noting when the request with the query name=... came and went."""
+    events = []
+
+    def do_GET(self):
+        name = self.path.split('name=')[1].split('&')[0]
+        SlowHandler.events.append(('start', name))
+        time.sleep(0.3)
+        SlowHandler.events.append(('end', name))
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+
+
+class TestTokenBucket:
+    """Tests TokenBucket class"""
+
+    def test_acquire(self):
+        """Requests beyond the burst are spread at the configured rate"""
+        bucket = TokenBucket(rate=20)
+        start = time.monotonic()
+        for _ in range(30):
+            bucket.acquire()
+        assert time.monotonic() - start >= 0.4
+
+    def test_fractional_rate(self):
+        """Rates below one request per second still hand out tokens, e.g. 3/s shared by 8 processes"""
+        bucket = TokenBucket(rate=3 / 8)
+        start = time.monotonic()
+        bucket.acquire()
+        assert time.monotonic() - start < 0.1
+        bucket.tokens = 0.9
+        bucket.acquire()
+        assert time.monotonic() - start < 1
+
+    def test_slow_down(self):
+        bucket = TokenBucket(rate=10)
+        bucket.slow_down()
+        assert bucket.rate == 5
+        for _ in range(20):
+            bucket.speed_up()
+        assert bucket.rate == 10
+
+
+class TestFetchScheduler:
+    """Tests FetchScheduler class"""
+
+    def test_retry_on_429(self, server):
+        """A 429 response is retried and the rate lowered"""
+        def counters():
+            counts = get_metrics().snapshot()[1]
+            return [counts.get(key, 0) for key in (('request_retries', (('endpoint', 'esearch'),)),
+                                                   ('requests', (('endpoint', 'esearch'), ('status', '429'))),
+                                                   ('bytes_downloaded', (('endpoint', 'esearch'),)))]
+
+        before = counters()
+        scheduler = FetchScheduler(api_key='', base_url=server)
+        r = scheduler.get('esearch.fcgi', params={'db': 'pubmed'})
+        assert r.status_code == 200
+        assert FlakyHandler.hits == 2
+        assert scheduler.bucket.rate < scheduler.bucket.nominal_rate
+        assert [after - b for after, b in zip(counters(), before)] == [1, 1, 2]
+
+    def test_map(self):
+        scheduler = FetchScheduler(api_key='')
+        assert list(scheduler.map(lambda x: x * 2, range(5))) == [0, 2, 4, 6, 8]
+
+    def test_rate(self):
+        assert FetchScheduler(api_key='').bucket.rate == 3
+        scheduler = FetchScheduler(api_key='', rate=50)
+        assert scheduler.bucket.rate == 50 and scheduler.max_workers == 100
+
+    def test_fractional_rate(self):
+        scheduler = FetchScheduler(api_key='', rate=0.3)
+        assert scheduler.max_workers == 1
+        assert list(scheduler.map(lambda x: x * 2, range(3))) == [0, 2, 4]
+
+    def test_set_scheduler(self):
+        scheduler = FetchScheduler(api_key='', base_url='http://127.0.0.1:1')
+        set_scheduler(scheduler)
+        try:
+            assert get_scheduler() is scheduler
+        finally:
+            set_scheduler(None)
+        assert get_scheduler() is not scheduler
+
+    def test_background_yields(self, slow_server):
+        """Background requests wait until the interactive ones are done"""
+        scheduler = FetchScheduler(api_key='', base_url=slow_server, rate=100)
+
+        def fetch(name):
+            scheduler.get('esearch.fcgi', params={'name': name})
+
+        def prefetch():
+            with background():
+                assert in_background()
+                list(scheduler.map(fetch, ['background']))
+
+        interactive = threading.Thread(target=fetch, args=('interactive',))
+        interactive.start()
+        time.sleep(0.05)
+        prefetching = threading.Thread(target=prefetch)
+        prefetching.start()
+        interactive.join(5)
+        prefetching.join(5)
+        assert SlowHandler.events == [('start', 'interactive'), ('end', 'interactive'), ('start', 'background'),
+                                      ('end', 'background')]
+        assert not in_background()
@@ -2,10 +2,16 @@
 
 
 import pandas
-import os
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
 
+import pytest
+
+from authormaps import sharedwork
 from authormaps.sharedwork import ApiInterface
-from authormaps.startup import DATA_DIR
+from authormaps.cache import get_cache, SQLiteCache, set_cache
+from authormaps.scheduler import FetchScheduler, set_scheduler
 
 
 class TestApiInterface:
@@ -15,8 +21,7 @@ class TestApiInterface:
         """Tests if correct pubmed list is generated"""
         author = ApiInterface("Srinivasan", "Sanjana")
         author.getpubmedidlist()
-        path = os.path.join(DATA_DIR, 'SanjanaSrinivasan.xml')
-        assert os.path.exists(path)
+        assert get_cache().get_search('SanjanaSrinivasan') == author.pubmedidlist
         assert len(author.pubmedidlist) == 10
         # should I test for number of publications ? What if new publications are getting added ?
         assert '34754938' in author.pubmedidlist
@@ -28,6 +33,14 @@ class TestApiInterface:
         author.coauthorslist('34754938')
         assert "Srinivasan Sanjana" in author.coauthorslist('34754938')
 
+    def test_fetch_publications(self):
+        """Tests if the batched download fills the cache for every publication"""
+        author = ApiInterface("Srinivasan", "Sanjana")
+        author.getpubmedidlist()
+        author.fetch_publications(author.pubmedidlist)
+        assert get_cache().missing(author.pubmedidlist) == []
+        assert "Srinivasan Sanjana" in author.coauthorslist('34754938')
+
     def test_publicalistfiltered(self):
         """Tests to check for name collisions"""
         author = ApiInterface("Srinivasan", "Sanjana")
@@ -51,6 +64,13 @@ class TestApiInterface:
         else:
             assert coauthor_dict[('Srinivasan Sanjana', 'Concina Isabella')] == ['34062049']
 
+    def test_get_seed_author_connection(self):
+        """Tests that the seed mode counts only the publications of the queried author"""
+        author = ApiInterface("Srinivasan", "Sanjana")
+        coauthor_dict = author.get_seed_author_connection()
+        assert coauthor_dict[('Concina Isabella', 'Srinivasan Sanjana')] == ['34062049']
+        assert all(len(set(v) - set(author.pubmedidlist)) == 0 for v in coauthor_dict.values())
+
     def test_reduced_name(self):
         """Tests for reduced_name method"""
         author = ApiInterface("Srinivasan", "Sanjana")
@@ -59,6 +79,33 @@ class TestApiInterface:
         new_name2 = author.reduced_name("Srinivasan Sanjana S")
         assert new_name2 == 'Srinivasan_S_S'
 
+    def test_node_ids(self):
+        """Different authors with the same reduced name stay separate nodes, offline"""
+        author = ApiInterface("Schultz", "Bruce")
+        author.searchlist = True
+        author.pubmedidlist = ['1', '2']
+        author.nodelistunique = ['Schultz Bruce', 'Schultz Benjamin', 'Doe John']
+        author.nodelistunique_filter = author.nodelistunique
+        node_df, edge_df = author.dataframes_from_connections({('Doe John', 'Schultz Bruce'): ['1'],
+                                                                ('Doe John', 'Schultz Benjamin'): ['2']})
+        assert sorted(node_df['short_name']) == ['Doe_J', 'Schultz_Benjamin', 'Schultz_Bruce']
+        assert len(edge_df) == 2
+        # both Schultz are suggested
+        assert author.messagefrontend == (703, ['Benjamin Schultz', 'Bruce Schultz'])
+
+    def test_merged_spellings(self):
+        """Spellings of one author are one node counting their distinct shared publications, offline"""
+        author = ApiInterface("Doe", "John")
+        author.searchlist = True
+        author.pubmedidlist = ['1', '2', '3']
+        author.nodelistunique = ['Doe John', 'Müller Hans', 'Muller Hans']
+        author.nodelistunique_filter = author.nodelistunique
+        node_df, edge_df = author.dataframes_from_connections({('Doe John', 'Müller Hans'): ['1', '2'],
+                                                                ('Muller Hans', 'Doe John'): ['2', '3'],
+                                                                ('Müller Hans', 'Muller Hans'): ['2']})
+        assert len(node_df) == 2
+        assert edge_df.values.tolist() == [['Doe_J', 'Muller_H', 3]]
+
     def test_make_dataframe(self):
         """Test make_dataframe method"""
         author = ApiInterface("Srinivasan", "Sanjana")
@@ -68,3 +115,121 @@ class TestApiInterface:
         assert len(node_df.columns) == 2
         assert len(edge_df.columns) == 3
 
+
+MEMBERS = [f'Member, Number{i}' for i in range(60)]
+PUBLICATIONS = {'1': ['Doe, John', 'Roe, Jane'], '2': ['Doe, John', 'Poe, Edgar'],
+                '3': ['Doe, John', 'Roe, Jane', 'Poe, Edgar'] + MEMBERS, '4': ['Roe, Jane'] + MEMBERS,
+                '5': ['Roe, Jane', 'Poe, Edgar'] + MEMBERS, '6': ['Roe, Jane', 'Poe, Edgar']}
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """Answers esearch with the ids 1 to 7, one page per request."""
+    requests = []
+
+    def do_GET(self):
+        params = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+        SearchHandler.requests.append(params)
+        start, retmax = int(params['retstart']), int(params['retmax'])
+        ids = ''.join(f'<Id>{i}</Id>' for i in range(1, 8)[start:start + retmax])
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(f'<eSearchResult><Count>7</Count><IdList>{ids}</IdList></eSearchResult>'.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def cached_publications(tmp_path):
+    """Cache holding the publications of John Doe, requests go nowhere."""
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+    cache.put_records({pmid: {'FAU': authors} for pmid, authors in PUBLICATIONS.items()})
+    cache.put_search('JohnDoe', ['1', '2', '3', '4'])
+    set_cache(cache)
+    set_scheduler(FetchScheduler(base_url='http://127.0.0.1:9', max_retries=0))
+    yield cache
+    set_cache(None)
+    set_scheduler(None)
+
+
+def test_esearch_pages(tmp_path, monkeypatch):
+    """Searches are requested page by page with retstart, offline"""
+    httpd = HTTPServer(('127.0.0.1', 0), SearchHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    set_cache(SQLiteCache(str(tmp_path / 'cache.sqlite')))
+    set_scheduler(FetchScheduler(base_url=f'http://127.0.0.1:{httpd.server_port}', max_retries=0))
+    monkeypatch.setattr(sharedwork, 'ESEARCH_PAGE_SIZE', 3)
+    try:
+        author = ApiInterface('Doe', 'John')
+        author.getpubmedidlist()
+        assert author.pubmedidlist == [str(i) for i in range(1, 8)]
+        assert [params['retstart'] for params in SearchHandler.requests] == ['0', '3', '6']
+    finally:
+        httpd.shutdown()
+        set_cache(None)
+        set_scheduler(None)
+
+
+def test_streamed_publications(cached_publications, monkeypatch):
+    """Publications are read in steps reporting progress, consortium papers are weighted, offline"""
+    monkeypatch.setattr(sharedwork, 'STREAM_BATCH_SIZE', 2)
+    messages = []
+    author = ApiInterface('Doe', 'John', progress=messages.append)
+    node_df, edge_df = author.make_dataframe(mode='seed')
+    assert 'read 2 of 4 publications of author' in messages
+    assert 'read 4 of 4 publications of author' in messages
+    # the members of the consortium paper are no nodes, the paper counts as 0.1 between co-authors
+    assert sorted(node_df['full_name']) == ['Doe John', 'Poe Edgar', 'Roe Jane']
+    assert author.consortium_pubmedids == {'3'}
+    weights = {(a, b): n for a, b, n in edge_df.itertuples(index=False)}
+    assert weights == {('Doe_J', 'Roe_J'): 1.1, ('Doe_J', 'Poe_E'): 1.1, ('Poe_E', 'Roe_J'): 0.1}
+
+    monkeypatch.setattr(sharedwork, 'CONSORTIUM_WEIGHT', 0)
+    node_df, edge_df = ApiInterface('Doe', 'John').make_dataframe(mode='seed')
+    assert sorted(edge_df['pub_id']) == [1, 1]
+
+
+def test_global_consortium_papers(cached_publications, monkeypatch):
+    """Consortium papers shared by co-authors only count like those of the author, offline"""
+    cached_publications.put_search('JaneRoe', ['1', '3', '4', '5', '6'])
+    cached_publications.put_search('EdgarPoe', ['2', '3', '5', '6'])
+    author = ApiInterface('Doe', 'John')
+    node_df, edge_df = author.make_dataframe(mode='global')
+    # 4 is found by the search of John Doe but he is no author, 5 has only Jane Roe and Edgar Poe among the co-authors
+    assert author.consortium_pubmedids == {'3', '4', '5'}
+    weights = {tuple(sorted((a, b))): n for a, b, n in edge_df.itertuples(index=False)}
+    assert weights == {('Doe_J', 'Roe_J'): 1.2, ('Doe_J', 'Poe_E'): 1.1, ('Poe_E', 'Roe_J'): 1.2}
+
+    monkeypatch.setattr(sharedwork, 'CONSORTIUM_WEIGHT', 0)
+    author = ApiInterface('Doe', 'John')
+    pairs = {tuple(sorted(pair)): pub_list for pair, pub_list in author.get_every_author_connection().items()}
+    assert pairs[('Poe Edgar', 'Roe Jane')] == ['6']
+
+
+def test_max_publications(cached_publications, monkeypatch):
+    """Authors with too many publications are refused only when a limit is set, offline"""
+    monkeypatch.setattr(sharedwork, 'MAX_PUBLICATIONS', 3)
+    author = ApiInterface('Doe', 'John')
+    assert author.publicalistfiltered() == []
+    assert author.messagefrontend[0] == 705
+
+
+def test_partial_results(cached_publications, monkeypatch):
+    """Co-authors and edges are published while the network is built, offline"""
+    monkeypatch.setattr(sharedwork, 'PARTIAL_BATCH_SIZE', 1)
+    events = []
+    ApiInterface('Doe', 'John', partial=lambda event, data: events.append((event, data))).make_dataframe(mode='seed')
+    coauthors = [name for event, data in events if event == 'coauthors' for name in data]
+    assert coauthors == ['John Doe', 'Jane Roe', 'Edgar Poe']
+    edges = {tuple(edge[:2]): edge[2] for event, data in events if event == 'edges' for edge in data}
+    assert edges[('John Doe', 'Jane Roe')] == 1.1
+
+    # in global mode the edges grow while the co-authors are searched
+    cached_publications.put_search('JaneRoe', ['1', '3', '4'])
+    cached_publications.put_search('EdgarPoe', ['2', '3'])
+    events.clear()
+    ApiInterface('Doe', 'John', partial=lambda event, data: events.append((event, data))).make_dataframe(mode='global')
+    batches = [data for event, data in events if event == 'edges']
+    assert len(batches) > 1
+    # the edge of the first two authors searched, then the edges of the third
+    assert [len(edges) for edges in batches] == [1, 2]
@@ -0,0 +1,140 @@
+"""Tests for the persisted network state."""
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from authormaps import sharedwork
+from authormaps.snapshot import NetworkState, load_network
+from authormaps.cache import SQLiteCache, set_cache
+from authormaps.scheduler import FetchScheduler, set_scheduler
+
+PUBLICATIONS = {'1': ['Doe, John', 'Roe, Jane'], '2': ['Doe, John', 'Poe, Edgar'], '3': ['Roe, Jane', 'Moe, Anna'],
+                '4': ['Roe, Jane', 'Poe, Edgar', 'Moe, Anna'],
+                '5': ['Roe, Jane', 'Poe, Edgar'] + [f'Member, Number{i}' for i in range(60)]}
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """Answers esearch with the PMIDs of the author in the term, e.g. 'Roe Jane[author]'."""
+    searches = {}
+
+    def do_GET(self):
+        params = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+        ids = SearchHandler.searches.get(params['term'].replace('[author]', ''), [])
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(f'<eSearchResult><Count>{len(ids)}</Count><IdList>'
+                         f'{"".join(f"<Id>{i}</Id>" for i in ids)}</IdList></eSearchResult>'.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def search_server(tmp_path):
+    """Cache holding every publication, searches answered by a local server."""
+    SearchHandler.searches = {'Doe John': ['1', '2'], 'Roe Jane': ['1', '3'], 'Poe Edgar': ['2']}
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), SearchHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+    cache.put_records({pmid: {'FAU': authors} for pmid, authors in PUBLICATIONS.items()})
+    set_cache(cache)
+    set_scheduler(FetchScheduler(base_url=f'http://127.0.0.1:{httpd.server_port}', max_retries=0))
+    yield SearchHandler.searches
+    httpd.shutdown()
+    set_cache(None)
+    set_scheduler(None)
+
+
+def make_state(directory):
+    state = NetworkState('Sanjana', 'Srinivasan', 'seed', directory=directory)
+    state.pubmedids = ['34062049', '34754938']
+    state.publication_authors = {'34062049': ['Srinivasan Sanjana', 'Concina Isabella'],
+                                 '34754938': ['Srinivasan Sanjana', 'Carugo Alessandro', 'Concina Isabella']}
+    state.all_authors = ['Carugo Alessandro', 'Concina Isabella', 'Srinivasan Sanjana']
+    state.pairs = {('Concina Isabella', 'Srinivasan Sanjana'): ['34062049', '34754938'],
+                   ('Carugo Alessandro', 'Srinivasan Sanjana'): ['34754938'],
+                   ('Carugo Alessandro', 'Concina Isabella'): ['34754938']}
+    state.version = 1
+    state.created_at = 1.0
+    return state
+
+
+class TestNetworkState:
+    """Tests NetworkState class"""
+
+    def test_save_and_load(self, tmp_path):
+        state = make_state(str(tmp_path))
+        for _ in range(5):
+            state.version += 1
+            state.save()
+        assert len(list((tmp_path / 'SanjanaSrinivasan_seed').iterdir())) == 3
+
+        loaded = NetworkState.load('Sanjana', 'Srinivasan', 'seed', directory=str(tmp_path))
+        assert loaded.version == 6
+        assert loaded.pairs == state.pairs
+        assert loaded.coauthors == ['Carugo Alessandro', 'Concina Isabella', 'Srinivasan Sanjana']
+        assert NetworkState.load('Sanjana', 'Srinivasan', 'global', directory=str(tmp_path)) is None
+
+    def test_to_dataframes(self, tmp_path):
+        node_df, edge_df = make_state(str(tmp_path)).to_dataframes()
+        assert list(node_df.columns) == ['short_name', 'full_name']
+        assert len(node_df) == 3
+        assert sorted(edge_df['pub_id']) == [1, 1, 2]
+
+    def test_load_network_without_refresh(self, tmp_path):
+        state = make_state(str(tmp_path))
+        state.created_at = 2e9
+        state.save()
+        loaded = load_network('Sanjana', 'Srinivasan', 'seed', max_age=float('inf'), directory=str(tmp_path))
+        assert loaded.version == 1
+
+    def test_layout(self, tmp_path):
+        import networkx as nx
+
+        state = make_state(str(tmp_path))
+        state.save()
+        graph = nx.Graph(list(state.pairs))
+        positions = state.layout(graph)
+        assert positions.keys() == set(graph)
+        assert (tmp_path / 'SanjanaSrinivasan_seed' / '000001.layout.json').exists()
+        # saved positions are reused, also by a loaded snapshot
+        loaded = NetworkState.load('Sanjana', 'Srinivasan', 'seed', directory=str(tmp_path))
+        assert all((loaded.layout(graph)[node] == xy).all() for node, xy in positions.items())
+        # a new version starts from the previous layout, old layouts are pruned with their snapshots
+        for _ in range(4):
+            state.version += 1
+            state.save()
+        graph.add_edge('Concina Isabella', 'Lee Jo')
+        assert state.layout(graph).keys() == set(graph)
+        assert sorted(p.name for p in (tmp_path / 'SanjanaSrinivasan_seed').glob('*.layout.json')) == ['000005.layout.json']
+
+
+def test_refresh_coauthor_publications(search_server, tmp_path):
+    """Publications the co-authors share after the snapshot are found, even with their searches in the cache"""
+    state = NetworkState.build('John', 'Doe', 'global', directory=str(tmp_path))
+    assert ('Poe Edgar', 'Roe Jane') not in state.pairs
+    search_server['Roe Jane'].append('4')
+    search_server['Poe Edgar'].append('4')
+
+    summary = state.refresh()
+    assert summary['edges'] == 1 and state.pairs[('Poe Edgar', 'Roe Jane')] == ['4']
+    assert state.messagefrontend == (700, 'Done')
+
+    # a consortium paper of the co-authors counts as in a new build
+    search_server['Roe Jane'].append('5')
+    search_server['Poe Edgar'].append('5')
+    state.refresh()
+    assert state.consortium_pubmedids == ['5']
+    weights = {(a, b): n for a, b, n in state.to_dataframes()[1].itertuples(index=False)}
+    assert weights == {('Doe_J', 'Roe_J'): 1, ('Doe_J', 'Poe_E'): 1, ('Poe_E', 'Roe_J'): 1.1}
+
+
+def test_refresh_max_publications(search_server, tmp_path, monkeypatch):
+    """The publication cap set when refreshing applies as in a new build"""
+    state = NetworkState.build('John', 'Doe', 'global', directory=str(tmp_path))
+    search_server['Doe John'].append('4')
+    monkeypatch.setattr(sharedwork, 'MAX_PUBLICATIONS', 2)
+    assert state.refresh() == {'publications': 0, 'coauthors': 0, 'edges': 0}
+    assert state.messagefrontend[0] == 705
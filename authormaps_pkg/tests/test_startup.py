@@ -0,0 +1,39 @@
+"""Tests for the import time and side effects of the package."""
+import os
+import sys
+import subprocess
+
+import pytest
+
+# cumulative import time in seconds allowed for the modules behind the lightweight commands such as getpubmedidlist,
+# a few times what they take on a laptop
+IMPORT_BUDGETS = {'authormaps.cli': 0.5, 'authormaps.sharedwork': 0.4}
+# only the commands building or drawing networks need these
+HEAVY_MODULES = ('matplotlib', 'pandas', 'networkx', 'scipy', 'numpy', 'pyarrow', 'tqdm')
+
+
+def import_times(module: str, home: str) -> dict:
+    """Return the cumulative import time in seconds of every module loaded by importing module in a new interpreter."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True,
+                            text=True, env=dict(os.environ, HOME=home), check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and 'cumulative' not in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+@pytest.mark.parametrize('module', sorted(IMPORT_BUDGETS))
+def test_import_budget(module, tmp_path):
+    # the fastest of a few runs, the first one may have to compile or read from a cold disk
+    runs = [import_times(module, str(tmp_path)) for _ in range(3)]
+    assert not [heavy for heavy in HEAVY_MODULES if heavy in runs[0]]
+    assert min(times[module] for times in runs) < IMPORT_BUDGETS[module]
+
+
+def test_import_has_no_side_effects(tmp_path):
+    modules = ['authormaps.cli', 'authormaps.cache', 'authormaps.network', 'authormaps.snapshot', 'authormaps.render']
+    subprocess.run([sys.executable, '-c', f'import {", ".join(modules)}'], env=dict(os.environ, HOME=str(tmp_path)),
+                   check=True)
+    assert not (tmp_path / '.AuthorMaps').exists()
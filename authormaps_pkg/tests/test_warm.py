@@ -0,0 +1,55 @@
+"""Tests for the background cache warming."""
+import pytest
+
+from authormaps.warm import Warmer, top_coauthors, warm_authors
+from authormaps.snapshot import NetworkState
+from authormaps.cache import SQLiteCache, set_cache
+from authormaps.scheduler import FetchScheduler, set_scheduler
+
+PUBLICATIONS = {'1': ['Doe, John', 'Roe, Jane'], '2': ['Doe, John', 'Poe, Edgar', 'Roe, Jane'],
+                '3': ['Roe, Jane', 'Poe, Edgar'], '4': ['Roe, Jane', 'Moe, Anna']}
+SEARCHES = {'JohnDoe': ['1', '2'], 'JaneRoe': ['1', '2', '3', '4'], 'EdgarPoe': ['2', '3'], 'AnnaMoe': ['4']}
+
+
+@pytest.fixture
+def cached_corpus(tmp_path):
+    """Cache holding every search and publication of the corpus, requests go nowhere."""
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+    cache.put_records({pmid: {'FAU': authors} for pmid, authors in PUBLICATIONS.items()})
+    for query, pubmedids in SEARCHES.items():
+        cache.put_search(query, pubmedids)
+    set_cache(cache)
+    set_scheduler(FetchScheduler(base_url='http://127.0.0.1:9', max_retries=0))
+    yield cache
+    set_cache(None)
+    set_scheduler(None)
+
+
+def test_warm_authors(cached_corpus, tmp_path):
+    warmed = warm_authors([('John', 'Doe')], coauthors=1, directory=str(tmp_path))
+    # Jane Roe shares both publications of John Doe
+    assert warmed == [('John', 'Doe'), ('Jane', 'Roe')]
+    state = NetworkState.load('Jane', 'Roe', directory=str(tmp_path))
+    # ties by name
+    assert top_coauthors(state, 3) == [('John', 'Doe'), ('Edgar', 'Poe'), ('Anna', 'Moe')]
+
+
+def test_warmer(cached_corpus, tmp_path):
+    warmer = Warmer(coauthors=2, directory=str(tmp_path))
+    try:
+        assert warmer.warm_coauthors('John', 'Doe')
+        assert warmer.wait(30)
+        assert NetworkState.load('Edgar', 'Poe', directory=str(tmp_path)) is not None
+        assert NetworkState.load('Anna', 'Moe', directory=str(tmp_path)) is None
+        # warmed recently
+        assert not warmer.warm_coauthors('John', 'Doe')
+        assert not warmer.submit('Jane', 'Roe')
+
+        authors_file = tmp_path / 'hot.txt'
+        authors_file.write_text('# hot authors\nAnna Moe\nRoe, Jane\n')
+        assert warmer.submit_hot_authors(str(authors_file)) == 2
+        assert warmer.wait(30)
+        assert NetworkState.load('Anna', 'Moe', directory=str(tmp_path)) is not None
+        assert len(warmer) == 0
+    finally:
+        warmer.stop()